@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Lint and validate every chart against all of its values files at once.
+
+Each chart is checked with its default values and every file in its
+`examples/` directory; the clickhouse chart also with every fixture in
+`tests/fixtures`. For each (chart, values) pair the values are checked
+against the chart's values.schema.json, the chart is linted with
+`helm lint`, rendered with `helm template` (cached, see
+tests/helpers/render.py) and the manifest validated with `kubeconform`.
+Pairs run concurrently in a process pool and the results are printed as
+one matrix, optionally also written as JSON.
+"""
+
+import os
+import sys
+import json
+import glob
+import argparse
+import subprocess
+import yaml
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.helpers.render import RenderService
+from tests.helpers.schema import validate_values
+
+CHARTS_DIRECTORY = os.path.join(REPO_ROOT, "charts")
+FIXTURES_DIRECTORY = os.path.join(REPO_ROOT, "tests", "fixtures")
+
+# Charts the test fixtures are written for
+FIXTURE_CHARTS = ("clickhouse",)
+
+DEFAULT_VALUES = "(defaults)"
+
+
+def charts():
+    """Return the names of all charts."""
+    return sorted(
+        os.path.basename(os.path.dirname(path))
+        for path in glob.glob(os.path.join(CHARTS_DIRECTORY, "*", "Chart.yaml"))
+    )
+
+
+def values_files(chart):
+    """Return the values files a chart is checked with, None for its defaults."""
+    files = [None]
+    files += sorted(
+        glob.glob(os.path.join(CHARTS_DIRECTORY, chart, "examples", "*.yaml"))
+    )
+    if chart in FIXTURE_CHARTS:
+        files += sorted(glob.glob(os.path.join(FIXTURES_DIRECTORY, "*.yaml")))
+    return files
+
+
+def build_dependencies(chart):
+    """Build a chart's dependencies unless all archives are vendored already."""
+    chart_path = os.path.join(CHARTS_DIRECTORY, chart)
+    if not os.path.exists(os.path.join(chart_path, "Chart.lock")):
+        return
+
+    result = subprocess.run(
+        ["helm", "dependency", "list", chart_path], capture_output=True, text=True
+    )
+    if result.returncode == 0 and "missing" not in result.stdout:
+        return
+
+    subprocess.run(["helm", "dependency", "build", chart_path], check=True)
+
+
+def kubeconform_command(schema_dirs, offline):
+    """Return the kubeconform command line for the given schema locations."""
+    cmd = ["kubeconform", "-strict", "-ignore-missing-schemas", "-output", "json"]
+    for schema_dir in schema_dirs:
+        cmd += [
+            "-schema-location",
+            os.path.join(schema_dir, "{{ .ResourceKind }}{{ .KindSuffix }}.json"),
+        ]
+    if not offline:
+        cmd += ["-schema-location", "default"]
+    return cmd
+
+
+def check(chart, values_file, schema_dirs, offline):
+    """Lint, render and validate one chart with one values file.
+
+    Returns:
+        Dict with the chart, values file, status ("ok" or "failed"),
+        the failed stage and its output
+    """
+    chart_path = os.path.join(CHARTS_DIRECTORY, chart)
+    values = [values_file] if values_file else []
+    name = os.path.relpath(values_file, REPO_ROOT) if values_file else DEFAULT_VALUES
+    result = {
+        "chart": chart,
+        "values": name,
+        "status": "ok",
+        "stage": None,
+        "output": "",
+    }
+
+    schema_path = os.path.join(chart_path, "values.schema.json")
+    if values_file and os.path.exists(schema_path):
+        with open(values_file, "r") as f:
+            errors = validate_values(schema_path, yaml.safe_load(f))
+        if errors:
+            return dict(
+                result, status="failed", stage="schema", output="\n".join(errors)
+            )
+
+    lint = ["helm", "lint", chart_path] + [a for v in values for a in ("--values", v)]
+    r = subprocess.run(lint, capture_output=True, text=True)
+    if r.returncode != 0:
+        return dict(result, status="failed", stage="lint", output=r.stdout + r.stderr)
+
+    try:
+        manifests = RenderService().render(chart_path, values_files=values)
+    except RuntimeError as e:
+        return dict(result, status="failed", stage="template", output=str(e))
+
+    r = subprocess.run(
+        kubeconform_command(schema_dirs, offline),
+        input=manifests.manifest,
+        capture_output=True,
+        text=True,
+    )
+    if r.returncode != 0:
+        return dict(
+            result, status="failed", stage="kubeconform", output=r.stdout + r.stderr
+        )
+
+    return result
+
+
+def print_matrix(results):
+    """Print a values file x chart matrix of results."""
+    chart_names = sorted({r["chart"] for r in results})
+    cells = {(r["values"], r["chart"]): r for r in results}
+    rows = sorted(
+        {r["values"] for r in results}, key=lambda v: (v != DEFAULT_VALUES, v)
+    )
+
+    width = max(len(row) for row in rows)
+    print(f"{'':{width}}  " + "  ".join(f"{c:^15}" for c in chart_names))
+    for row in rows:
+        marks = []
+        for chart in chart_names:
+            r = cells.get((row, chart))
+            mark = (
+                "-"
+                if r is None
+                else ("✅" if r["status"] == "ok" else f"❌ {r['stage']}")
+            )
+            marks.append(f"{mark:^15}")
+        print(f"{row:{width}}  " + "  ".join(marks))
+
+    for r in results:
+        if r["status"] != "ok":
+            print(f"\n❌ {r['chart']} with {r['values']} failed {r['stage']}:")
+            print(r["output"].strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes"
+    )
+    parser.add_argument(
+        "--schema-dir",
+        action="append",
+        default=[],
+        help="Local directory of kubeconform JSON schemas, checked before the default location",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use schemas from --schema-dir",
+    )
+    parser.add_argument("--report", metavar="path", help="Write results as JSON")
+    args = parser.parse_args()
+    if args.offline and not args.schema_dir:
+        parser.error("--offline needs at least one --schema-dir")
+
+    for chart in charts():
+        build_dependencies(chart)
+
+    matrix = [(chart, values) for chart in charts() for values in values_files(chart)]
+    print(f"Checking {len(matrix)} chart/values combinations with {args.jobs} workers")
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(check, chart, values, args.schema_dir, args.offline)
+            for chart, values in matrix
+        ]
+        results = [future.result() for future in futures]
+
+    print_matrix(results)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [r for r in results if r["status"] != "ok"]
+    if failed:
+        print(f"\n{len(failed)} of {len(results)} combinations failed")
+        return 1
+
+    print(f"\nAll {len(results)} combinations passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,14 @@
 import os
 from testflows.core import Secret
+from tests.helpers.defaults import (
+    DEFAULT_VERIFY_WORKERS,
+    DEFAULT_PARALLEL_FIXTURES,
+    DEFAULT_MAX_DOWNTIME,
+    DEFAULT_MIN_SUCCESS_RATE,
+    DEFAULT_MAX_P99_LATENCY,
+    DEFAULT_REPLICATION_LAG_SLO,
+    DEFAULT_KEEPER_KILL_CYCLES,
+)
 
 
 def argparser(parser):
@@ -13,4 +22,167 @@ def argparser(parser):
         required=False,
     )
 
+    parser.add_argument(
+        "--verify-workers",
+        metavar="workers",
+        type=int,
+        default=DEFAULT_VERIFY_WORKERS,
+        help="Number of independent verification checks to run in parallel",
+        required=False,
+    )
+
     pass
+
+
+def smoke_argparser(parser):
+    """Parse common arguments and the smoke test options."""
+
+    argparser(parser)
+
+    parser.add_argument(
+        "--parallel-fixtures",
+        metavar="workers",
+        type=int,
+        default=DEFAULT_PARALLEL_FIXTURES,
+        help="Number of fixtures to deploy and verify in parallel",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--max-downtime",
+        metavar="seconds",
+        type=float,
+        default=DEFAULT_MAX_DOWNTIME,
+        help="Longest time without a successful request allowed during an upgrade",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--min-success-rate",
+        metavar="rate",
+        type=float,
+        default=DEFAULT_MIN_SUCCESS_RATE,
+        help="Lowest share of seconds in which a ClickHouse pod answered allowed during an upgrade",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--max-p99-latency",
+        metavar="seconds",
+        type=float,
+        default=DEFAULT_MAX_P99_LATENCY,
+        help="Highest p99 request latency allowed during an upgrade",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--replication-lag-slo",
+        metavar="seconds",
+        type=float,
+        default=DEFAULT_REPLICATION_LAG_SLO,
+        help="Highest p99 time for an inserted row to reach the other replicas",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--keeper-kill-cycles",
+        metavar="count",
+        type=int,
+        default=DEFAULT_KEEPER_KILL_CYCLES,
+        help="Number of times the Keeper leader is deleted in the Keeper HA check",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--shared-operator",
+        action="store_true",
+        help="Install one cluster-wide operator and deploy fixtures without their own",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--profile-report",
+        metavar="path",
+        type=str,
+        help="Write step timings and subprocess counts as JSON to this file",
+        required=False,
+    )
+
+
+def benchmark_argparser(parser):
+    """Parse common arguments and the benchmark options."""
+
+    argparser(parser)
+
+    parser.add_argument(
+        "--benchmark-report",
+        metavar="path",
+        type=str,
+        default="benchmark.json",
+        help="Write benchmark results as JSON to this file",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--benchmark-fixture",
+        metavar="path",
+        type=str,
+        nargs="+",
+        help="Fixtures to benchmark, relative to tests/, e.g. fixtures/03-sharded-advanced.yaml",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--insert-clients",
+        metavar="clients",
+        type=int,
+        default=4,
+        help="Number of concurrent clients in the insert benchmark",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--insert-batch-size",
+        metavar="rows",
+        type=int,
+        nargs="+",
+        default=[10000, 100000],
+        help="Rows per INSERT in the insert benchmark, one run per size",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--insert-batches",
+        metavar="batches",
+        type=int,
+        default=10,
+        help="Number of batches each client inserts per run",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--query-rows",
+        metavar="rows",
+        type=int,
+        default=1000000,
+        help="Number of rows in the query benchmark dataset",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--query-concurrency",
+        metavar="clients",
+        type=int,
+        default=4,
+        help="Number of concurrent clients per query in the query benchmark",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--query-iterations",
+        metavar="requests",
+        type=int,
+        default=50,
+        help="Number of requests each client sends per query",
+        required=False,
+    )
@@ -0,0 +1,82 @@
+import threading
+from contextlib import contextmanager
+
+
+MEMORY_UNITS = {
+    "Ki": 1024,
+    "Mi": 1024**2,
+    "Gi": 1024**3,
+    "Ti": 1024**4,
+    "K": 1000,
+    "M": 1000**2,
+    "G": 1000**3,
+    "T": 1000**4,
+}
+
+
+def parse_cpu(quantity):
+    """Convert a Kubernetes CPU quantity ("500m", "2", 1.5) to cores."""
+    quantity = str(quantity).strip()
+    if quantity.endswith("m"):
+        return float(quantity[:-1]) / 1000
+    return float(quantity)
+
+
+def parse_memory(quantity):
+    """Convert a Kubernetes memory quantity ("512Mi", "1G", 1024) to bytes."""
+    quantity = str(quantity).strip()
+    for suffix in sorted(MEMORY_UNITS, key=len, reverse=True):
+        if quantity.endswith(suffix):
+            return int(float(quantity[: -len(suffix)]) * MEMORY_UNITS[suffix])
+    return int(float(quantity))
+
+
+class ResourceBudget:
+    """CPU and memory that concurrently running deployments may reserve.
+
+    A reservation blocks until it fits into what is left of the budget.
+    A reservation larger than the whole budget is granted once nothing
+    else is reserved, so an oversized deployment still runs, alone.
+    """
+
+    def __init__(self, cpu, memory):
+        self.cpu = cpu
+        self.memory = memory
+        self.reserved_cpu = 0.0
+        self.reserved_memory = 0
+        self.reservations = 0
+        self.condition = threading.Condition()
+
+    def fits(self, cpu, memory):
+        """Return True if a reservation can be granted right now."""
+        if self.reservations == 0:
+            return True
+        return (
+            self.reserved_cpu + cpu <= self.cpu
+            and self.reserved_memory + memory <= self.memory
+        )
+
+    def acquire(self, cpu, memory):
+        """Block until `cpu` cores and `memory` bytes can be reserved."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.fits(cpu, memory))
+            self.reserved_cpu += cpu
+            self.reserved_memory += memory
+            self.reservations += 1
+
+    def release(self, cpu, memory):
+        """Return a reservation to the budget."""
+        with self.condition:
+            self.reserved_cpu -= cpu
+            self.reserved_memory -= memory
+            self.reservations -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def reserve(self, cpu, memory):
+        """Hold a reservation for the duration of the block."""
+        self.acquire(cpu, memory)
+        try:
+            yield
+        finally:
+            self.release(cpu, memory)
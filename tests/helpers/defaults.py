@@ -0,0 +1,19 @@
+"""Defaults of the command line options, kept free of imports so the
+argparsers can read them without loading the steps they configure."""
+
+# Verifiers run concurrently by HelmState.verify_all
+DEFAULT_VERIFY_WORKERS = 4
+
+# Fixtures deployed at once unless --parallel-fixtures is given
+DEFAULT_PARALLEL_FIXTURES = 1
+
+# Availability budgets during an upgrade, see verify_availability
+DEFAULT_MAX_DOWNTIME = 120
+DEFAULT_MIN_SUCCESS_RATE = 0.5
+DEFAULT_MAX_P99_LATENCY = 5.0
+
+# Highest p99 lag of a row inserted on one replica reaching the others, in seconds
+DEFAULT_REPLICATION_LAG_SLO = 5.0
+
+# Times the Keeper leader is deleted in test_keeper_high_availability
+DEFAULT_KEEPER_KILL_CYCLES = 1
@@ -0,0 +1,83 @@
+import threading
+
+
+# Tools whose first positional argument is reported as part of the family
+SUBCOMMAND_TOOLS = ("kubectl", "helm", "minikube")
+
+FIELDS = ("calls", "subprocesses", "wall_time", "stdout_bytes")
+
+
+def command_family(cmd):
+    """Return the family of a shell command, e.g. "kubectl get" or "helm install"."""
+    words = cmd.split()
+    if not words:
+        return "unknown"
+
+    tool = words[0].rsplit("/", 1)[-1]
+    if tool not in SUBCOMMAND_TOOLS:
+        return tool
+
+    subcommand = next((w for w in words[1:] if not w.startswith("-")), None)
+    return f"{tool} {subcommand}" if subcommand else tool
+
+
+class Profiler:
+    """Thread-safe counters of harness calls.
+
+    Every call is recorded with the step, scenario and fixture it was made
+    from and its family (a command like "kubectl get", or a transport like
+    "kube api"). `report` aggregates the counters along each of those.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def record(
+        self, step, scenario, fixture, family, wall_time, subprocesses=0, stdout_bytes=0
+    ):
+        """Add one call to the counters."""
+        key = (step, scenario, fixture, family)
+        with self.lock:
+            entry = self.entries.setdefault(key, dict.fromkeys(FIELDS, 0))
+            entry["calls"] += 1
+            entry["subprocesses"] += subprocesses
+            entry["wall_time"] += wall_time
+            entry["stdout_bytes"] += stdout_bytes
+
+    def report(self):
+        """Return totals per step, scenario, fixture and family as a dict.
+
+        Step, scenario and fixture totals are also broken down by family.
+        """
+        with self.lock:
+            entries = [(key, dict(entry)) for key, entry in self.entries.items()]
+
+        report = {"total": dict.fromkeys(FIELDS, 0)}
+        for dimension in ("steps", "scenarios", "fixtures", "families"):
+            report[dimension] = {}
+
+        for (step, scenario, fixture, family), entry in entries:
+            add(report["total"], entry)
+            add(report["families"].setdefault(family, dict.fromkeys(FIELDS, 0)), entry)
+            for dimension, name in (
+                ("steps", step),
+                ("scenarios", scenario),
+                ("fixtures", fixture),
+            ):
+                totals = report[dimension].setdefault(
+                    name or "", dict(dict.fromkeys(FIELDS, 0), families={})
+                )
+                add(totals, entry)
+                add(
+                    totals["families"].setdefault(family, dict.fromkeys(FIELDS, 0)),
+                    entry,
+                )
+
+        return report
+
+
+def add(totals, entry):
+    """Add the counters of `entry` to `totals`."""
+    for field in FIELDS:
+        totals[field] += entry[field]
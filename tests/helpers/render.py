@@ -0,0 +1,223 @@
+import os
+import hashlib
+import tempfile
+import threading
+import subprocess
+import yaml
+
+
+DEFAULT_RENDER_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "altinity-helm-charts", "render"
+)
+
+# Files under the chart directory that don't change what it renders
+IGNORED_CHART_FILES = (".dependencies-digest",)
+
+
+# Chart path -> (file stamps, digest) of its last chart_digest
+chart_digests = {}
+chart_digests_lock = threading.Lock()
+
+
+def chart_files(chart_path):
+    """Return (relative path, path, mtime, size) of every file in a chart, sorted."""
+    files = []
+    for root, dirs, names in os.walk(chart_path):
+        dirs.sort()
+        for name in sorted(names):
+            if name in IGNORED_CHART_FILES:
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append(
+                (
+                    os.path.relpath(path, chart_path),
+                    path,
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                )
+            )
+    return files
+
+
+def chart_digest(chart_path):
+    """Return the sha256 over the paths and contents of all files in a chart.
+
+    The digest is memoized per chart path and only recomputed when a file
+    was added or removed or its mtime or size changed, so repeated renders
+    of a chart stat its files instead of reading them.
+    """
+    files = chart_files(chart_path)
+    stamps = [(relpath, mtime, size) for relpath, _, mtime, size in files]
+
+    with chart_digests_lock:
+        cached = chart_digests.get(chart_path)
+    if cached is not None and cached[0] == stamps:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    for relpath, path, _, _ in files:
+        digest.update(relpath.encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+
+    with chart_digests_lock:
+        chart_digests[chart_path] = (stamps, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def values_digest(values_files=(), values=None):
+    """Return the sha256 over the contents of values files and a values dict."""
+    digest = hashlib.sha256()
+    for path in values_files:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    if values:
+        digest.update(yaml.safe_dump(values, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ManifestIndex:
+    """Objects of a rendered manifest, indexed by kind and name."""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.by_kind = {}
+        for obj in yaml.safe_load_all(manifest):
+            if not obj or "kind" not in obj:
+                continue
+            name = obj.get("metadata", {}).get("name")
+            self.by_kind.setdefault(obj["kind"], {})[name] = obj
+
+    def get(self, kind, name=None):
+        """Return the object of a kind with a name, or None.
+
+        Without a name, returns the only object of that kind, or None if
+        there is not exactly one.
+        """
+        objects = self.by_kind.get(kind, {})
+        if name is None:
+            return next(iter(objects.values())) if len(objects) == 1 else None
+        return objects.get(name)
+
+    def list(self, kind):
+        """Return all objects of a kind."""
+        return list(self.by_kind.get(kind, {}).values())
+
+    def names(self, kind):
+        """Return the sorted names of all objects of a kind."""
+        return sorted(self.by_kind.get(kind, {}))
+
+
+class RenderService:
+    """Render charts with `helm template` once per chart and values.
+
+    Manifests are cached on disk under the digest of the chart files,
+    the values, the release name and the namespace, and parsed manifests
+    are kept in memory, so repeated renders cost a dictionary lookup.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = (
+            cache_dir
+            or os.environ.get("HELM_RENDER_CACHE_DIR")
+            or DEFAULT_RENDER_CACHE_DIR
+        )
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def key(
+        self,
+        chart_path,
+        values_files=(),
+        values=None,
+        release="release",
+        namespace="default",
+    ):
+        """Return the cache key of a render."""
+        digest = hashlib.sha256()
+        for part in (
+            chart_digest(chart_path),
+            values_digest(values_files=values_files, values=values),
+            release,
+            namespace,
+        ):
+            digest.update(part.encode() + b"\0")
+        return digest.hexdigest()
+
+    def render(
+        self,
+        chart_path,
+        values_files=(),
+        values=None,
+        release="release",
+        namespace="default",
+    ):
+        """Return the ManifestIndex of a chart rendered with the given values.
+
+        Raises:
+            RuntimeError: If `helm template` fails
+        """
+        key = self.key(
+            chart_path,
+            values_files=values_files,
+            values=values,
+            release=release,
+            namespace=namespace,
+        )
+
+        with self.lock:
+            index = self.indexes.get(key)
+        if index is not None:
+            return index
+
+        path = os.path.join(self.cache_dir, f"{key}.yaml")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                manifest = f.read()
+        else:
+            manifest = self.helm_template(
+                chart_path,
+                values_files=values_files,
+                values=values,
+                release=release,
+                namespace=namespace,
+            )
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write through a temporary file so readers never see a partial manifest
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.cache_dir, suffix=".tmp", delete=False
+            ) as f:
+                f.write(manifest)
+            os.replace(f.name, path)
+
+        index = ManifestIndex(manifest)
+        with self.lock:
+            return self.indexes.setdefault(key, index)
+
+    def helm_template(self, chart_path, values_files, values, release, namespace):
+        """Run `helm template` and return the manifest."""
+        cmd = ["helm", "template", release, chart_path, "--namespace", namespace]
+        for path in values_files:
+            cmd += ["--values", path]
+
+        values_path = None
+        if values:
+            with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+                yaml.safe_dump(values, f)
+                values_path = f.name
+            cmd += ["--values", values_path]
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        finally:
+            if values_path:
+                os.unlink(values_path)
+
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"helm template {chart_path} failed: {result.stderr.strip()}"
+            )
+        return result.stdout
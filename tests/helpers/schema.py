@@ -0,0 +1,74 @@
+import os
+import json
+from functools import lru_cache
+
+import yaml
+from jsonschema.validators import validator_for
+
+
+def merge_values(defaults, overrides):
+    """Merge user values over chart defaults the way Helm coalesces them.
+
+    Maps are merged key by key, any other value (lists included) replaces
+    the default, and a null override deletes the default key.
+    """
+    if not isinstance(defaults, dict) or not isinstance(overrides, dict):
+        return overrides
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if value is None:
+            merged.pop(key, None)
+        elif key in merged:
+            merged[key] = merge_values(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+@lru_cache(maxsize=None)
+def schema_validator(schema_path):
+    """Return the JSON schema validator of a values.schema.json, built once per path.
+
+    The validator class follows the schema's $schema, so every keyword
+    of that draft is checked and the schema itself is checked first.
+    """
+    with open(schema_path, "r") as f:
+        schema = json.load(f)
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+@lru_cache(maxsize=None)
+def chart_defaults(chart_path):
+    """Return the parsed values.yaml of a chart, loaded once per path."""
+    values_path = os.path.join(chart_path, "values.yaml")
+    if not os.path.exists(values_path):
+        return {}
+    with open(values_path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def json_path(error):
+    """Return the JSON path of a validation error, e.g. $.clickhouse.users[0]."""
+    path = "$"
+    for element in error.absolute_path:
+        path += f"[{element}]" if isinstance(element, int) else f".{element}"
+    return path
+
+
+def validate_values(schema_path, values):
+    """Validate values merged over the chart defaults.
+
+    Helm validates the coalesced values, not the values file alone, so a
+    file is checked together with the values.yaml next to the schema.
+
+    Returns:
+        List of "<JSON path>: <message>" errors
+    """
+    merged = merge_values(chart_defaults(os.path.dirname(schema_path)), values or {})
+    errors = sorted(
+        schema_validator(schema_path).iter_errors(merged),
+        key=lambda e: list(map(str, e.absolute_path)),
+    )
+    return [f"{json_path(e)}: {e.message}" for e in errors]
@@ -0,0 +1,86 @@
+import bisect
+import threading
+
+
+class Histogram:
+    """Thread-safe histogram of durations in seconds.
+
+    Buckets are powers of two starting at 0.25s, which covers everything from
+    a sub-second check to a multi-minute rollout with a dozen buckets.
+    """
+
+    BOUNDS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        """Add one duration in seconds."""
+        with self.lock:
+            self.buckets[bisect.bisect_left(self.BOUNDS, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def summary(self):
+        """Return count, mean, max and non-empty buckets as a dict."""
+        with self.lock:
+            labels = [f"<={b}s" for b in self.BOUNDS] + [f">{self.BOUNDS[-1]}s"]
+            return {
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+                "max": self.max,
+                "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+            }
+
+
+class HistogramRegistry:
+    """Thread-safe collection of named histograms."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def record(self, name, value):
+        """Add one duration in seconds to the histogram called `name`."""
+        with self.lock:
+            histogram = self.histograms.setdefault(name, Histogram())
+        histogram.record(value)
+
+    def summary(self):
+        """Return {name: summary} for all histograms, sorted by name."""
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        return {name: histogram.summary() for name, histogram in histograms}
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values, 0.0 if there are none.
+
+    Interpolates linearly between the two closest ranks, like numpy's
+    default method.
+    """
+    values = sorted(values)
+    if not values:
+        return 0.0
+
+    rank = (len(values) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def longest_gap(times, start, end):
+    """Return the longest interval in [start, end] without any of the times.
+
+    Args:
+        times: Timestamps of successes, e.g. completed requests
+        start: Start of the observed window
+        end: End of the observed window
+    """
+    edges = [start] + sorted(t for t in times if start <= t <= end) + [end]
+    return max(b - a for a, b in zip(edges, edges[1:]))
@@ -0,0 +1,61 @@
+import io
+import types
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def config_index(xml):
+    """Flatten a ClickHouse XML config into a path -> value dict.
+
+    Every leaf element becomes one entry keyed by the tags leading to it,
+    without the root (<clickhouse>, <yandex>, ...), e.g.
+    "merge_tree/max_suspicious_broken_parts" -> "5". A root with text and
+    no child elements is a leaf itself and keeps its tag, e.g.
+    "<max_connections>100</max_connections>" -> {"max_connections": "100"},
+    while an empty "<clickhouse></clickhouse>" has no entries.
+    Attributes are ignored
+    and a repeated path keeps its last value. The document is parsed once
+    with iterparse and memoized by content, so every caller with the same
+    extraConfig shares one index.
+
+    Fragments with several top-level elements are indexed as if wrapped
+    in a root element. The index is shared, so it is returned read-only.
+    """
+    try:
+        index = parse_leaves(xml, strip=1)
+    except ET.ParseError:
+        index = parse_leaves(f"<root>{xml}</root>", strip=1, leaf_root=False)
+    return types.MappingProxyType(index)
+
+
+def parse_leaves(xml, strip, leaf_root=True):
+    """Return {path: text} of leaf elements, dropping `strip` leading tags.
+
+    A leaf with no more than `strip` tags in its path keeps its own tag if
+    it has text, unless `leaf_root` is False, e.g. for a wrapper around a
+    fragment.
+    """
+    index = {}
+    path = []
+    children = [0]
+
+    for event, element in ET.iterparse(
+        io.BytesIO(xml.encode("utf-8")), events=("start", "end")
+    ):
+        if event == "start":
+            children[-1] += 1
+            path.append(element.tag)
+            children.append(0)
+            continue
+
+        if children.pop() == 0:
+            text = (element.text or "").strip()
+            if len(path) > strip:
+                index["/".join(path[strip:])] = text
+            elif leaf_root and text:
+                index[element.tag] = text
+        path.pop()
+        element.clear()
+
+    return index
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import sys
+import os
+
+from testflows.core import *
+
+append_path(sys.path, "../..")
+
+from tests.helpers.argparser import benchmark_argparser
+
+
+@TestModule
+@Name("benchmark")
+@ArgumentParser(benchmark_argparser)
+def regression(
+    self,
+    feature,
+    verify_workers,
+    benchmark_report,
+    benchmark_fixture,
+    insert_clients,
+    insert_batch_size,
+    insert_batches,
+    query_rows,
+    query_concurrency,
+    query_iterations,
+):
+    """Benchmark ClickHouse deployed with the chart."""
+
+    self.context.altinity_repo = "https://helm.altinity.com"
+    self.context.local_chart_path = os.path.join(os.getcwd(), "charts", "clickhouse")
+    self.context.verify_workers = verify_workers
+    self.context.benchmark_report = benchmark_report
+    self.context.benchmark_fixtures = benchmark_fixture
+    self.context.insert_clients = insert_clients
+    self.context.insert_batch_sizes = list(insert_batch_size)
+    self.context.insert_batches = insert_batches
+    self.context.query_rows = query_rows
+    self.context.query_concurrency = query_concurrency
+    self.context.query_iterations = query_iterations
+    Feature(run=load(f"tests.scenarios.benchmark", "feature"))
+
+
+if main():
+    regression()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+import sys
+import os
+
+from testflows.core import *
+
+append_path(sys.path, "../..")
+
+from tests.helpers.argparser import argparser
+
+
+@TestModule
+@Name("render")
+@ArgumentParser(argparser)
+def regression(self, feature, verify_workers):
+    """Verify rendered manifests of all fixtures without a cluster."""
+
+    self.context.altinity_repo = "https://helm.altinity.com"
+    self.context.local_chart_path = os.path.join(os.getcwd(), "charts", "clickhouse")
+    self.context.verify_workers = verify_workers
+    Feature(run=load(f"tests.scenarios.render", "feature"))
+
+
+if main():
+    regression()
@@ -6,18 +6,39 @@ from testflows.core import *
 
 append_path(sys.path, "../..")
 
-from tests.helpers.argparser import argparser
+from tests.helpers.argparser import smoke_argparser
 
 
 @TestModule
 @Name("smoke")
-@ArgumentParser(argparser)
-def regression(self, feature):
+@ArgumentParser(smoke_argparser)
+def regression(
+    self,
+    feature,
+    parallel_fixtures,
+    verify_workers,
+    max_downtime,
+    min_success_rate,
+    max_p99_latency,
+    replication_lag_slo,
+    keeper_kill_cycles,
+    shared_operator,
+    profile_report,
+):
     """Execute smoke tests."""
 
     self.context.altinity_repo = "https://helm.altinity.com"
     self.context.version = "25.3.6.10034.altinitystable"
     self.context.local_chart_path = os.path.join(os.getcwd(), "charts", "clickhouse")
+    self.context.parallel_fixtures = parallel_fixtures
+    self.context.verify_workers = verify_workers
+    self.context.max_downtime = max_downtime
+    self.context.min_success_rate = min_success_rate
+    self.context.max_p99_latency = max_p99_latency
+    self.context.replication_lag_slo = replication_lag_slo
+    self.context.keeper_kill_cycles = keeper_kill_cycles
+    self.context.shared_operator = shared_operator
+    self.context.profile_report = profile_report
     Feature(run=load(f"tests.scenarios.smoke", "feature"))
 
 
@@ -0,0 +1,133 @@
+from testflows.core import *
+
+import os
+import tests.steps.kubernetes as kubernetes
+import tests.steps.minikube as minikube
+import tests.steps.helm as helm
+import tests.steps.clickhouse as clickhouse
+import tests.steps.benchmark as benchmark
+from tests.steps.deployment import HelmState
+
+
+# Fixtures benchmarked unless --benchmark-fixture is given
+BENCHMARK_FIXTURES = [
+    "fixtures/02-replicated-with-users.yaml",
+    # "fixtures/03-sharded-advanced.yaml",
+]
+
+
+@TestScenario
+def check_fixture_performance(self, fixture_file):
+    """Deploy a fixture and benchmark it.
+
+    Args:
+        fixture_file: Path to the fixture YAML file
+    """
+    fixture_name = os.path.basename(fixture_file).replace(".yaml", "")
+    short_name = f"b{fixture_name[:9]}"
+    release_name = short_name
+    namespace = short_name
+    self.context.fixture = fixture_name
+    results = self.context.benchmark_results.setdefault(fixture_name, {})
+
+    with Given("load fixture configuration"):
+        tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        state = HelmState(os.path.join(tests_dir, fixture_file))
+        admin_password = state.clickhouse_config.get("defaultUser", {}).get(
+            "password", ""
+        )
+        results["values"] = {
+            "replicasCount": state.get_value("clickhouse.replicasCount", 1),
+            "shardsCount": state.get_value("clickhouse.shardsCount", 1),
+            "resources": state.get_value("clickhouse.resources"),
+            "persistence": state.get_value("clickhouse.persistence"),
+        }
+
+    # ReplicatedMergeTree tables and ON CLUSTER DDL need Keeper
+    replicated = benchmark.replicated_tables(state)
+
+    if "external-keeper" in fixture_name:
+        skip("Skipping external keeper fixture (requires pre-existing keeper)")
+        return
+
+    with When("install ClickHouse with fixture configuration"):
+        kubernetes.use_context(context_name="minikube")
+        helm.install(
+            namespace=namespace, release_name=release_name, values_file=fixture_file
+        )
+
+    with And("wait for the deployment to be ready"):
+        state.verify_deployment(namespace=namespace)
+
+    with And("benchmark database"):
+        # Cluster name equals namespace (which equals release_name in test setup)
+        benchmark.create_benchmark_database(
+            namespace=namespace,
+            cluster=namespace,
+            replicated=replicated,
+            admin_password=admin_password,
+        )
+
+    with And("benchmark client pod"):
+        benchmark.create_benchmark_client(namespace=namespace)
+
+    if replicated:
+        with Then("measure insert throughput"):
+            results["insert"] = benchmark.run_insert_benchmark(
+                namespace=namespace,
+                cluster=namespace,
+                batch_sizes=self.context.insert_batch_sizes,
+                clients=self.context.insert_clients,
+                batches=self.context.insert_batches,
+                admin_password=admin_password,
+            )
+    else:
+        note("Insert benchmark skipped: needs Keeper for replicated tables")
+
+    with Then("measure query latency"):
+        results["query"] = benchmark.run_query_benchmark(
+            namespace=namespace,
+            cluster=namespace,
+            rows=self.context.query_rows,
+            concurrency=self.context.query_concurrency,
+            iterations=self.context.query_iterations,
+            replicated=replicated,
+            admin_password=admin_password,
+        )
+
+    with Finally("cleanup deployment"):
+        helm.uninstall(namespace=namespace, release_name=release_name)
+        kubernetes.delete_namespace(namespace=namespace)
+
+
+@TestFeature
+@Name("benchmark")
+def feature(self):
+    """Benchmark ClickHouse deployed with each benchmark fixture."""
+
+    with Given("minikube environment"):
+        minikube.setup_minikube_environment()
+        kubernetes.use_context(context_name="minikube")
+
+    with And("pooled Kubernetes API connection"):
+        kubernetes.use_api_backend()
+
+    with And("pooled ClickHouse HTTP sessions"):
+        clickhouse.use_clickhouse_session_pool()
+
+    self.context.benchmark_results = {}
+
+    fixtures = getattr(self.context, "benchmark_fixtures", None) or BENCHMARK_FIXTURES
+
+    for fixture in fixtures:
+        Scenario(
+            test=check_fixture_performance,
+            name=f"benchmark_{os.path.basename(fixture).replace('.yaml', '')}",
+        )(fixture_file=fixture)
+
+    if getattr(self.context, "benchmark_report", None):
+        with Finally("write benchmark report"):
+            benchmark.write_benchmark_report(
+                path=self.context.benchmark_report,
+                results=self.context.benchmark_results,
+            )
@@ -0,0 +1,156 @@
+from testflows.core import *
+
+import os
+import glob
+import tests.steps.helm as helm
+import tests.steps.benchmark as benchmark
+from tests.steps.deployment import HelmState
+from tests.helpers.xmlindex import config_index
+
+# (name, extraConfig, expected config_index) of the documents config_index handles
+CONFIG_INDEX_EXAMPLES = [
+    (
+        "nested settings",
+        "<clickhouse><merge_tree><parts_to_throw_insert>300</parts_to_throw_insert>"
+        "</merge_tree><max_connections>100</max_connections></clickhouse>",
+        {"merge_tree/parts_to_throw_insert": "300", "max_connections": "100"},
+    ),
+    (
+        "single top-level leaf",
+        "<max_connections>100</max_connections>",
+        {"max_connections": "100"},
+    ),
+    (
+        "fragment",
+        "<max_connections>100</max_connections><logger><level>debug</level></logger>",
+        {"max_connections": "100", "logger/level": "debug"},
+    ),
+    ("empty root", "<clickhouse>\n</clickhouse>", {}),
+    ("empty", "", {}),
+]
+
+INVARIANT_CHECKS = ["deployment", "cluster topology", "service endpoints", "secrets"]
+
+# (name, initial values, upgraded values, checks get_changed_verifiers selects)
+CHANGED_VERIFIERS_EXAMPLES = [
+    (
+        "no changes",
+        "fixtures/upgrade/initial.yaml",
+        "fixtures/upgrade/initial.yaml",
+        INVARIANT_CHECKS,
+    ),
+    (
+        "pod annotations and labels",
+        "fixtures/upgrade/initial.yaml",
+        "fixtures/upgrade/labels.yaml",
+        INVARIANT_CHECKS + ["pod annotations", "pod labels"],
+    ),
+]
+
+# (name, fixture, whether its benchmark DDL runs ON CLUSTER with replicated tables)
+BENCHMARK_DDL_EXAMPLES = [
+    ("without keeper", "fixtures/01-minimal-single-node.yaml", False),
+    ("with keeper", "fixtures/02-replicated-with-users.yaml", True),
+]
+
+
+@TestScenario
+def check_rendered(self, fixture_file):
+    """Verify the CHI and CHK rendered from a fixture, without a cluster.
+
+    Args:
+        fixture_file: Path to the fixture YAML file
+    """
+    fixture_name = os.path.basename(fixture_file).replace(".yaml", "")
+    # Same release name and namespace as the deployment scenarios
+    short_name = f"t{fixture_name[:9]}"
+
+    with Given("load fixture configuration"):
+        tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        state = HelmState(os.path.join(tests_dir, fixture_file))
+
+    with Then("verify rendered manifests"):
+        state.verify_all(namespace=short_name, render=True)
+
+
+@TestScenario
+def check_values_schema(self):
+    """Validate every fixture and chart example against values.schema.json."""
+    tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    examples_dir = os.path.join(self.context.local_chart_path, "examples")
+    values_files = sorted(glob.glob(os.path.join(tests_dir, "fixtures", "*.yaml")))
+    values_files += sorted(glob.glob(os.path.join(examples_dir, "*.yaml")))
+
+    for values_file in values_files:
+        with Check(f"{os.path.basename(values_file)}"):
+            helm.validate_values_schema(values_file=values_file)
+
+
+@TestScenario
+def check_config_index(self):
+    """Check how extraConfig documents are flattened into settings."""
+    for name, xml, expected in CONFIG_INDEX_EXAMPLES:
+        with Check(name):
+            actual = dict(config_index(xml))
+            assert actual == expected, f"Expected {expected}, got {actual}"
+
+
+@TestScenario
+def check_changed_verifiers(self):
+    """Check which verifiers are re-run after an upgrade changing a few values."""
+    tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    for name, initial, upgraded, expected in CHANGED_VERIFIERS_EXAMPLES:
+        with Check(name):
+            previous = HelmState(os.path.join(tests_dir, initial))
+            state = HelmState(os.path.join(tests_dir, upgraded))
+            actual = [v.name for v in state.get_changed_verifiers(previous=previous)]
+            assert actual == expected, f"Expected {expected}, got {actual}"
+
+
+@TestScenario
+def check_benchmark_ddl(self):
+    """Check that benchmark DDL only uses ON CLUSTER and replicated tables with Keeper."""
+    tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    for name, fixture, expected in BENCHMARK_DDL_EXAMPLES:
+        with Check(name):
+            state = HelmState(os.path.join(tests_dir, fixture))
+            replicated = benchmark.replicated_tables(state)
+            assert replicated == expected, f"Expected {expected}, got {replicated}"
+
+            queries = [
+                benchmark.cluster_query(query, cluster="bench", replicated=replicated)
+                for query in [
+                    f"CREATE DATABASE IF NOT EXISTS bench{benchmark.ON_CLUSTER}",
+                    *benchmark.benchmark_table_ddl(
+                        cluster="bench",
+                        table="hits",
+                        columns=benchmark.HITS_COLUMNS,
+                        order_by="id",
+                        replicated=replicated,
+                    ),
+                ]
+            ]
+            for query in queries:
+                assert ("ON CLUSTER" in query) == expected, query
+            assert ("ReplicatedMergeTree" in queries[1]) == expected, queries[1]
+
+
+@TestFeature
+@Name("render")
+def feature(self):
+    """Verify the rendered manifests of every fixture."""
+    tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fixtures = sorted(glob.glob(os.path.join(tests_dir, "fixtures", "*.yaml")))
+
+    Scenario(run=check_values_schema)
+    Scenario(run=check_config_index)
+    Scenario(run=check_changed_verifiers)
+    Scenario(run=check_benchmark_ddl)
+
+    for fixture in fixtures:
+        Scenario(
+            test=check_rendered,
+            name=f"render_{os.path.basename(fixture).replace('.yaml', '')}",
+        )(fixture_file=os.path.relpath(fixture, tests_dir))
@@ -5,7 +5,10 @@ import tests.steps.kubernetes as kubernetes
 import tests.steps.minikube as minikube
 import tests.steps.helm as helm
 import tests.steps.clickhouse as clickhouse
-from tests.steps.deployment import HelmState
+import tests.steps.system as system
+from tests.steps.deployment import HelmState, wait_for_clickhouse_deployment
+from tests.helpers.budget import ResourceBudget
+from tests.helpers.defaults import DEFAULT_PARALLEL_FIXTURES
 
 
 FIXTURES = [
@@ -20,22 +23,27 @@ FIXTURES = [
 
 UPGRADE_SCENARIOS = [
     ("fixtures/upgrade/initial.yaml", "fixtures/upgrade/upgrade.yaml"),
+    ("fixtures/upgrade/initial.yaml", "fixtures/upgrade/labels.yaml"),
+    ("fixtures/upgrade/initial.yaml", "fixtures/upgrade/resources.yaml"),
 ]
 
 
 @TestScenario
-def check_deployment(self, fixture_file, skip_external_keeper=True):
+def check_deployment(self, fixture_file, skip_external_keeper=True, budget=None):
     """Test a single ClickHouse deployment configuration.
 
     Args:
         fixture_file: Path to the fixture YAML file
         skip_external_keeper: Skip if fixture requires external keeper
+        budget: ResourceBudget to reserve the fixture's footprint from
     """
     fixture_name = os.path.basename(fixture_file).replace(".yaml", "")
     # Keep release name and namespace under 11 chars to avoid Kubernetes naming issues
     short_name = f"t{fixture_name[:9]}"
     release_name = short_name
     namespace = short_name
+    operator_namespace = getattr(self.context, "shared_operator_namespace", None)
+    self.context.fixture = fixture_name
 
     with Given("paths to fixture file"):
         tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,13 +58,20 @@ def check_deployment(self, fixture_file, skip_external_keeper=True):
         skip("Skipping external keeper test (requires pre-existing keeper)")
         return
 
-    with When("install ClickHouse with fixture configuration"):
+    if budget is not None:
+        with And("reserve cluster resources for the fixture"):
+            cpu, memory = state.get_resource_footprint(
+                include_operator=not operator_namespace
+            )
+            kubernetes.reserve_cluster_resources(budget=budget, cpu=cpu, memory=memory)
+
+    with When("install ClickHouse with fixture configuration"), system.profile_step():
         kubernetes.use_context(context_name="minikube")
         helm.install(
             namespace=namespace, release_name=release_name, values_file=fixture_file
         )
 
-    with Then("verify deployment state"):
+    with Then("verify deployment state"), system.profile_step():
         state.verify_all(namespace=namespace)
 
     # Add Keeper HA test for replicated deployments with 3+ keepers
@@ -66,12 +81,18 @@ def check_deployment(self, fixture_file, skip_external_keeper=True):
                 "password", ""
             )
             clickhouse.test_keeper_high_availability(
-                namespace=namespace, admin_password=admin_password
+                namespace=namespace,
+                admin_password=admin_password,
+                cycles=getattr(
+                    self.context,
+                    "keeper_kill_cycles",
+                    clickhouse.DEFAULT_KEEPER_KILL_CYCLES,
+                ),
             )
 
     # Verify metrics endpoint is accessible
     with And("verify metrics endpoint"):
-        clickhouse.verify_metrics_endpoint(namespace=namespace)
+        clickhouse.verify_metrics_endpoint(namespace=operator_namespace or namespace)
 
     with Finally("cleanup deployment"):
         helm.uninstall(namespace=namespace, release_name=release_name)
@@ -88,6 +109,8 @@ def check_upgrade(self, initial_fixture, upgrade_fixture):
     """
     release_name = f"upgrade"
     namespace = f"upgrade"
+    operator_namespace = getattr(self.context, "shared_operator_namespace", None)
+    self.context.fixture = os.path.basename(initial_fixture).replace(".yaml", "")
 
     with Given("paths to fixture files"):
         tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -100,13 +123,13 @@ def check_upgrade(self, initial_fixture, upgrade_fixture):
         note(f"Initial pods: {initial_state.get_expected_pod_count()}")
         note(f"Upgraded pods: {upgrade_state.get_expected_pod_count()}")
 
-    with When("install ClickHouse with initial configuration"):
+    with When("install ClickHouse with initial configuration"), system.profile_step():
         kubernetes.use_context(context_name="minikube")
         helm.install(
             namespace=namespace, release_name=release_name, values_file=initial_fixture
         )
 
-    with Then("verify initial deployment state"):
+    with Then("verify initial deployment state"), system.profile_step():
         initial_state.verify_all(namespace=namespace)
 
     # Only test data survival if nameOverride stays the same (in-place upgrade)
@@ -130,13 +153,55 @@ def check_upgrade(self, initial_fixture, upgrade_fixture):
             f"Skipping data survival test: nameOverride changed from '{initial_name}' to '{upgrade_name}' (cluster replacement scenario)"
         )
 
-    with When("upgrade ClickHouse to new configuration"):
-        helm.upgrade(
-            namespace=namespace, release_name=release_name, values_file=upgrade_fixture
+    with When("upgrade ClickHouse to new configuration"), system.profile_step():
+        reconciles = clickhouse.get_chi_reconciles(namespace=namespace)
+        passwords = [
+            state.clickhouse_config.get("defaultUser", {}).get("password", "")
+            for state in (initial_state, upgrade_state)
+        ]
+        with clickhouse.AvailabilityProber(
+            namespace=namespace, passwords=passwords
+        ) as prober:
+            helm.upgrade(
+                namespace=namespace,
+                release_name=release_name,
+                values_file=upgrade_fixture,
+            )
+            wait_for_clickhouse_deployment(
+                namespace=namespace,
+                expected_pod_count=upgrade_state.get_expected_pod_count(),
+                expected_clickhouse_count=upgrade_state.get_expected_clickhouse_pod_count(),
+            )
+            clickhouse.wait_for_chi_completed(namespace=namespace, previous=reconciles)
+        availability = prober.report()
+
+    if is_inplace_upgrade:
+        with Then("verify availability during the upgrade"):
+            clickhouse.verify_availability(
+                report=availability,
+                max_downtime=getattr(
+                    self.context, "max_downtime", clickhouse.DEFAULT_MAX_DOWNTIME
+                ),
+                min_success_rate=getattr(
+                    self.context,
+                    "min_success_rate",
+                    clickhouse.DEFAULT_MIN_SUCCESS_RATE,
+                ),
+                max_p99_latency=getattr(
+                    self.context,
+                    "max_p99_latency",
+                    clickhouse.DEFAULT_MAX_P99_LATENCY,
+                ),
+            )
+    else:
+        note(
+            f"Availability not checked against budgets for cluster replacement: "
+            f"available {availability['success_rate']:.1%} of the time, "
+            f"longest gap {availability['longest_gap']:.2f}s"
         )
 
-    with Then("verify upgraded deployment state"):
-        upgrade_state.verify_all(namespace=namespace)
+    with Then("verify upgraded deployment state"), system.profile_step():
+        upgrade_state.verify_changes(namespace=namespace, previous=initial_state)
 
     if is_inplace_upgrade:
         with And("verify data survived the upgrade"):
@@ -153,7 +218,7 @@ def check_upgrade(self, initial_fixture, upgrade_fixture):
         note(f"Data survival verification skipped for cluster replacement scenario")
 
     with And("verify metrics endpoint"):
-        clickhouse.verify_metrics_endpoint(namespace=namespace)
+        clickhouse.verify_metrics_endpoint(namespace=operator_namespace or namespace)
 
     with Finally("cleanup deployment"):
         helm.uninstall(namespace=namespace, release_name=release_name)
@@ -162,13 +227,46 @@ def check_upgrade(self, initial_fixture, upgrade_fixture):
 
 @TestFeature
 def check_all_fixtures(self):
-    """Test all fixture configurations."""
+    """Test all fixture configurations.
 
-    for fixture in FIXTURES:
-        Scenario(
-            test=check_deployment,
-            name=f"deploy_{os.path.basename(fixture).replace('.yaml', '')}",
-        )(fixture_file=fixture, skip_external_keeper=True)
+    With `--parallel-fixtures N` above 1, up to N fixtures run at once,
+    each in its own namespace. Fixtures start largest first and wait until
+    their estimated footprint fits into the cluster's allocatable resources.
+    """
+    workers = getattr(self.context, "parallel_fixtures", DEFAULT_PARALLEL_FIXTURES)
+
+    if workers <= 1:
+        for fixture in FIXTURES:
+            Scenario(
+                test=check_deployment,
+                name=f"deploy_{os.path.basename(fixture).replace('.yaml', '')}",
+            )(fixture_file=fixture, skip_external_keeper=True)
+        return
+
+    with Given("cluster resources available to fixtures"):
+        cpu, memory = kubernetes.get_allocatable_resources()
+        budget = ResourceBudget(cpu=cpu, memory=memory)
+        note(f"Allocatable: {cpu:.2f} CPU, {memory / 1024**3:.2f}GiB")
+
+    with And("fixtures ordered by resource footprint"):
+        tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        fixtures = sorted(
+            FIXTURES,
+            key=lambda f: HelmState(
+                os.path.join(tests_dir, f)
+            ).get_resource_footprint(),
+            reverse=True,
+        )
+
+    with Pool(workers) as executor:
+        for fixture in fixtures:
+            Scenario(
+                test=check_deployment,
+                name=f"deploy_{os.path.basename(fixture).replace('.yaml', '')}",
+                parallel=True,
+                executor=executor,
+            )(fixture_file=fixture, skip_external_keeper=True, budget=budget)
+        join()
 
 
 @TestFeature
@@ -192,6 +290,23 @@ def feature(self):
         minikube.setup_minikube_environment()
         kubernetes.use_context(context_name="minikube")
 
+    with And("pooled Kubernetes API connection"):
+        kubernetes.use_api_backend()
+
+    with And("pooled ClickHouse HTTP sessions"):
+        clickhouse.use_clickhouse_session_pool()
+
+    if getattr(self.context, "shared_operator", False):
+        with And("one ClickHouse Operator shared by all releases"):
+            helm.install_shared_operator()
+
     Feature(run=check_all_fixtures)
 
     Feature(run=check_all_upgrades)
+
+    with Finally("report time-to-ready of wait conditions"):
+        system.report_wait_times()
+
+    if getattr(self.context, "profile_report", None):
+        with Finally("write harness profile report"):
+            system.write_profile_report(path=self.context.profile_report)
@@ -0,0 +1,686 @@
+from tests.steps.system import *
+import os
+import shlex
+import hashlib
+import tests.steps.clickhouse as clickhouse
+import tests.steps.kubernetes as kubernetes
+
+# Database holding all benchmark tables, dropped when a benchmark ends
+BENCHMARK_DATABASE = "bench"
+
+# Placeholder of the ON CLUSTER clause in benchmark DDL, see cluster_query
+ON_CLUSTER = "{on_cluster}"
+
+# Columns of the insert benchmark table and the TSV rows written to it
+INSERT_COLUMNS = "id UInt64, ts DateTime, user_id UInt32, event LowCardinality(String), payload String"
+EVENTS = ("view", "click", "purchase", "signup")
+
+# Pod running the benchmark clients inside the cluster, next to ClickHouse
+BENCHMARK_CLIENT_POD = "bench-client"
+
+# Query benchmark dataset, filled from numbers() so every run reads the same data
+HITS_COLUMNS = "id UInt64, ts DateTime, user_id UInt32, event LowCardinality(String), url String, duration UInt32"
+USERS_COLUMNS = "user_id UInt32, country LowCardinality(String), signup Date"
+USERS = 100000
+
+# Query mix of the query benchmark. {id} and {digit} change with every
+# request so point lookups and filters don't always hit the same rows.
+QUERY_MIX = {
+    "point lookup": "SELECT * FROM bench.hits WHERE id = {id}",
+    "aggregation": "SELECT event, count(), avg(duration) FROM bench.hits_local "
+    "WHERE user_id % 10 = {digit} GROUP BY event",
+    "distributed group by": "SELECT url, count() AS hits, uniq(user_id) FROM bench.hits "
+    "GROUP BY url ORDER BY hits DESC LIMIT 10",
+    "join": "SELECT u.country, count(), avg(h.duration) FROM bench.hits AS h "
+    "GLOBAL INNER JOIN bench.users AS u ON h.user_id = u.user_id GROUP BY u.country",
+}
+
+
+def replicated_tables(state):
+    """Return whether the benchmark tables of a fixture are ReplicatedMergeTree.
+
+    They are when the fixture has Keeper, built-in or external.
+    """
+    return bool(
+        state.get_value("keeper.enabled") or state.get_value("clickhouse.keeper.host")
+    )
+
+
+def cluster_query(query, cluster, replicated=True):
+    """Return `query` with its ON_CLUSTER placeholder filled in.
+
+    Distributed DDL is coordinated through Keeper, so without it
+    (`replicated` False) the clause is left out and execute_on_cluster runs
+    the query on every pod instead.
+    """
+    clause = f" ON CLUSTER '{cluster}'" if replicated else ""
+    return query.replace(ON_CLUSTER, clause)
+
+
+def benchmark_table_ddl(
+    cluster, table, columns, order_by, replicated=True, sharding_key="rand()"
+):
+    """Return the queries creating a benchmark table, see create_benchmark_table.
+
+    The queries keep their ON_CLUSTER placeholder, see cluster_query.
+    """
+    local = f"{BENCHMARK_DATABASE}.{table}_local"
+    distributed = f"{BENCHMARK_DATABASE}.{table}"
+    engine = (
+        f"ReplicatedMergeTree('/clickhouse/tables/{{shard}}/{BENCHMARK_DATABASE}/{table}', '{{replica}}')"
+        if replicated
+        else "MergeTree"
+    )
+    return [
+        f"CREATE TABLE IF NOT EXISTS {local}{ON_CLUSTER} ({columns}) "
+        f"ENGINE = {engine} ORDER BY {order_by}",
+        f"CREATE TABLE IF NOT EXISTS {distributed}{ON_CLUSTER} AS {local} "
+        f"ENGINE = Distributed('{cluster}', {BENCHMARK_DATABASE}, {table}_local, {sharding_key})",
+    ]
+
+
+def insert_batch(batch_size, seed=0):
+    """Return `batch_size` deterministic TSV rows matching INSERT_COLUMNS."""
+    lines = []
+    for i in range(seed * batch_size, (seed + 1) * batch_size):
+        lines.append(
+            f"{i}\t{1700000000 + i % 86400}\t{i * 7919 % 100000}\t"
+            f"{EVENTS[i % len(EVENTS)]}\t{hashlib.md5(str(i).encode()).hexdigest()}\n"
+        )
+    return "".join(lines).encode("utf-8")
+
+
+def insert_batch_query(batch_size, seed=0):
+    """Return a clickhouse-local query printing the rows of insert_batch(batch_size, seed)."""
+    events = ", ".join(f"'{e}'" for e in EVENTS)
+    return (
+        f"SELECT number, 1700000000 + number % 86400, number * 7919 % 100000, "
+        f"[{events}][number % {len(EVENTS)} + 1], lower(hex(MD5(toString(number)))) "
+        f"FROM numbers({seed * batch_size}, {batch_size}) FORMAT TSV"
+    )
+
+
+def insert_clients_script(host, query, batch_size, clients, batches, admin_password):
+    """Return a shell script running `clients` concurrent clickhouse-client inserts.
+
+    The batches are written to files before the clock starts. The script
+    prints the start and end time, then the number of failed inserts and
+    the first error of each client.
+    """
+    password = shlex.quote(admin_password)
+    lines = ["set -u", "cd $(mktemp -d)"]
+    for n in range(clients):
+        lines.append(
+            f"clickhouse-local --query {shlex.quote(insert_batch_query(batch_size, n))} "
+            f"> batch-{n}.tsv"
+        )
+    lines.append("date +%s.%N")
+    for n in range(clients):
+        lines.append(
+            f"(errors=0; for b in $(seq {batches}); do "
+            f"clickhouse-client --host {host} --user default --password {password} "
+            f"--query {shlex.quote(query)} < batch-{n}.tsv 2>> errors-{n} "
+            f"|| errors=$((errors + 1)); done; echo $errors > count-{n}) &"
+        )
+    lines.append("wait")
+    lines.append("date +%s.%N")
+    for n in range(clients):
+        lines.append(f'cat count-{n}; echo "$(head -n 1 errors-{n} | cut -c 1-200)"')
+    return "\n".join(lines)
+
+
+def query_clients_script(host, template, rows, concurrency, iterations, admin_password):
+    """Return a shell script running a QUERY_MIX template with clickhouse-benchmark.
+
+    The `concurrency * iterations` queries are generated by clickhouse-local
+    before the clock starts, each with its own {id} and {digit}. The script
+    prints the start and end time, the clickhouse-benchmark JSON report on
+    one line and the first errors.
+    """
+    literal = template.replace("\\", "\\\\").replace("'", "\\'")
+    queries = (
+        f"SELECT replaceAll(replaceAll('{literal}', '{{id}}', toString(number * 7919 % {rows})), "
+        f"'{{digit}}', toString(number % 10)) "
+        f"FROM numbers({concurrency * iterations}) FORMAT TSVRaw"
+    )
+    password = shlex.quote(admin_password)
+    return "\n".join(
+        [
+            "set -u",
+            "cd $(mktemp -d)",
+            f"clickhouse-local --query {shlex.quote(queries)} > queries.sql",
+            "date +%s.%N",
+            f"clickhouse-benchmark --host {host} --user default --password {password} "
+            f"--concurrency {concurrency} --iterations {concurrency * iterations} "
+            "--delay 0 --continue_on_errors --json report.json "
+            "< queries.sql > /dev/null 2> errors",
+            "date +%s.%N",
+            "[ -s report.json ] || { cat errors >&2; exit 1; }",
+            "tr -d '\\n' < report.json; echo",
+            "grep -m 5 '^Code:' errors | cut -c 1-200",
+            "true",
+        ]
+    )
+
+
+@TestStep(When)
+def execute_on_cluster(
+    self, namespace, cluster, query, replicated=True, admin_password="", timeout=120
+):
+    """Run a DDL query on every node, retrying until the cluster accepts it.
+
+    With Keeper (`replicated`) the query runs ON CLUSTER from one pod,
+    without it the ON_CLUSTER placeholder is dropped and the query runs on
+    each pod in turn. Right after a deployment the cluster definition may
+    not have reached every node yet and ON CLUSTER queries fail until it has.
+    """
+    query = cluster_query(query, cluster=cluster, replicated=replicated)
+    pods = clickhouse.get_clickhouse_pods(namespace=namespace)
+    if replicated:
+        pods = pods[:1]
+
+    for pod_name in pods:
+
+        def check_query():
+            result = clickhouse.execute_clickhouse_query(
+                namespace=namespace,
+                pod_name=pod_name,
+                query=query,
+                password=admin_password,
+                check=False,
+            )
+            if result.returncode == 0:
+                return (True, result, "Query succeeded")
+            return (False, None, f"Query failed: {result.stderr.strip()[:100]}")
+
+        wait_until(
+            check_fn=check_query,
+            timeout=timeout,
+            interval=5,
+            timeout_msg=f"Query did not succeed on {pod_name}: {query.strip()[:100]}",
+            name="benchmark ddl",
+        )
+
+
+@TestStep(Given)
+def create_benchmark_database(
+    self, namespace, cluster, replicated=True, admin_password=""
+):
+    """Create the benchmark database on every node and drop it afterwards."""
+    execute_on_cluster(
+        namespace=namespace,
+        cluster=cluster,
+        query=f"CREATE DATABASE IF NOT EXISTS {BENCHMARK_DATABASE}{ON_CLUSTER}",
+        replicated=replicated,
+        admin_password=admin_password,
+    )
+
+    try:
+        yield BENCHMARK_DATABASE
+    finally:
+        with Finally("drop benchmark database"):
+            execute_on_cluster(
+                namespace=namespace,
+                cluster=cluster,
+                query=f"DROP DATABASE IF EXISTS {BENCHMARK_DATABASE}{ON_CLUSTER} SYNC",
+                replicated=replicated,
+                admin_password=admin_password,
+            )
+
+
+@TestStep(Given)
+def create_benchmark_table(
+    self,
+    namespace,
+    cluster,
+    table,
+    columns,
+    order_by,
+    replicated=True,
+    sharding_key="rand()",
+    admin_password="",
+):
+    """Create a (Replicated)MergeTree table on every node and a Distributed table over it.
+
+    Returns:
+        Name of the Distributed table, `<table>` (the local one is `<table>_local`)
+    """
+    for query in benchmark_table_ddl(
+        cluster=cluster,
+        table=table,
+        columns=columns,
+        order_by=order_by,
+        replicated=replicated,
+        sharding_key=sharding_key,
+    ):
+        execute_on_cluster(
+            namespace=namespace,
+            cluster=cluster,
+            query=query,
+            replicated=replicated,
+            admin_password=admin_password,
+        )
+
+    return f"{BENCHMARK_DATABASE}.{table}"
+
+
+@TestStep(Given)
+def create_benchmark_client(self, namespace, timeout=300):
+    """Start a pod with the ClickHouse image to run clients from inside the cluster.
+
+    Its clients reach ClickHouse through the cluster service DNS name like
+    applications do, not through one `kubectl port-forward`. The pod is
+    deleted afterwards.
+
+    Returns:
+        Name of the pod
+    """
+    image = kubernetes.get_pod_image(
+        namespace=namespace,
+        pod_name=clickhouse.get_clickhouse_pods(namespace=namespace)[0],
+    )
+    run(
+        cmd=f"kubectl run {BENCHMARK_CLIENT_POD} -n {namespace} --image={image} "
+        "--restart=Never --command -- sleep infinity"
+    )
+
+    try:
+        run(
+            cmd=f"kubectl wait pod/{BENCHMARK_CLIENT_POD} -n {namespace} "
+            f"--for=condition=Ready --timeout={timeout}s"
+        )
+        yield BENCHMARK_CLIENT_POD
+    finally:
+        with Finally("delete benchmark client pod"):
+            run(
+                cmd=f"kubectl delete pod {BENCHMARK_CLIENT_POD} -n {namespace} "
+                "--ignore-not-found --wait=false",
+                check=False,
+            )
+
+
+@TestStep(When)
+def get_cluster_service_host(self, namespace):
+    """Get the DNS name of the cluster service inside the cluster."""
+    service = clickhouse.get_cluster_service(namespace=namespace)
+    return f"{service}.{namespace}.svc"
+
+
+@TestStep(When)
+def get_table_stats(self, namespace, cluster, table, admin_password=""):
+    """Get parts, merges and inserted-part counters of a local table across the cluster.
+
+    Returns:
+        Dict with active_parts, rows, merges_in_progress, replication_queue
+        and parts_inserted (the NewPart entries of the table in
+        system.part_log of all nodes, so take the difference of two calls)
+    """
+    database, name = table.split(".")
+    execute_on_cluster(
+        namespace=namespace,
+        cluster=cluster,
+        query=f"SYSTEM FLUSH LOGS{ON_CLUSTER}",
+        admin_password=admin_password,
+    )
+    rows = clickhouse.select_rows(
+        namespace=namespace,
+        pod_name=clickhouse.get_clickhouse_pods(namespace=namespace)[0],
+        query=f"""
+        SELECT
+            (SELECT count() FROM clusterAllReplicas('{cluster}', system.parts)
+             WHERE database = '{database}' AND table = '{name}' AND active) AS active_parts,
+            (SELECT sum(rows) FROM clusterAllReplicas('{cluster}', system.parts)
+             WHERE database = '{database}' AND table = '{name}' AND active) AS rows,
+            (SELECT count() FROM clusterAllReplicas('{cluster}', system.merges)
+             WHERE database = '{database}' AND table = '{name}') AS merges_in_progress,
+            (SELECT count() FROM clusterAllReplicas('{cluster}', system.replication_queue)
+             WHERE database = '{database}' AND table = '{name}') AS replication_queue,
+            (SELECT count() FROM clusterAllReplicas('{cluster}', system.part_log)
+             WHERE database = '{database}' AND table = '{name}'
+               AND event_type = 'NewPart') AS parts_inserted
+        """,
+        password=admin_password,
+    )
+    assert rows, f"Failed to read table stats of {table}"
+    return {key: int(value or 0) for key, value in rows[0].items()}
+
+
+@TestStep(When)
+def run_concurrent_inserts(
+    self, namespace, table, batch_size, clients, batches, admin_password=""
+):
+    """Insert `batches` batches of `batch_size` rows from each of `clients` clients.
+
+    The clients are clickhouse-client processes in the benchmark client
+    pod, each inserting through the cluster service. Insert deduplication
+    is disabled so repeated batches are all written, and Distributed
+    inserts are synchronous so the timing includes the writes to shards.
+    Each batch is a new connection, so the timing includes the client
+    start-up.
+
+    Returns:
+        Dict with rows, bytes, errors and seconds of all inserts together
+    """
+    host = get_cluster_service_host(namespace=namespace)
+    query = (
+        f"INSERT INTO {table} "
+        "SETTINGS insert_deduplicate = 0, insert_distributed_sync = 1 FORMAT TSV"
+    )
+    script = insert_clients_script(
+        host=host,
+        query=query,
+        batch_size=batch_size,
+        clients=clients,
+        batches=batches,
+        admin_password=admin_password,
+    )
+
+    note(f"Inserting {clients} x {batches} batches of {batch_size} rows into {table}")
+    result = run(
+        cmd=f"kubectl exec -n {namespace} {BENCHMARK_CLIENT_POD} "
+        f"-- bash -c {shlex.quote(script)}"
+    )
+    lines = result.stdout.splitlines()
+    start_time, end_time = float(lines[0]), float(lines[1])
+    counts = lines[2:]
+    errors = sum(int(count) for count in counts[0::2])
+
+    for error in [e for e in counts[1::2] if e][:5]:
+        note(f"⚠ Insert failed: {error}")
+
+    batch_bytes = sum(len(insert_batch(batch_size, seed=n)) for n in range(clients))
+    return {
+        "rows": batch_size * batches * clients,
+        "bytes": batch_bytes * batches,
+        "errors": errors,
+        "seconds": end_time - start_time,
+    }
+
+
+@TestStep(Then)
+def run_insert_benchmark(
+    self, namespace, cluster, batch_sizes, clients, batches, admin_password=""
+):
+    """Measure insert throughput into a replicated table for each batch size.
+
+    The inserts run from the benchmark client pod, see create_benchmark_client.
+
+    Args:
+        namespace: Kubernetes namespace
+        cluster: ClickHouse cluster name
+        batch_sizes: Rows per INSERT, one run per size
+        clients: Number of concurrent inserting clients
+        batches: Number of batches each client inserts per run
+        admin_password: Password of the default user
+
+    Returns:
+        List of per batch size result dicts
+    """
+    table = create_benchmark_table(
+        namespace=namespace,
+        cluster=cluster,
+        table="events",
+        columns=INSERT_COLUMNS,
+        order_by="(event, ts, id)",
+        admin_password=admin_password,
+    )
+    local = f"{table}_local"
+
+    results = []
+    for batch_size in batch_sizes:
+        with By(f"inserting batches of {batch_size} rows"):
+            execute_on_cluster(
+                namespace=namespace,
+                cluster=cluster,
+                query=f"TRUNCATE TABLE {local}{ON_CLUSTER} SYNC",
+                admin_password=admin_password,
+            )
+            before = get_table_stats(
+                namespace=namespace,
+                cluster=cluster,
+                table=local,
+                admin_password=admin_password,
+            )
+            inserted = run_concurrent_inserts(
+                namespace=namespace,
+                table=table,
+                batch_size=batch_size,
+                clients=clients,
+                batches=batches,
+                admin_password=admin_password,
+            )
+            after = get_table_stats(
+                namespace=namespace,
+                cluster=cluster,
+                table=local,
+                admin_password=admin_password,
+            )
+
+        result = {
+            "batch_size": batch_size,
+            "clients": clients,
+            "batches": batches,
+            "rows": inserted["rows"],
+            "bytes": inserted["bytes"],
+            "errors": inserted["errors"],
+            "seconds": inserted["seconds"],
+            "rows_per_second": inserted["rows"] / inserted["seconds"],
+            "mb_per_second": inserted["bytes"] / inserted["seconds"] / 1024**2,
+            "parts_created": after["parts_inserted"] - before["parts_inserted"],
+            "active_parts": after["active_parts"],
+            "merges_in_progress": after["merges_in_progress"],
+            "replication_queue": after["replication_queue"],
+        }
+        note(
+            f"Batch {batch_size}: {result['rows_per_second']:,.0f} rows/s, "
+            f"{result['mb_per_second']:.1f} MB/s, {result['parts_created']} parts created, "
+            f"{result['active_parts']} active, {result['merges_in_progress']} merging, "
+            f"{result['replication_queue']} queued"
+        )
+        assert result["errors"] == 0, f"{result['errors']} inserts failed"
+        results.append(result)
+
+    return results
+
+
+@TestStep(Given)
+def load_query_dataset(
+    self, namespace, cluster, rows, replicated=True, admin_password=""
+):
+    """Create and fill the hits and users tables of the query benchmark.
+
+    Both are generated from numbers() by ClickHouse itself, so the same
+    `rows` always gives the same data, and sharded by their key.
+    """
+    hits = create_benchmark_table(
+        namespace=namespace,
+        cluster=cluster,
+        table="hits",
+        columns=HITS_COLUMNS,
+        order_by="id",
+        replicated=replicated,
+        sharding_key="id",
+        admin_password=admin_password,
+    )
+    users = create_benchmark_table(
+        namespace=namespace,
+        cluster=cluster,
+        table="users",
+        columns=USERS_COLUMNS,
+        order_by="user_id",
+        replicated=replicated,
+        sharding_key="user_id",
+        admin_password=admin_password,
+    )
+
+    pod_name = clickhouse.get_clickhouse_pods(namespace=namespace)[0]
+    events = ", ".join(f"'{e}'" for e in EVENTS)
+    for query in (
+        f"INSERT INTO {hits} SELECT number, toDateTime(1700000000 + number % 2592000), "
+        f"number * 7919 % {USERS}, [{events}][number % {len(EVENTS)} + 1], "
+        f"concat('/page/', toString(number % 1000)), number * 104729 % 10000 "
+        f"FROM numbers({rows}) SETTINGS insert_distributed_sync = 1",
+        f"INSERT INTO {users} SELECT number, ['US', 'DE', 'IN', 'BR', 'JP'][number % 5 + 1], "
+        f"toDate('2020-01-01') + number % 1000 "
+        f"FROM numbers({USERS}) SETTINGS insert_distributed_sync = 1",
+    ):
+        clickhouse.execute_clickhouse_query(
+            namespace=namespace,
+            pod_name=pod_name,
+            query=query,
+            password=admin_password,
+        )
+
+    if replicated:
+        for table in (hits, users):
+            execute_on_cluster(
+                namespace=namespace,
+                cluster=cluster,
+                query=f"SYSTEM SYNC REPLICA{ON_CLUSTER} {table}_local",
+                admin_password=admin_password,
+            )
+
+    note(f"✓ Loaded {rows} hits and {USERS} users")
+
+
+@TestStep(When)
+def run_query(
+    self, namespace, name, template, rows, concurrency, iterations, admin_password=""
+):
+    """Run one query of the mix from `concurrency` clients, `iterations` times each.
+
+    The clients are clickhouse-benchmark connections in the benchmark
+    client pod to the cluster service. Failed queries, timeouts and
+    connection errors included, are counted as errors and don't stop the
+    run.
+
+    Returns:
+        Dict with requests, errors, seconds, qps and the p50, p90 and p99
+        latency of successful requests in seconds
+    """
+    requests = concurrency * iterations
+    script = query_clients_script(
+        host=get_cluster_service_host(namespace=namespace),
+        template=template,
+        rows=rows,
+        concurrency=concurrency,
+        iterations=iterations,
+        admin_password=admin_password,
+    )
+
+    result = run(
+        cmd=f"kubectl exec -n {namespace} {BENCHMARK_CLIENT_POD} "
+        f"-- bash -c {shlex.quote(script)}"
+    )
+    lines = result.stdout.splitlines()
+    start_time, end_time = float(lines[0]), float(lines[1])
+    # One entry per host, the cluster service
+    (report,) = json.loads(lines[2]).values()
+    statistics = report["statistics"]
+    percentiles = report.get("query_time_percentiles", {})
+
+    for error in lines[3:]:
+        note(f"⚠ {name} failed: {error}")
+
+    result = {
+        "requests": requests,
+        "errors": requests - int(statistics["num_queries"]),
+        "seconds": end_time - start_time,
+        "qps": float(statistics["QPS"]),
+        "p50": float(percentiles.get("50", 0.0)),
+        "p90": float(percentiles.get("90", 0.0)),
+        "p99": float(percentiles.get("99", 0.0)),
+    }
+    note(
+        f"{name}: {result['qps']:.1f} qps, p50 {result['p50'] * 1000:.0f}ms, "
+        f"p90 {result['p90'] * 1000:.0f}ms, p99 {result['p99'] * 1000:.0f}ms"
+    )
+    return result
+
+
+@TestStep(Then)
+def run_query_benchmark(
+    self,
+    namespace,
+    cluster,
+    rows,
+    concurrency,
+    iterations,
+    replicated=True,
+    admin_password="",
+):
+    """Measure latency and throughput of each query of QUERY_MIX.
+
+    The queries run from the benchmark client pod, see create_benchmark_client.
+
+    Args:
+        namespace: Kubernetes namespace
+        cluster: ClickHouse cluster name
+        rows: Number of rows in the hits table
+        concurrency: Number of concurrent clients per query
+        iterations: Number of requests each client sends per query
+        replicated: Use ReplicatedMergeTree tables, needs Keeper
+        admin_password: Password of the default user
+
+    Returns:
+        Dict of query name to its run_query result, plus the parameters
+    """
+    load_query_dataset(
+        namespace=namespace,
+        cluster=cluster,
+        rows=rows,
+        replicated=replicated,
+        admin_password=admin_password,
+    )
+
+    results = {
+        "rows": rows,
+        "concurrency": concurrency,
+        "iterations": iterations,
+        "queries": {},
+    }
+    for name, template in QUERY_MIX.items():
+        with By(f"running {name} queries"):
+            results["queries"][name] = run_query(
+                namespace=namespace,
+                name=name,
+                template=template,
+                rows=rows,
+                concurrency=concurrency,
+                iterations=iterations,
+                admin_password=admin_password,
+            )
+
+    failed = {n: r["errors"] for n, r in results["queries"].items() if r["errors"]}
+    assert not failed, f"Queries failed: {failed}"
+    return results
+
+
+@TestStep(Finally)
+def write_benchmark_report(self, path, results):
+    """Write benchmark results as JSON to `path`, with the chart they ran against.
+
+    Args:
+        path: Report file
+        results: Dict of fixture name to its results
+    """
+    chart_path = getattr(self.context, "local_chart_path", None)
+    chart = {}
+    if chart_path:
+        with open(os.path.join(chart_path, "Chart.yaml"), "r") as f:
+            chart_info = yaml.safe_load(f)
+        chart = {
+            "name": chart_info.get("name"),
+            "version": chart_info.get("version"),
+            "appVersion": chart_info.get("appVersion"),
+        }
+
+    report = {
+        "chart": chart,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "fixtures": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    note(f"Benchmark results written to {path}")
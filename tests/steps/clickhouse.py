@@ -1,60 +1,764 @@
 from tests.steps.system import *
 import json
 import time
+import socket
+import threading
+import requests
 import tests.steps.kubernetes as kubernetes
 import re
+from tests.helpers.xmlindex import config_index
+from tests.helpers.stats import percentile, longest_gap
+from tests.helpers.defaults import (
+    DEFAULT_MAX_DOWNTIME,
+    DEFAULT_MIN_SUCCESS_RATE,
+    DEFAULT_MAX_P99_LATENCY,
+    DEFAULT_REPLICATION_LAG_SLO,
+    DEFAULT_KEEPER_KILL_CYCLES,
+)
+
+# Labels the operator puts on the pods and services it creates
+CHI_LABEL = "clickhouse.altinity.com/chi"
+CHK_LABEL = "clickhouse-keeper.altinity.com/cluster"
+CLUSTER_SERVICE_LABELS = {"clickhouse.altinity.com/Service": "chi"}
+CLUSTER_SERVICE_SELECTOR = ",".join(
+    f"{key}={value}" for key, value in CLUSTER_SERVICE_LABELS.items()
+)
+
+# Label the operator chart puts on the operator pod
+OPERATOR_SELECTOR = "app.kubernetes.io/name=altinity-clickhouse-operator"
+
+
+class ClickHouseSessionPool:
+    """Long-lived HTTP sessions to ClickHouse pods.
+
+    Each (namespace, target) gets one `kubectl port-forward` to the HTTP
+    interface and each (namespace, target, user) one keep-alive
+    requests.Session on top of it, so a query costs a single HTTP round trip
+    instead of a `kubectl exec` plus a clickhouse-client start in the pod.
+    A forward that died (e.g. its pod was restarted) is recreated once.
+    Forwards start under a lock of their own (namespace, target), so a slow
+    forward only holds up the queries to that target.
+    """
+
+    HTTP_PORT = 8123
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.forward_locks = {}
+        self.forwards = {}
+        self.sessions = {}
+
+    def forward(self, namespace, target, renew=False):
+        """Return a live port-forward to the HTTP port of the target."""
+        key = (namespace, target)
+        with self.lock:
+            forward_lock = self.forward_locks.setdefault(key, threading.Lock())
+
+        with forward_lock:
+            with self.lock:
+                forward = self.forwards.get(key)
+            if forward is not None and (renew or not forward.alive):
+                forward.close()
+                forward = None
+
+            if forward is None:
+                forward = kubernetes.PortForward(namespace, target, self.HTTP_PORT)
+                with self.lock:
+                    self.forwards[key] = forward
+
+            return forward
+
+    def session(self, namespace, target, user):
+        """Return the keep-alive session of a user for the target."""
+        with self.lock:
+            return self.sessions.setdefault(
+                (namespace, target, user), requests.Session()
+            )
+
+    def execute(self, namespace, target, query, user="default", password="", data=None):
+        """Execute a query and return a CompletedProcess like `run` does.
+
+        Without `data` the query is sent as the request body, with `data`
+        the query goes into the URL and `data` is sent as the body
+        (e.g. `INSERT ... FORMAT TSV` rows).
+        """
+        session = self.session(namespace, target, user)
+        headers = {"X-ClickHouse-User": user, "X-ClickHouse-Key": password}
+        params = {"wait_end_of_query": "1"}
+        if data is None:
+            body = query.encode("utf-8")
+        else:
+            params["query"] = query
+            body = data
+
+        start_time = time.time()
+        for renew in (False, True):
+            forward = self.forward(namespace, target, renew=renew)
+            try:
+                response = session.post(
+                    f"http://127.0.0.1:{forward.local_port}/",
+                    params=params,
+                    data=body,
+                    headers=headers,
+                    timeout=300,
+                )
+                break
+            except requests.ConnectionError:
+                if renew:
+                    raise
+
+        record_call(
+            family="clickhouse http",
+            wall_time=time.time() - start_time,
+            stdout_bytes=len(response.content),
+        )
+
+        ok = response.status_code == 200
+        return subprocess.CompletedProcess(
+            args=query,
+            returncode=0 if ok else 1,
+            stdout=response.text if ok else "",
+            stderr="" if ok else response.text,
+        )
 
+    def close_namespace(self, namespace):
+        """Close the forwards and sessions of a namespace, e.g. after deleting it."""
+        with self.lock:
+            forwards = [
+                self.forwards.pop(key)
+                for key in list(self.forwards)
+                if key[0] == namespace
+            ]
+            sessions = [
+                self.sessions.pop(key)
+                for key in list(self.sessions)
+                if key[0] == namespace
+            ]
+        for session in sessions:
+            session.close()
+        for forward in forwards:
+            forward.close()
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            for forward in self.forwards.values():
+                forward.close()
+            self.sessions.clear()
+            self.forwards.clear()
+
+
+@TestStep(Given)
+def use_clickhouse_session_pool(self):
+    """Run ClickHouse queries over pooled port-forwarded HTTP sessions.
+
+    Queries fall back to `kubectl exec` for any pod the pool can't reach.
+    """
+    pool = ClickHouseSessionPool()
+    self.context.clickhouse_pool = pool
+
+    try:
+        yield pool
+    finally:
+        with Finally("close ClickHouse sessions"):
+            self.context.clickhouse_pool = None
+            pool.close()
 
-def wait_until(check_fn, timeout=60, interval=5, timeout_msg="Operation timed out"):
-    """Generic retry helper that waits until a condition is met.
+
+class AvailabilityProber:
+    """Steady stream of writes and reads against every ClickHouse pod.
+
+    Runs in background threads between `start` and `stop`. Every
+    `interval` seconds it inserts a row into a probe table and reads the
+    row count back on each running ClickHouse pod, over one `kubectl
+    port-forward` per pod. The cluster service balances clients over the
+    same pods, so the cluster counts as available while any pod answers;
+    a single forward to the service would be pinned to one pod and report
+    that pod's restart as downtime. Pods are looked up again every
+    `refresh` seconds, so pods replaced or renamed by the upgrade are
+    probed too. Every request, failed or not, is recorded with its pod,
+    start time and latency.
 
     Args:
-        check_fn: Function that returns (success: bool, result: any, status_msg: str)
-        timeout: Maximum time to wait in seconds
-        interval: Time between retries in seconds
-        timeout_msg: Error message if timeout occurs
+        namespace: Kubernetes namespace
+        passwords: Passwords of `user` to try in turn, e.g. the ones
+            before and after an upgrade that changes it
+        user: ClickHouse user
+        interval: Time between probes of a pod in seconds
+        timeout: Request timeout in seconds
+        refresh: Time between pod lookups in seconds
+    """
 
-    Returns:
-        The result from check_fn when successful
+    HTTP_PORT = 8123
+    TABLE = "default.availability_probe"
+
+    def __init__(
+        self,
+        namespace,
+        passwords=("",),
+        user="default",
+        interval=0.2,
+        timeout=2,
+        refresh=1.0,
+    ):
+        self.namespace = namespace
+        self.passwords = list(passwords) or [""]
+        self.user = user
+        self.interval = interval
+        self.timeout = timeout
+        self.refresh = refresh
+        self.pods = set()
+        self.probers = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.samples = []
+        self.start_time = self.end_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.start_time = time.time()
+        self.thread.start()
+
+    def stop(self):
+        """Stop probing, drop the probe table and return the report (see `report`)."""
+        self.stopped.set()
+        self.thread.join()
+        for thread in self.probers.values():
+            thread.join()
+        self.end_time = time.time()
+        self.drop_table()
+        return self.report()
+
+    def list_pods(self):
+        """Return the names of the running ClickHouse pods.
+
+        Raises:
+            subprocess.CalledProcessError: If kubectl fails, so callers keep
+                the pods they know instead of taking an empty list
+        """
+        r = subprocess.run(
+            [
+                "kubectl",
+                "get",
+                "pods",
+                "-n",
+                self.namespace,
+                "-l",
+                CHI_LABEL,
+                "--field-selector=status.phase=Running",
+                "-o",
+                "jsonpath={.items[*].metadata.name}",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=True,
+        )
+        return set(r.stdout.split())
 
-    Raises:
-        TimeoutError: If condition not met within timeout
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.pods = self.list_pods()
+            except subprocess.SubprocessError:
+                pass
+            for pod in self.pods:
+                thread = self.probers.get(pod)
+                if thread is None or not thread.is_alive():
+                    thread = threading.Thread(
+                        target=self.run_pod, args=(pod,), daemon=True
+                    )
+                    self.probers[pod] = thread
+                    thread.start()
+            self.stopped.wait(self.refresh)
+
+    def run_pod(self, pod):
+        """Probe one pod until probing stops or the pod is gone."""
+        connection = PodConnection(self, pod)
+        seq = 0
+        try:
+            while not self.stopped.is_set() and pod in self.pods:
+                tick = time.time()
+                seq += 1
+                self.probe(
+                    connection,
+                    "write",
+                    f"INSERT INTO {self.TABLE} FORMAT TSV",
+                    data=f"{tick:.3f}\t{seq}\n",
+                )
+                self.probe(connection, "read", f"SELECT count() FROM {self.TABLE}")
+                self.stopped.wait(max(0.0, tick + self.interval - time.time()))
+        finally:
+            connection.close()
+
+    def probe(self, connection, kind, query, data=None):
+        """Run one request and record it as a (start time, pod, kind, ok, latency) sample.
+
+        The port-forward is opened before the clock starts, so latency is
+        that of the request alone. A forward that can't be opened counts as
+        a failed request.
+        """
+        start_time = time.time()
+        try:
+            connection.open()
+            start_time = time.time()
+            connection.query(query, data=data)
+            ok = True
+        except (RuntimeError, requests.RequestException, subprocess.SubprocessError):
+            ok = False
+            connection.reset()
+        self.samples.append(
+            (start_time, connection.pod, kind, ok, time.time() - start_time)
+        )
+        return ok
+
+    def drop_table(self):
+        """Drop the probe table on every ClickHouse pod, ignoring pods that fail."""
+        try:
+            pods = self.list_pods()
+        except subprocess.SubprocessError:
+            return
+        for pod in sorted(pods):
+            connection = PodConnection(self, pod)
+            try:
+                connection.open()
+                connection.post(f"DROP TABLE IF EXISTS {self.TABLE} SYNC")
+            except (
+                RuntimeError,
+                requests.RequestException,
+                subprocess.SubprocessError,
+            ):
+                pass
+            finally:
+                connection.close()
+
+    def report(self):
+        """Return the probe results as a dict.
+
+        duration, requests and failures cover every request to every pod.
+        The cluster is taken as available in a second if any pod answered a
+        request started in it: success_rate is the share of available
+        seconds, available the per-second flags and per_second the share of
+        successful requests of each second since the start, seconds without
+        a request counting as unavailable. latency holds the p50/p99 of
+        successful requests in seconds overall and per kind, and longest_gap
+        the longest time in seconds without any pod answering.
+        """
+        samples = list(self.samples)
+        end_time = self.end_time or time.time()
+        duration = end_time - self.start_time
+        succeeded = [s for s in samples if s[3]]
+
+        seconds = [(0, 0)] * (int(duration) + 1)
+        for start_time, _, _, ok, _ in samples:
+            second = min(int(start_time - self.start_time), len(seconds) - 1)
+            total, good = seconds[second]
+            seconds[second] = (total + 1, good + ok)
+        available = [good > 0 for _, good in seconds]
+
+        latency = {}
+        for kind in ("all", "write", "read"):
+            values = [s[4] for s in succeeded if kind in ("all", s[2])]
+            latency[kind] = {
+                "p50": percentile(values, 50),
+                "p99": percentile(values, 99),
+            }
+
+        return {
+            "duration": duration,
+            "pods": sorted({s[1] for s in samples}),
+            "requests": len(samples),
+            "failures": len(samples) - len(succeeded),
+            "success_rate": sum(available) / len(available),
+            "available": available,
+            "per_second": [good / total if total else 0.0 for total, good in seconds],
+            "latency": latency,
+            "longest_gap": longest_gap(
+                [s[0] + s[4] for s in succeeded], self.start_time, end_time
+            ),
+        }
+
+
+class PodConnection:
+    """HTTP connection of an AvailabilityProber to one pod.
+
+    The port-forward is opened on first use and again after it died, e.g.
+    when the pod restarted, and the probe table is created before the
+    first probe query.
     """
-    start_time = time.time()
 
-    while True:
-        success, result, status_msg = check_fn()
+    def __init__(self, prober, pod):
+        self.prober = prober
+        self.pod = pod
+        self.passwords = list(prober.passwords)
+        self.forward = None
+        self.table = False
+        self.session = requests.Session()
+
+    def open(self):
+        """Open the port-forward to the pod unless it is alive."""
+        if self.forward is not None and self.forward.alive:
+            return
+        self.reset()
+        self.forward = kubernetes.PortForward(
+            self.prober.namespace,
+            f"pod/{self.pod}",
+            self.prober.HTTP_PORT,
+            startup_timeout=5,
+        )
 
-        if success:
-            return result
+    def query(self, query, data=None):
+        """Run a probe query on the pod, creating the probe table first if needed.
+
+        Raises:
+            RuntimeError: If ClickHouse returns an error
+            requests.RequestException: If the forward can't be reached
+        """
+        self.open()
+        if not self.table:
+            self.post(
+                f"CREATE TABLE IF NOT EXISTS {self.prober.TABLE} "
+                "(ts DateTime64(3), seq UInt64) ENGINE = MergeTree ORDER BY ts"
+            )
+            self.table = True
+        return self.post(query, data=data)
+
+    def post(self, query, data=None):
+        """Send a query through the forward, trying each password in turn."""
+        params = {"wait_end_of_query": "1"}
+        if data is not None:
+            params["query"] = query
+
+        for _ in self.passwords:
+            response = self.session.post(
+                f"http://127.0.0.1:{self.forward.local_port}/",
+                params=params,
+                data=(query if data is None else data).encode("utf-8"),
+                headers={
+                    "X-ClickHouse-User": self.prober.user,
+                    "X-ClickHouse-Key": self.passwords[0],
+                },
+                timeout=self.prober.timeout,
+            )
+            if "AUTHENTICATION_FAILED" not in response.text:
+                break
+            self.passwords.append(self.passwords.pop(0))
+
+        if response.status_code != 200:
+            raise RuntimeError(response.text.strip())
+        return response.text
+
+    def reset(self):
+        """Close the port-forward if it died, so the next query reopens it."""
+        if self.forward is not None and not self.forward.alive:
+            self.forward.close()
+            self.forward = None
+            self.table = False
+
+    def close(self):
+        if self.forward is not None:
+            self.forward.close()
+            self.forward = None
+        self.session.close()
+
+
+class KeeperMonitor:
+    """Mode of every Keeper pod over time, from the `srvr` four-letter word.
 
-        if time.time() - start_time > timeout:
-            raise TimeoutError(f"{timeout_msg}. Last status: {status_msg}")
+    Runs one background thread per pod between `start` and `stop`, each
+    asking its pod every `interval` seconds through a `kubectl
+    port-forward` to its client port, so a pod that hangs doesn't delay
+    the polls of the others. Every answer is recorded with the time it
+    was received. A pod that doesn't answer (e.g. while it restarts) has
+    mode None and its forward is recreated on the next poll.
 
-        if status_msg:
-            note(status_msg)
-        time.sleep(interval)
+    Args:
+        namespace: Kubernetes namespace
+        pods: Keeper pod names
+        interval: Time between polls of a pod in seconds
+    """
+
+    CLIENT_PORT = 2181
+
+    def __init__(self, namespace, pods, interval=0.2):
+        self.namespace = namespace
+        self.pods = list(pods)
+        self.interval = interval
+        self.forwards = {}
+        self.polls = []
+        self.stopped = threading.Event()
+        self.threads = [
+            threading.Thread(target=self.run, args=(pod,), daemon=True)
+            for pod in self.pods
+        ]
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        for forward in self.forwards.values():
+            forward.close()
+
+    def mode(self, pod):
+        """Return the mode of a pod ("leader", "follower", ...) or None."""
+        try:
+            forward = self.forwards.get(pod)
+            if forward is None or not forward.alive:
+                if forward is not None:
+                    self.forwards.pop(pod).close()
+                forward = self.forwards[pod] = kubernetes.PortForward(
+                    self.namespace, f"pod/{pod}", self.CLIENT_PORT, startup_timeout=5
+                )
+            with socket.create_connection(
+                ("127.0.0.1", forward.local_port), timeout=1
+            ) as s:
+                s.sendall(b"srvr")
+                response = b"".join(iter(lambda: s.recv(4096), b"")).decode()
+        except (OSError, RuntimeError):
+            forward = self.forwards.pop(pod, None)
+            if forward is not None:
+                forward.close()
+            return None
+
+        match = re.search(r"^Mode:\s*(\w+)", response, re.MULTILINE)
+        return match.group(1) if match else None
+
+    def run(self, pod):
+        while not self.stopped.is_set():
+            tick = time.time()
+            mode = self.mode(pod)
+            self.polls.append((time.time(), pod, mode))
+            self.stopped.wait(max(0.0, tick + self.interval - time.time()))
+
+    def states(self, since=0):
+        """Yield (time, {pod: mode}) after every poll after `since`.
+
+        A pod is in the modes once it was polled after `since`, with the
+        mode of its latest poll.
+        """
+        modes = {}
+        for polled_at, pod, mode in sorted(self.polls, key=lambda poll: poll[0]):
+            if polled_at < since:
+                continue
+            modes[pod] = mode
+            yield polled_at, dict(modes)
+
+    def leader(self, since=0):
+        """Return the only pod whose latest poll after `since` says leader, or None."""
+        modes = {}
+        for polled_at, pod, mode in sorted(self.polls, key=lambda poll: poll[0]):
+            if polled_at >= since:
+                modes[pod] = mode
+        leaders = [pod for pod, mode in modes.items() if mode == "leader"]
+        return leaders[0] if len(leaders) == 1 else None
+
+    def leader_elected(self, since, old_leader):
+        """Return when a pod other than `old_leader` was first seen leading after `since`."""
+        for polled_at, modes in self.states(since):
+            if any(m == "leader" and p != old_leader for p, m in modes.items()):
+                return polled_at
+        return None
+
+    def first_healthy(self, since):
+        """Return when every pod was first seen up with one leader after `since`."""
+        for polled_at, modes in self.states(since):
+            states = [modes.get(pod) for pod in self.pods]
+            if None not in states and states.count("leader") == 1:
+                return polled_at
+        return None
+
+
+class ContinuousWriter:
+    """Inserts one row every `interval` seconds in a background thread.
+
+    Every insert is recorded as a (start time, latency, ok) sample.
+
+    Args:
+        url: HTTP interface of a ClickHouse pod
+        table: Table with an `id` UInt64 and a `ts` DateTime64(3) column
+        password: Password of the default user
+        interval: Time between inserts in seconds
+        timeout: Insert timeout in seconds
+    """
+
+    def __init__(self, url, table, password="", interval=0.05, timeout=30):
+        self.url = url
+        self.table = table
+        self.password = password
+        self.interval = interval
+        self.timeout = timeout
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        with requests.Session() as session:
+            seq = 0
+            while not self.stopped.is_set():
+                seq += 1
+                start_time = time.time()
+                try:
+                    response = session.post(
+                        self.url,
+                        data=f"INSERT INTO {self.table} VALUES ({seq}, now64(3))",
+                        headers={
+                            "X-ClickHouse-User": "default",
+                            "X-ClickHouse-Key": self.password,
+                        },
+                        timeout=self.timeout,
+                    )
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                self.samples.append((start_time, time.time() - start_time, ok))
+                self.stopped.wait(max(0.0, start_time + self.interval - time.time()))
+
+    def report(self, start, end, stall=1.0):
+        """Summarize the inserts started between `start` and `end`.
+
+        Returns:
+            Dict with inserts, failures, max_latency, the longest gap
+            between successful inserts (write_stall), the time from `start`
+            until the first success after the last failed or stalled
+            insert (recovery, 0 if there was none) and per_second, a list
+            of [second, inserts, failures, max latency] since `start`
+        """
+        samples = [s for s in self.samples if start <= s[0] <= end]
+        succeeded = [s for s in samples if s[2]]
+        bad = [s for s in samples if not s[2] or s[1] > stall]
+
+        recovery = 0.0
+        if bad:
+            last_bad = bad[-1][0]
+            after = [s for s in succeeded if s[0] > last_bad and s[1] <= stall]
+            recovery = (after[0][0] + after[0][1] - start) if after else end - start
+
+        seconds = {}
+        for start_time, latency, ok in samples:
+            second = seconds.setdefault(int(start_time - start), [0, 0, 0.0])
+            second[0] += 1
+            second[1] += not ok
+            second[2] = max(second[2], latency)
+
+        return {
+            "inserts": len(samples),
+            "failures": len(samples) - len(succeeded),
+            "max_latency": max((s[1] for s in samples), default=0.0),
+            "write_stall": longest_gap([s[0] + s[1] for s in succeeded], start, end),
+            "recovery": recovery,
+            "per_second": [[n] + v for n, v in sorted(seconds.items())],
+        }
+
+
+@TestStep(Then)
+def verify_availability(
+    self,
+    report,
+    max_downtime=DEFAULT_MAX_DOWNTIME,
+    min_success_rate=DEFAULT_MIN_SUCCESS_RATE,
+    max_p99_latency=DEFAULT_MAX_P99_LATENCY,
+):
+    """Check an AvailabilityProber report against availability budgets.
+
+    Args:
+        report: AvailabilityProber report
+        max_downtime: Longest allowed time without a successful request, in seconds
+        min_success_rate: Lowest allowed share of seconds in which a pod answered
+        max_p99_latency: Highest allowed p99 latency of successful requests, in seconds
+    """
+    latency = report["latency"]["all"]
+    note(
+        f"Availability over {report['duration']:.1f}s: "
+        f"{sum(report['available'])}/{len(report['available'])} seconds available "
+        f"({report['success_rate']:.1%}), "
+        f"{report['requests'] - report['failures']}/{report['requests']} requests ok "
+        f"on {len(report['pods'])} pods, longest gap {report['longest_gap']:.2f}s, "
+        f"p50 {latency['p50'] * 1000:.0f}ms, p99 {latency['p99'] * 1000:.0f}ms"
+    )
+    note(
+        "Success rate per second: "
+        + " ".join(f"{rate:.0%}" for rate in report["per_second"])
+    )
+
+    assert (
+        report["longest_gap"] <= max_downtime
+    ), f"Unavailable for {report['longest_gap']:.2f}s, budget is {max_downtime}s"
+    assert (
+        report["success_rate"] >= min_success_rate
+    ), f"Available {report['success_rate']:.1%} of the time, budget is {min_success_rate:.1%}"
+    assert (
+        latency["p99"] <= max_p99_latency
+    ), f"p99 latency {latency['p99']:.3f}s, budget is {max_p99_latency}s"
+    note(f"✓ Availability within budgets")
 
 
 @TestStep(When)
 def get_version(self, namespace, pod_name, user="default", password=""):
     """Get ClickHouse version from the specified pod."""
-    auth_args = f"-u {user}" if user else ""
-    if password:
-        auth_args += f" --password {password}"
-
-    version = run(
-        cmd=f"kubectl exec -n {namespace} {pod_name} "
-        f"-- clickhouse-client {auth_args} -q 'SELECT version()'"
+    version = execute_clickhouse_query(
+        namespace=namespace,
+        pod_name=pod_name,
+        query="SELECT version()",
+        user=user,
+        password=password,
     )
     return version.stdout.strip()
 
 
 @TestStep(When)
 def execute_clickhouse_query(
-    self, namespace, pod_name, query, user="default", password="", check=True
+    self,
+    namespace,
+    pod_name,
+    query,
+    user="default",
+    password="",
+    check=True,
+    quiet=False,
 ):
-    """Execute a ClickHouse query on a specific pod."""
+    """Execute a ClickHouse query on a specific pod.
+
+    Uses the session pool when one is set up, `kubectl exec` otherwise.
+    With `quiet`, nothing is noted, e.g. for queries polled many times.
+    """
+    pool = getattr(self.context, "clickhouse_pool", None)
+
+    if pool is not None:
+        if not quiet:
+            note(f"> [{namespace}/{pod_name}] {query.strip()}")
+        try:
+            result = pool.execute(
+                namespace, f"pod/{pod_name}", query, user=user, password=password
+            )
+        except (RuntimeError, requests.RequestException) as e:
+            if not quiet:
+                note(f"⚠ Session pool can't reach {pod_name}, using kubectl exec: {e}")
+        else:
+            if check and result.returncode != 0:
+                note(result.stderr)
+                sys.exit(result.returncode)
+            return result
+
     auth_args = f"-u {user}" if user else ""
     if password:
         auth_args += f" --password {password}"
@@ -65,18 +769,40 @@ def execute_clickhouse_query(
         cmd=f"kubectl exec -n {namespace} {pod_name} "
         f"-- clickhouse-client {auth_args} -q '{escaped_query}'",
         check=check,
+        quiet=quiet,
     )
     return result
 
 
+@TestStep(When)
+def select_rows(self, namespace, pod_name, query, user="default", password=""):
+    """Run a SELECT with FORMAT JSON appended and return its rows as dicts.
+
+    Returns None if the query failed.
+    """
+    result = execute_clickhouse_query(
+        namespace=namespace,
+        pod_name=pod_name,
+        query=f"{query} FORMAT JSON",
+        user=user,
+        password=password,
+        check=False,
+    )
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout).get("data", [])
+
+
 @TestStep(When)
 def test_clickhouse_connection(self, namespace, pod_name, user, password):
     """Test ClickHouse connection with given credentials."""
     try:
-        result = run(
-            cmd=f"kubectl exec -n {namespace} {pod_name} "
-            f"-- clickhouse-client -u {user} --password {password} "
-            f"-q 'SELECT 1'",
+        result = execute_clickhouse_query(
+            namespace=namespace,
+            pod_name=pod_name,
+            query="SELECT 1",
+            user=user,
+            password=password,
             check=False,
         )
         return result.returncode == 0
@@ -87,30 +813,42 @@ def test_clickhouse_connection(self, namespace, pod_name, user, password):
 @TestStep(When)
 def get_chi_name(self, namespace):
     """Get the name of the ClickHouseInstallation resource."""
-    chi_info = run(cmd=f"kubectl get chi -n {namespace} -o json")
-    chi_info = json.loads(chi_info.stdout)
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    chis = snapshot.names("chi")
 
-    if chi_info["items"]:
-        return chi_info["items"][0]["metadata"]["name"]
+    if chis:
+        return chis[0]
     return None
 
 
 @TestStep(When)
 def get_chi_info(self, namespace):
     """Get the full ClickHouseInstallation resource information."""
-    chi_info = run(cmd=f"kubectl get chi -n {namespace} -o json")
-    chi_info = json.loads(chi_info.stdout)
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    chis = snapshot.list("chi")
 
-    if chi_info["items"]:
-        return chi_info["items"][0]
+    if chis:
+        return chis[0]
     return None
 
 
+@TestStep(When)
+def get_cluster_service(self, namespace):
+    """Get the name of the service the operator creates for the whole CHI."""
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    services = snapshot.names("svc", labels=CLUSTER_SERVICE_LABELS)
+
+    assert services, f"No ClickHouse cluster service found in {namespace}"
+    return services[0]
+
+
 @TestStep(When)
 def get_clickhouse_pods(self, namespace):
-    """Get ClickHouse pods (excluding operator pods)."""
-    pods = kubernetes.get_pods(namespace=namespace)
-    return [p for p in pods if "chi-" in p and "operator" not in p]
+    """Get the sorted names of the pods the operator created for a CHI."""
+    pods = kubernetes.list_resources(
+        kind="pod", namespace=namespace, label_selector=CHI_LABEL
+    )
+    return sorted(p["metadata"]["name"] for p in pods)
 
 
 @TestStep(When)
@@ -135,12 +873,11 @@ def get_ready_clickhouse_pod(self, namespace):
 
 @TestStep(When)
 def get_operator_pod(self, namespace):
-    """Get the ClickHouse Operator pod.
-
-    Returns the operator pod name (excludes CHI pods).
-    """
-    pods = kubernetes.get_pods(namespace=namespace)
-    operator_pods = [p for p in pods if "operator" in p and "chi-" not in p]
+    """Get the name of the ClickHouse Operator pod, selected by its chart label."""
+    pods = kubernetes.list_resources(
+        kind="pod", namespace=namespace, label_selector=OPERATOR_SELECTOR
+    )
+    operator_pods = sorted(p["metadata"]["name"] for p in pods)
 
     if not operator_pods:
         raise AssertionError("No Operator pod found in namespace")
@@ -153,7 +890,11 @@ def wait_for_clickhouse_pods_running(self, namespace, expected_count=None, timeo
     """Wait for ClickHouse pods to be running and ready."""
 
     def check_pods():
-        clickhouse_pods = get_clickhouse_pods(namespace=namespace)
+        pods = kubernetes.list_resources(
+            kind="pod", namespace=namespace, label_selector=CHI_LABEL
+        )
+        pods = {p["metadata"]["name"]: p for p in pods}
+        clickhouse_pods = sorted(pods)
 
         if len(clickhouse_pods) == 0:
             return (False, None, "No ClickHouse pods found yet")
@@ -165,12 +906,11 @@ def wait_for_clickhouse_pods_running(self, namespace, expected_count=None, timeo
                 f"Expected {expected_count} pods, found {len(clickhouse_pods)}",
             )
 
-        not_running = []
-        for pod in clickhouse_pods:
-            if not kubernetes.check_status(
-                pod_name=pod, namespace=namespace, status="Running"
-            ):
-                not_running.append(pod)
+        not_running = [
+            pod
+            for pod in clickhouse_pods
+            if not kubernetes.is_pod_ready(pods[pod], status="Running")
+        ]
 
         if not_running:
             return (False, None, f"Waiting for {len(not_running)} pod(s) to be running")
@@ -182,6 +922,73 @@ def wait_for_clickhouse_pods_running(self, namespace, expected_count=None, timeo
         timeout=timeout,
         interval=10,
         timeout_msg="ClickHouse pods not ready",
+        name="clickhouse pods running",
+    )
+
+
+@TestStep(When)
+def get_chi_reconciles(self, namespace):
+    """Get the generation and last reconcile task of every ClickHouseInstallation.
+
+    Returns:
+        Dict of CHI name to (metadata.generation, status.taskID)
+    """
+    return {
+        chi["metadata"]["name"]: (
+            chi["metadata"].get("generation"),
+            (chi.get("status") or {}).get("taskID"),
+        )
+        for chi in kubernetes.list_resources(kind="chi", namespace=namespace)
+    }
+
+
+@TestStep(When)
+def wait_for_chi_completed(self, namespace, previous=None, timeout=600):
+    """Wait until the operator reports every ClickHouseInstallation as Completed.
+
+    Right after a change the status can still be the Completed of the
+    previous reconcile. With `previous`, taken with `get_chi_reconciles`
+    before the change, a CHI whose generation changed must also report a
+    new reconcile task.
+
+    Args:
+        namespace: Kubernetes namespace
+        previous: Dict of CHI name to (generation, taskID) before the change
+        timeout: Maximum time to wait in seconds
+    """
+    previous = previous or {}
+
+    def check_status():
+        chis = kubernetes.list_resources(kind="chi", namespace=namespace)
+        if not chis:
+            return (False, None, "No ClickHouseInstallation found yet")
+
+        statuses = {}
+        pending = {}
+        for chi in chis:
+            name = chi["metadata"]["name"]
+            status = chi.get("status") or {}
+            statuses[name] = status.get("status")
+            generation, task_id = previous.get(name, (None, None))
+            if statuses[name] != "Completed":
+                pending[name] = statuses[name]
+            elif (
+                name in previous
+                and chi["metadata"].get("generation") != generation
+                and status.get("taskID") == task_id
+            ):
+                pending[name] = f"Completed by previous task {task_id}"
+        if pending:
+            return (False, None, f"Waiting for reconcile: {pending}")
+
+        return (True, statuses, "All ClickHouseInstallations completed")
+
+    return wait_until(
+        check_fn=check_status,
+        timeout=timeout,
+        interval=10,
+        timeout_msg="ClickHouseInstallation not reconciled",
+        name="chi completed",
     )
 
 
@@ -204,22 +1011,37 @@ def verify_clickhouse_version(
 
 
 @TestStep(When)
-def verify_custom_name_in_resources(self, namespace, custom_name):
-    """Verify that custom name appears in ClickHouse resources."""
-    chi_name = get_chi_name(namespace=namespace)
+def verify_custom_name_in_resources(self, namespace, custom_name, chi_info=None):
+    """Verify that custom name appears in ClickHouse resources.
+
+    Pass `chi_info` to only check the name of a rendered CHI.
+    """
+    if chi_info is not None:
+        chi_name = chi_info["metadata"]["name"]
+    else:
+        chi_name = get_chi_name(namespace=namespace)
     assert (
         custom_name in chi_name
     ), f"Custom name '{custom_name}' not found in CHI name: {chi_name}"
 
+    if chi_info is not None:
+        return
+
     clickhouse_pods = get_clickhouse_pods(namespace=namespace)
     assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
     note(f"ClickHouse pods created: {clickhouse_pods}")
 
 
 @TestStep(When)
-def verify_persistence_configuration(self, namespace, expected_size="10Gi"):
-    """Verify persistence configuration in ClickHouseInstallation."""
-    chi_info = get_chi_info(namespace=namespace)
+def verify_persistence_configuration(
+    self, namespace, expected_size="10Gi", chi_info=None
+):
+    """Verify persistence configuration in ClickHouseInstallation.
+
+    Pass `chi_info` to check a rendered CHI instead of the live one.
+    """
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     volume_claim_templates = (
@@ -256,6 +1078,7 @@ def verify_extra_container_data_mount(
     container_name: str,
     expected_volume_name: str = None,
     expected_mount_path: str = "/var/lib/clickhouse",
+    chi_info: dict = None,
 ):
     """Verify an extra container has the ClickHouse data volume mounted in CHI spec.
 
@@ -269,8 +1092,11 @@ def verify_extra_container_data_mount(
     If expected_volume_name is None, it will be extracted from the
     ClickHouseInstallation defaults/templates or, as a fallback, from the
     main ClickHouse container's volumeMounts.
+
+    Pass `chi_info` to check a rendered CHI instead of the live one.
     """
-    chi_info = get_chi_info(namespace=namespace)
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     pod_templates = (
@@ -334,9 +1160,15 @@ def verify_extra_container_data_mount(
 
 
 @TestStep(Then)
-def verify_extra_container_spec(self, namespace: str, expected_container: dict):
-    """Verify an extra container spec is present in CHI pod templates."""
-    chi_info = get_chi_info(namespace=namespace)
+def verify_extra_container_spec(
+    self, namespace: str, expected_container: dict, chi_info: dict = None
+):
+    """Verify an extra container spec is present in CHI pod templates.
+
+    Pass `chi_info` to check a rendered CHI instead of the live one.
+    """
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     pod_templates = (
@@ -395,9 +1227,15 @@ def verify_extra_container_spec(self, namespace: str, expected_container: dict):
 
 
 @TestStep(Then)
-def verify_clickhouse_resources(self, namespace: str, expected_resources: dict):
-    """Verify ClickHouse container resources in CHI pod templates."""
-    chi_info = get_chi_info(namespace=namespace)
+def verify_clickhouse_resources(
+    self, namespace: str, expected_resources: dict, chi_info: dict = None
+):
+    """Verify ClickHouse container resources in CHI pod templates.
+
+    Pass `chi_info` to check a rendered CHI instead of the live one.
+    """
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     pod_templates = (
@@ -436,9 +1274,14 @@ def verify_profiles_and_user_settings(
     expected_users: list,
     expected_profiles: dict,
     expected_settings: dict,
+    chi_info: dict = None,
 ):
-    """Verify users, profiles, and settings are rendered in CHI configuration."""
-    chi_info = get_chi_info(namespace=namespace)
+    """Verify users, profiles, and settings are rendered in CHI configuration.
+
+    Pass `chi_info` to check a rendered CHI instead of the live one.
+    """
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     configuration = chi_info.get("spec", {}).get("configuration", {}) or {}
@@ -486,36 +1329,32 @@ def verify_profiles_and_user_settings(
 
 @TestStep(When)
 def get_keeper_pods(self, namespace):
-    """Get Keeper pods (excluding operator pods)."""
-    pods = kubernetes.get_pods(namespace=namespace)
-    return [p for p in pods if p.startswith("keeper-") and "operator" not in p]
+    """Get the sorted names of the pods the operator created for a CHK."""
+    pods = kubernetes.list_resources(
+        kind="pod", namespace=namespace, label_selector=CHK_LABEL
+    )
+    return sorted(p["metadata"]["name"] for p in pods)
 
 
 @TestStep(When)
 def get_chk_name(self, namespace):
     """Get the name of the ClickHouseKeeperInstallation resource."""
-    chk_info = run(cmd=f"kubectl get chk -n {namespace} -o json", check=False)
-    if chk_info.returncode != 0:
-        return None
-
-    chk_info = json.loads(chk_info.stdout)
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    chks = snapshot.names("chk")
 
-    if chk_info.get("items"):
-        return chk_info["items"][0]["metadata"]["name"]
+    if chks:
+        return chks[0]
     return None
 
 
 @TestStep(When)
 def get_chk_info(self, namespace):
     """Get the full ClickHouseKeeperInstallation resource information."""
-    chk_info = run(cmd=f"kubectl get chk -n {namespace} -o json", check=False)
-    if chk_info.returncode != 0:
-        return None
-
-    chk_info = json.loads(chk_info.stdout)
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    chks = snapshot.list("chk")
 
-    if chk_info.get("items"):
-        return chk_info["items"][0]
+    if chks:
+        return chks[0]
     return None
 
 
@@ -542,13 +1381,15 @@ def verify_keeper_pods_running(self, namespace, expected_count=None):
 @TestStep(Then)
 def verify_pods_image(self, namespace, expected_image_tag, pod_names=None):
     """Verify that ClickHouse pods are running with the expected image tag."""
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
     if pod_names is None:
-        pod_names = get_clickhouse_pods(namespace=namespace)
+        pod_names = snapshot.names("pod", labels={CHI_LABEL: None})
 
     assert len(pod_names) > 0, "No ClickHouse pods found"
 
     for pod in pod_names:
-        image = kubernetes.get_pod_image(namespace=namespace, pod_name=pod)
+        pod_info = snapshot.get("pod", pod)
+        image = pod_info["spec"]["containers"][0]["image"]
         assert (
             expected_image_tag in image
         ), f"Expected image tag '{expected_image_tag}' in pod {pod}, got {image}"
@@ -593,25 +1434,19 @@ def verify_keeper_pod_count(self, namespace, expected_count):
     note(f"✓ Keeper pod count: {expected_count}")
 
 
-@TestStep(When)
-def is_clickhouse_resource(self, resource_name):
-    """Check if a resource name belongs to a ClickHouse instance."""
-    if "operator" in resource_name:
-        return False
-    return "chi-" in resource_name or resource_name.startswith("clickhouse-")
-
-
 @TestStep(Then)
 def verify_clickhouse_pvc_size(self, namespace, expected_size):
     """Verify that ClickHouse data PVCs have the expected size."""
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+
     # Get current ClickHouse pods to determine which PVCs are actually in use
-    clickhouse_pods = get_clickhouse_pods(namespace=namespace)
+    clickhouse_pods = snapshot.names("pod", labels={CHI_LABEL: None})
     assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
     # Get PVCs that are currently bound to these pods
     active_pvcs = []
     for pod_name in clickhouse_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod_name)
+        pod_info = snapshot.get("pod", pod_name)
         volumes = pod_info.get("spec", {}).get("volumes", [])
         for volume in volumes:
             if "persistentVolumeClaim" in volume:
@@ -622,7 +1457,7 @@ def verify_clickhouse_pvc_size(self, namespace, expected_size):
     assert len(active_pvcs) > 0, "No ClickHouse data PVCs found in use"
 
     for pvc in active_pvcs:
-        pvc_info = kubernetes.get_pvc_info(namespace=namespace, pvc_name=pvc)
+        pvc_info = snapshot.get("pvc", pvc) or {}
         actual_size = (
             pvc_info.get("spec", {})
             .get("resources", {})
@@ -647,11 +1482,12 @@ def verify_image_tag(self, namespace, expected_tag):
 @TestStep(Then)
 def verify_pod_annotations(self, namespace, expected_annotations):
     """Verify that ClickHouse pods have expected annotations."""
-    clickhouse_pods = get_clickhouse_pods(namespace=namespace)
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    clickhouse_pods = snapshot.names("pod", labels={CHI_LABEL: None})
     assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
     for pod in clickhouse_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod)
+        pod_info = snapshot.get("pod", pod)
         actual_annotations = pod_info.get("metadata", {}).get("annotations", {})
 
         for key, value in expected_annotations.items():
@@ -668,11 +1504,12 @@ def verify_pod_annotations(self, namespace, expected_annotations):
 @TestStep(Then)
 def verify_pod_labels(self, namespace, expected_labels):
     """Verify that ClickHouse pods have expected labels."""
-    clickhouse_pods = get_clickhouse_pods(namespace=namespace)
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    clickhouse_pods = snapshot.names("pod", labels={CHI_LABEL: None})
     assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
     for pod in clickhouse_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod)
+        pod_info = snapshot.get("pod", pod)
         actual_labels = pod_info.get("metadata", {}).get("labels", {})
 
         for key, value in expected_labels.items():
@@ -689,18 +1526,14 @@ def verify_service_annotations(
     self, namespace, expected_annotations, service_type=None
 ):
     """Verify that ClickHouse services have expected annotations."""
-    services = kubernetes.get_services(namespace=namespace)
-    clickhouse_services = [
-        svc for svc in services if is_clickhouse_resource(resource_name=svc)
-    ]
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    clickhouse_services = snapshot.names("svc", labels={CHI_LABEL: None})
 
     assert len(clickhouse_services) > 0, "No ClickHouse services found"
 
     services_with_annotations = []
     for service in clickhouse_services:
-        service_info = kubernetes.get_service_info(
-            namespace=namespace, service_name=service
-        )
+        service_info = snapshot.get("svc", service)
         actual_annotations = service_info.get("metadata", {}).get("annotations", {})
 
         has_expected_annotation = any(
@@ -729,18 +1562,14 @@ def verify_service_annotations(
 @TestStep(Then)
 def verify_service_labels(self, namespace, expected_labels, service_type=None):
     """Verify that ClickHouse services have expected labels."""
-    services = kubernetes.get_services(namespace=namespace)
-    clickhouse_services = [
-        svc for svc in services if is_clickhouse_resource(resource_name=svc)
-    ]
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    clickhouse_services = snapshot.names("svc", labels={CHI_LABEL: None})
 
     assert len(clickhouse_services) > 0, "No ClickHouse services found"
 
     services_with_labels = []
     for service in clickhouse_services:
-        service_info = kubernetes.get_service_info(
-            namespace=namespace, service_name=service
-        )
+        service_info = snapshot.get("svc", service)
         actual_labels = service_info.get("metadata", {}).get("labels", {})
 
         has_expected_label = any(key in actual_labels for key in expected_labels.keys())
@@ -765,14 +1594,16 @@ def verify_service_labels(self, namespace, expected_labels, service_type=None):
 @TestStep(Then)
 def verify_log_persistence(self, namespace, expected_log_size):
     """Verify that ClickHouse log PVCs have the expected size."""
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+
     # Get current ClickHouse pods to determine which PVCs are actually in use
-    clickhouse_pods = get_clickhouse_pods(namespace=namespace)
+    clickhouse_pods = snapshot.names("pod", labels={CHI_LABEL: None})
     assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
     # Get log PVCs that are currently bound to these pods
     active_log_pvcs = []
     for pod_name in clickhouse_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod_name)
+        pod_info = snapshot.get("pod", pod_name)
         volumes = pod_info.get("spec", {}).get("volumes", [])
         for volume in volumes:
             if "persistentVolumeClaim" in volume:
@@ -783,7 +1614,7 @@ def verify_log_persistence(self, namespace, expected_log_size):
     assert len(active_log_pvcs) > 0, "No ClickHouse log PVCs found in use"
 
     for pvc in active_log_pvcs:
-        pvc_info = kubernetes.get_pvc_info(namespace=namespace, pvc_name=pvc)
+        pvc_info = snapshot.get("pvc", pvc) or {}
         actual_size = (
             pvc_info.get("spec", {})
             .get("resources", {})
@@ -799,19 +1630,26 @@ def verify_log_persistence(self, namespace, expected_log_size):
 
 
 @TestStep(Then)
-def verify_extra_config(self, namespace, expected_config_keys):
-    """Verify that extraConfig is present in CHI."""
-    chi_info = get_chi_info(namespace=namespace)
+def verify_extra_config(self, namespace, expected_config_keys, chi_info=None):
+    """Verify that extraConfig is present in CHI.
+
+    Keys are setting paths like "logger/level", found either as a CHI
+    settings key or by their last tag in one of the CHI files. Pass
+    `chi_info` to check a rendered CHI instead of the live one.
+    """
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     settings = chi_info.get("spec", {}).get("configuration", {}).get("settings", {})
     files = chi_info.get("spec", {}).get("configuration", {}).get("files", {})
 
     for key in expected_config_keys:
+        tag = f"<{key.rsplit('/', 1)[-1]}>"
         found = False
         if key in settings:
             found = True
-        elif any(key in file_content for file_content in files.values()):
+        elif any(tag in file_content for file_content in files.values()):
             found = True
 
         assert found, f"ExtraConfig key '{key}' not found in settings or files"
@@ -820,18 +1658,63 @@ def verify_extra_config(self, namespace, expected_config_keys):
     note(f"✓ ExtraConfig verified: {len(expected_config_keys)} keys")
 
 
+@TestStep(When)
+def get_keeper_pod_specs(self, namespace, chk_info=None):
+    """Return (name, pod) pairs of the Keeper pods to check.
+
+    With `chk_info` these are the CHK pod templates, which carry the same
+    metadata and spec fields as the pods created from them.
+    """
+    if chk_info is not None:
+        pod_templates = (
+            chk_info.get("spec", {}).get("templates", {}).get("podTemplates", []) or []
+        )
+        return [(f"podTemplate {pt.get('name')}", pt) for pt in pod_templates]
+
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    return [
+        (pod, snapshot.get("pod", pod))
+        for pod in snapshot.names("pod", labels={CHK_LABEL: None})
+    ]
+
+
 @TestStep(Then)
-def verify_keeper_storage(self, namespace, expected_storage_size):
-    """Verify that Keeper storage volumes have the expected size."""
+def verify_keeper_storage(self, namespace, expected_storage_size, chk_info=None):
+    """Verify that Keeper storage volumes have the expected size.
+
+    Pass `chk_info` to check the volume claim templates of a rendered CHK.
+    """
+    if chk_info is not None:
+        templates = (
+            chk_info.get("spec", {}).get("templates", {}).get("volumeClaimTemplates")
+            or []
+        )
+        assert len(templates) > 0, "No volumeClaimTemplates found in CHK"
+        for template in templates:
+            actual_size = (
+                template.get("spec", {})
+                .get("resources", {})
+                .get("requests", {})
+                .get("storage")
+            )
+            assert (
+                actual_size == expected_storage_size
+            ), f"Expected Keeper volume size {expected_storage_size}, got {actual_size} for {template.get('name')}"
+        note(
+            f"✓ Keeper storage verified: {len(templates)} templates with {expected_storage_size}"
+        )
+        return
+
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+
     # Get current Keeper pods to determine which PVCs are actually in use
-    keeper_pods = get_keeper_pods(namespace=namespace)
+    keeper_pods = snapshot.names("pod", labels={CHK_LABEL: None})
     assert len(keeper_pods) > 0, "No Keeper pods found"
 
     # Get PVCs that are currently bound to these pods
     active_keeper_pvcs = []
-    for pod_name in keeper_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod_name)
-        volumes = pod_info.get("spec", {}).get("volumes", [])
+    for pod in keeper_pods:
+        volumes = snapshot.get("pod", pod).get("spec", {}).get("volumes", [])
         for volume in volumes:
             if "persistentVolumeClaim" in volume:
                 pvc_name = volume["persistentVolumeClaim"]["claimName"]
@@ -842,7 +1725,7 @@ def verify_keeper_storage(self, namespace, expected_storage_size):
     ), f"No Keeper PVCs found in use in namespace {namespace}"
 
     for pvc in active_keeper_pvcs:
-        pvc_info = kubernetes.get_pvc_info(namespace=namespace, pvc_name=pvc)
+        pvc_info = snapshot.get("pvc", pvc) or {}
         actual_size = (
             pvc_info.get("spec", {})
             .get("resources", {})
@@ -860,13 +1743,15 @@ def verify_keeper_storage(self, namespace, expected_storage_size):
 
 
 @TestStep(Then)
-def verify_keeper_annotations(self, namespace, expected_annotations):
-    """Verify that Keeper pods have expected annotations."""
-    keeper_pods = get_keeper_pods(namespace=namespace)
+def verify_keeper_annotations(self, namespace, expected_annotations, chk_info=None):
+    """Verify that Keeper pods have expected annotations.
+
+    Pass `chk_info` to check the pod templates of a rendered CHK.
+    """
+    keeper_pods = get_keeper_pod_specs(namespace=namespace, chk_info=chk_info)
     assert len(keeper_pods) > 0, "No Keeper pods found"
 
-    for pod in keeper_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod)
+    for pod, pod_info in keeper_pods:
         actual_annotations = pod_info.get("metadata", {}).get("annotations", {})
 
         for key, value in expected_annotations.items():
@@ -881,13 +1766,15 @@ def verify_keeper_annotations(self, namespace, expected_annotations):
 
 
 @TestStep(Then)
-def verify_keeper_resources(self, namespace, expected_resources):
-    """Verify that Keeper pods have expected resource requests and limits."""
-    keeper_pods = get_keeper_pods(namespace=namespace)
+def verify_keeper_resources(self, namespace, expected_resources, chk_info=None):
+    """Verify that Keeper pods have expected resource requests and limits.
+
+    Pass `chk_info` to check the pod templates of a rendered CHK.
+    """
+    keeper_pods = get_keeper_pod_specs(namespace=namespace, chk_info=chk_info)
     assert len(keeper_pods) > 0, "No Keeper pods found"
 
-    for pod in keeper_pods:
-        pod_info = kubernetes.get_pod_info(namespace=namespace, pod_name=pod)
+    for pod, pod_info in keeper_pods:
         containers = pod_info.get("spec", {}).get("containers", [])
 
         assert len(containers) > 0, f"No containers found in Keeper pod {pod}"
@@ -919,9 +1806,15 @@ def verify_keeper_resources(self, namespace, expected_resources):
 
 
 @TestStep(Then)
-def verify_chi_cluster_topology(self, namespace, expected_replicas, expected_shards):
-    """Verify that the ClickHouse cluster has the expected topology (replicas and shards)."""
-    chi_info = get_chi_info(namespace=namespace)
+def verify_chi_cluster_topology(
+    self, namespace, expected_replicas, expected_shards, chi_info=None
+):
+    """Verify that the ClickHouse cluster has the expected topology (replicas and shards).
+
+    Pass `chi_info` to check a rendered CHI instead of the live one.
+    """
+    if chi_info is None:
+        chi_info = get_chi_info(namespace=namespace)
     assert chi_info is not None, "ClickHouseInstallation not found"
 
     clusters = chi_info.get("spec", {}).get("configuration", {}).get("clusters", [])
@@ -967,60 +1860,116 @@ def verify_chi_cluster_topology(self, namespace, expected_replicas, expected_sha
 
 @TestStep(When)
 def extract_extra_config_keys(self, extra_config_xml):
-    """Extract configuration keys from extraConfig XML."""
-
-    # Match XML tags like <key>value</key>
-    # Exclude nested tags and special cases like <clickhouse> wrapper
-    pattern = r"<([a-z_][a-z0-9_]*(?:\.[a-z_][a-z0-9_]*)?)>.*?</\1>"
-    matches = re.findall(pattern, extra_config_xml, re.DOTALL | re.IGNORECASE)
-
-    # Filter out common wrapper tags
-    wrapper_tags = {"clickhouse", "yandex", "config"}
-    config_keys = [key for key in matches if key.lower() not in wrapper_tags]
+    """Extract configuration keys from extraConfig XML.
 
-    return config_keys
+    Returns the paths of all leaf settings, e.g. "logger/level".
+    """
+    return list(config_index(extra_config_xml))
 
 
 @TestStep(When)
 def parse_extra_config_values(self, extra_config_xml):
     """Parse configuration values from extraConfig XML.
 
-    Returns a dictionary of setting_name -> expected_value.
-    Only returns simple key-value pairs (not nested structures).
+    Returns a dictionary of setting path -> expected value for all leaf
+    settings, nested ones included (e.g. "merge_tree/max_suspicious_broken_parts").
     """
+    return dict(config_index(extra_config_xml))
 
-    config_values = {}
-
-    # Match simple key-value pairs like <key>value</key>
-    # This pattern captures both the key and value
-    pattern = r"<([a-z_][a-z0-9_]*)>([^<>]+)</\1>"
-    matches = re.findall(pattern, extra_config_xml, re.IGNORECASE)
-
-    for key, value in matches:
-        key_lower = key.lower()
-        # Skip wrapper tags and nested elements (like logger/level)
-        if key_lower in {
-            "clickhouse",
-            "yandex",
-            "config",
-            "logger",
-            "merge_tree",
-            "level",
-        }:
-            continue
 
-        # Clean up the value (strip whitespace)
-        cleaned_value = value.strip()
-        config_values[key] = cleaned_value
+# Tables settings are resolved from, in order of precedence, with the
+# path prefix of the settings they hold in extraConfig
+SETTINGS_TABLES = (
+    ("system.settings", ""),
+    ("system.server_settings", ""),
+    ("system.merge_tree_settings", "merge_tree/"),
+)
+
+
+def setting_value(value, setting_type):
+    """Convert a setting value string to the Python type of its ClickHouse type."""
+    try:
+        if setting_type == "Bool":
+            return value.lower() in ("1", "true")
+        if setting_type.startswith(("UInt", "Int")):
+            return int(value)
+        if setting_type.startswith("Float"):
+            return float(value)
+    except ValueError:
+        pass
+    return value
+
+
+def setting_matches(expected, actual):
+    """Compare an expected value from XML with a typed setting value."""
+    expected = str(expected).strip()
+    if isinstance(actual, bool):
+        return expected.lower() in (("1", "true") if actual else ("0", "false"))
+
+    # For numeric comparisons, normalize both values
+    try:
+        return float(expected) == float(actual)
+    except ValueError:
+        # Not numeric, do string comparison
+        return str(actual) == expected
+
+
+@TestStep(When)
+def resolve_settings(self, namespace, pod_name, names, admin_password=""):
+    """Resolve many settings with one query over all SETTINGS_TABLES.
+
+    Names are setting paths as in extraConfig, so "merge_tree/<name>"
+    is looked up in system.merge_tree_settings.
 
-    return config_values
+    Returns:
+        Dict of setting name to (table, typed value). For a name found in
+        several tables the first one in SETTINGS_TABLES wins; names with an
+        empty value or not found at all are left out.
+    """
+    selects = []
+    for i, (table, prefix) in enumerate(SETTINGS_TABLES):
+        table_names = [
+            name[len(prefix) :]
+            for name in names
+            if name.startswith(prefix) and "/" not in name[len(prefix) :]
+        ]
+        if table_names:
+            in_list = ", ".join(f"'{name}'" for name in table_names)
+            selects.append(
+                f"SELECT concat('{prefix}', name) AS name, value, type, {i} AS precedence "
+                f"FROM {table} WHERE name IN ({in_list})"
+            )
+
+    if not selects:
+        return {}
+
+    query = " UNION ALL ".join(selects)
+    rows = select_rows(
+        namespace=namespace,
+        pod_name=pod_name,
+        query=query,
+        user="default",
+        password=admin_password,
+    )
+    assert rows is not None, f"Failed to resolve settings {sorted(names)}"
+
+    resolved = {}
+    for row in sorted(rows, key=lambda r: int(r["precedence"]), reverse=True):
+        if row["value"] == "":
+            continue
+        resolved[row["name"]] = (
+            SETTINGS_TABLES[int(row["precedence"])][0],
+            setting_value(row["value"], row["type"]),
+        )
+    return resolved
 
 
 @TestStep(Then)
 def verify_extra_config_values(self, namespace, expected_config_values, admin_password):
     """Verify that extraConfig values are actually applied in ClickHouse.
 
-    This checks the actual running configuration by querying system tables.
+    This checks the actual running configuration by querying system tables,
+    all settings at once with resolve_settings.
     """
     # Use the first ready pod for verification
     pod_name = get_ready_clickhouse_pod(namespace=namespace)
@@ -1029,6 +1978,7 @@ def verify_extra_config_values(self, namespace, expected_config_values, admin_pa
     # For these, we skip verification when expected value is "0"
     default_on_zero_settings = {"max_table_size_to_drop", "max_partition_size_to_drop"}
 
+    expected = {}
     for setting_name, expected_value in expected_config_values.items():
         # Skip verification for settings where 0 means "use default"
         if setting_name in default_on_zero_settings and str(expected_value) == "0":
@@ -1036,65 +1986,28 @@ def verify_extra_config_values(self, namespace, expected_config_values, admin_pa
                 f"⚠ Skipping verification for '{setting_name}' (value 0 uses ClickHouse default)"
             )
             continue
+        expected[setting_name] = expected_value
 
-        # First try system.settings (session-level settings)
-        query = f"SELECT value FROM system.settings WHERE name = '{setting_name}' FORMAT TabSeparated"
-        result = execute_clickhouse_query(
-            namespace=namespace,
-            pod_name=pod_name,
-            query=query,
-            user="default",
-            password=admin_password,
-            check=False,
-        )
-
-        actual_value = (
-            result.stdout.strip()
-            if result.returncode == 0 and result.stdout.strip()
-            else None
-        )
-
-        if not actual_value:
-            query = f"SELECT value FROM system.server_settings WHERE name = '{setting_name}' FORMAT TabSeparated"
-            result = execute_clickhouse_query(
-                namespace=namespace,
-                pod_name=pod_name,
-                query=query,
-                user="default",
-                password=admin_password,
-                check=False,
-            )
-            actual_value = (
-                result.stdout.strip()
-                if result.returncode == 0 and result.stdout.strip()
-                else None
-            )
-
-        if actual_value:
-            note(
-                f"✓ Server setting '{setting_name}' = {actual_value} (expected: {expected_value})"
-            )
+    actual = resolve_settings(
+        namespace=namespace,
+        pod_name=pod_name,
+        names=list(expected),
+        admin_password=admin_password,
+    )
 
-            # Convert both to strings for comparison
-            expected_str = str(expected_value)
+    for setting_name, expected_value in expected.items():
+        if setting_name not in actual:
+            # Setting not found in any table - this might be okay for some settings
+            note(f"⚠ Setting '{setting_name}' not found in system settings tables")
+            continue
 
-            # For numeric comparisons, normalize both values
-            try:
-                expected_num = float(expected_str)
-                actual_num = float(actual_value)
-                assert (
-                    actual_num == expected_num
-                ), f"Setting '{setting_name}': expected={expected_str}, actual={actual_value}"
-            except ValueError:
-                # Not numeric, do string comparison
-                assert (
-                    actual_value == expected_str
-                ), f"Setting '{setting_name}': expected={expected_str}, actual={actual_value}"
-        else:
-            # Setting not found in either table - this might be okay for some settings
-            note(
-                f"⚠ Setting '{setting_name}' not found in system.settings or system.server_settings"
-            )
+        table, actual_value = actual[setting_name]
+        note(
+            f"✓ Server setting '{setting_name}' = {actual_value} (expected: {expected_value}, from {table})"
+        )
+        assert setting_matches(
+            expected_value, actual_value
+        ), f"Setting '{setting_name}': expected={expected_value}, actual={actual_value}"
 
 
 @TestStep(When)
@@ -1140,24 +2053,19 @@ def get_cluster_topology(namespace, pod_name, cluster_name, admin_password):
     Returns:
         tuple: (actual_shards, actual_replicas) or (0, 0) if cluster not found
     """
-    query = "SELECT cluster, shard_num, replica_num FROM system.clusters ORDER BY shard_num, replica_num FORMAT JSON"
-    result = execute_clickhouse_query(
+    query = "SELECT cluster, shard_num, replica_num FROM system.clusters ORDER BY shard_num, replica_num"
+    rows = select_rows(
         namespace=namespace,
         pod_name=pod_name,
         query=query,
         user="default",
         password=admin_password,
-        check=True,
     )
 
-    # Parse JSON output
-    try:
-        data = json.loads(result.stdout)
-    except json.JSONDecodeError:
-        note("⚠ Failed to parse system.clusters JSON output")
+    if rows is None:
+        note("⚠ Failed to query system.clusters")
         return (0, 0)
 
-    rows = data.get("data", [])
     if not rows:
         return (0, 0)
 
@@ -1227,6 +2135,7 @@ def verify_system_clusters(
         check_fn=check_topology,
         timeout=timeout,
         interval=5,
+        name="system.clusters topology",
         timeout_msg=f"Cluster '{cluster_name}' topology not ready. Expected {expected_shards} shard(s), {expected_replicas} replica(s)",
     )
 
@@ -1286,16 +2195,190 @@ def verify_system_replicas_health(self, namespace, admin_password):
     note(f"✓ system.replicas health checked: {len(lines)} table(s)")
 
 
+@TestStep(When)
+def get_replica_groups(self, namespace):
+    """Get ClickHouse pod names grouped by shard, from the operator's pod labels.
+
+    Returns:
+        Dict of shard to the sorted names of its pods
+    """
+    snapshot = kubernetes.get_namespace_snapshot(namespace=namespace)
+    groups = {}
+    for pod in snapshot.names("pod", labels={CHI_LABEL: None}):
+        labels = snapshot.get("pod", pod)["metadata"].get("labels") or {}
+        shard = labels.get("clickhouse.altinity.com/shard", "0")
+        groups.setdefault(shard, []).append(pod)
+    return groups
+
+
+def part_covers(part, other):
+    """Return True if part `part` contains the blocks of part `other`.
+
+    Part names are <partition>_<min block>_<max block>_<level>[_<mutation>].
+    """
+    partition, low, high = part.split("_")[:3]
+    other_partition, other_low, other_high = other.split("_")[:3]
+    return (
+        partition == other_partition
+        and int(low) <= int(other_low)
+        and int(other_high) <= int(high)
+    )
+
+
+@TestStep(When)
+def measure_replication_lag(
+    self,
+    namespace,
+    table,
+    replicas,
+    admin_password="",
+    samples=5,
+    timeout=30,
+    interval=0.5,
+):
+    """Measure how long inserted rows take to reach the other replicas of a shard.
+
+    Inserts `samples` rows, one part each, on the first replica of every
+    shard and waits until the other replicas of the shard have them all.
+    A part's lag on a replica is the time from its NewPart entry in
+    system.part_log of the first replica to its DownloadPart entry on the
+    replica, so it is the server-side fetch time whatever the polling
+    interval, assuming the nodes' clocks are in sync. Only entries since
+    the first replica's clock reading before the inserts count, so parts
+    of an earlier table with the same name are left out.
+
+    Args:
+        namespace: Kubernetes namespace
+        table: Replicated table with an `id` UInt32 and a `value` String column
+        replicas: Dict of shard to its pod names (see get_replica_groups)
+        admin_password: Password of the default user
+        samples: Number of rows inserted per shard
+        timeout: Time to wait for the rows to reach all replicas, in seconds
+        interval: Time between checks of the replicas in seconds
+
+    Returns:
+        List of {"shard", "source", "replica", "part", "lag"} dicts
+    """
+    database, name = table.split(".")
+    shards = {shard: pods for shard, pods in replicas.items() if len(pods) > 1}
+
+    def query(pod, sql, quiet=True):
+        return execute_clickhouse_query(
+            namespace=namespace,
+            pod_name=pod,
+            query=sql,
+            password=admin_password,
+            check=False,
+            quiet=quiet,
+        )
+
+    def server_time(pod):
+        """Return the current time of a pod's ClickHouse server in microseconds."""
+        result = query(pod, "SELECT toUnixTimestamp64Micro(now64(6))")
+        assert result.returncode == 0, f"Reading time on {pod} failed: {result.stderr}"
+        return int(result.stdout.strip())
+
+    def part_log(pod, event_type, since):
+        """Return part name -> event time in seconds of the table's parts on a pod.
+
+        Only entries at or after `since`, in microseconds, are returned.
+        """
+        result = query(pod, "SYSTEM FLUSH LOGS")
+        assert result.returncode == 0, f"Flush logs on {pod} failed: {result.stderr}"
+        result = query(
+            pod,
+            "SELECT part_name, toUnixTimestamp64Micro(event_time_microseconds) "
+            f"FROM system.part_log WHERE database = '{database}' "
+            f"AND table = '{name}' AND event_type = '{event_type}' "
+            f"AND event_time_microseconds >= fromUnixTimestamp64Micro({since}) "
+            "FORMAT TSV",
+        )
+        assert (
+            result.returncode == 0
+        ), f"Reading part_log on {pod} failed: {result.stderr}"
+        return {
+            part: int(micros) / 1e6
+            for part, micros in (
+                line.split("\t") for line in result.stdout.splitlines()
+            )
+        }
+
+    since = {shard: server_time(pods[0]) for shard, pods in shards.items()}
+    for n in range(samples):
+        for i, (shard, pods) in enumerate(shards.items()):
+            row_id = n * len(shards) + i + 1
+            result = query(
+                pods[0], f"INSERT INTO {table} VALUES ({row_id}, 'probe')", quiet=False
+            )
+            assert (
+                result.returncode == 0
+            ), f"Insert on {pods[0]} failed: {result.stderr}"
+
+    pending = {replica for pods in shards.values() for replica in pods[1:]}
+    deadline = time.time() + timeout
+    while pending:
+        for replica in sorted(pending):
+            result = query(replica, f"SELECT count() FROM {table}")
+            if result.returncode == 0 and result.stdout.strip() == str(samples):
+                pending.discard(replica)
+
+        assert time.time() < deadline or not pending, (
+            f"Rows not replicated within {timeout}s to: "
+            f"{', '.join(sorted(pending))}"
+        )
+        if pending:
+            time.sleep(interval)
+
+    lags = []
+    for shard, pods in shards.items():
+        created = part_log(pods[0], "NewPart", since[shard])
+        for replica in pods[1:]:
+            fetched = part_log(replica, "DownloadPart", since[shard])
+            for part, created_at in sorted(created.items()):
+                # A part merged before the replica fetched it arrives inside the merged part
+                covering = [f for f in fetched if part_covers(f, part)]
+                assert covering, f"{replica} has no DownloadPart of {part} in part_log"
+                lags.append(
+                    {
+                        "shard": shard,
+                        "source": pods[0],
+                        "replica": replica,
+                        "part": part,
+                        "lag": max(0.0, min(fetched[f] for f in covering) - created_at),
+                    }
+                )
+
+    return lags
+
+
 @TestStep(Then)
-def verify_replication_working(self, namespace, admin_password, timeout=120):
-    """Verify replication actually works by creating and checking a test table."""
-    clickhouse_pods = get_clickhouse_pods(namespace=namespace)
-    if len(clickhouse_pods) < 2:
-        note("⚠ Skipping replication test - need at least 2 ClickHouse pods")
+def verify_replication_working(
+    self,
+    namespace,
+    admin_password,
+    timeout=120,
+    samples=5,
+    lag_slo=DEFAULT_REPLICATION_LAG_SLO,
+):
+    """Verify replication works and replication lag is within the SLO.
+
+    Creates a replicated test table and measures with measure_replication_lag
+    how long rows inserted on the first replica of each shard take to show
+    up on the other replicas of that shard.
+
+    Args:
+        namespace: Kubernetes namespace
+        admin_password: Password of the default user
+        timeout: Time to wait for the cluster and for each row to replicate
+        samples: Number of rows inserted per shard
+        lag_slo: Highest allowed p99 replication lag in seconds
+    """
+    replicas = get_replica_groups(namespace=namespace)
+    if not any(len(pods) > 1 for pods in replicas.values()):
+        note("⚠ Skipping replication test - need at least 2 replicas of a shard")
         return
 
-    pod1 = clickhouse_pods[0]
-    pod2 = clickhouse_pods[1]
+    pod1 = next(iter(replicas.values()))[0]
 
     # Create a test replicated table on first pod
     test_db = "test_replication_db"
@@ -1340,6 +2423,7 @@ def verify_replication_working(self, namespace, admin_password, timeout=120):
             check_fn=check_cluster_ready,
             timeout=timeout,
             interval=5,
+            name="cluster ready for ON CLUSTER",
             timeout_msg=f"Cluster configuration not propagated within {timeout}s",
         )
 
@@ -1360,32 +2444,34 @@ def verify_replication_working(self, namespace, admin_password, timeout=120):
             check=True,
         )
 
-        query = f"INSERT INTO {test_db}.{test_table} VALUES (1, 'test_value')"
-        execute_clickhouse_query(
+        lags = measure_replication_lag(
             namespace=namespace,
-            pod_name=pod1,
-            query=query,
-            user="default",
-            password=admin_password,
-            check=True,
+            table=f"{test_db}.{test_table}",
+            replicas=replicas,
+            admin_password=admin_password,
+            samples=samples,
+            timeout=timeout,
         )
 
-        time.sleep(2)
-
-        query = f"SELECT count() FROM {test_db}.{test_table}"
-        result = execute_clickhouse_query(
-            namespace=namespace,
-            pod_name=pod2,
-            query=query,
-            user="default",
-            password=admin_password,
-            check=True,
+        values = [lag["lag"] for lag in lags]
+        p99 = percentile(values, 99)
+        note(
+            f"Replication lag over {len(values)} samples: "
+            f"p50 {percentile(values, 50) * 1000:.0f}ms, "
+            f"p90 {percentile(values, 90) * 1000:.0f}ms, "
+            f"p99 {p99 * 1000:.0f}ms, max {max(values) * 1000:.0f}ms"
         )
+        pairs = {}
+        for lag in lags:
+            pairs.setdefault((lag["source"], lag["replica"]), []).append(lag["lag"])
+        for (source, replica), pair in sorted(pairs.items()):
+            note(
+                f"  {source} -> {replica}: p50 {percentile(pair, 50) * 1000:.0f}ms, "
+                f"max {max(pair) * 1000:.0f}ms"
+            )
 
-        count = int(result.stdout.strip())
-        assert count == 1, f"Expected 1 row replicated to second pod, got {count}"
-
-        note(f"✓ Replication working: data replicated from {pod1} to {pod2}")
+        assert p99 <= lag_slo, f"p99 replication lag {p99:.3f}s, SLO is {lag_slo}s"
+        note(f"✓ Replication working: {len(pairs)} replica pair(s) within {lag_slo}s")
 
     finally:
         # Cleanup
@@ -1405,58 +2491,48 @@ def verify_replication_working(self, namespace, admin_password, timeout=120):
 
 @TestStep(Then)
 def verify_service_endpoints(self, namespace, expected_endpoint_count, timeout=60):
-    """Verify service endpoints count matches expected."""
-    services = kubernetes.get_services(namespace=namespace)
-    clickhouse_services = [
-        svc for svc in services if is_clickhouse_resource(resource_name=svc)
-    ]
+    """Verify the endpoint count of the service the operator creates for the whole CHI."""
+    services = kubernetes.list_resources(
+        kind="svc", namespace=namespace, label_selector=CLUSTER_SERVICE_SELECTOR
+    )
 
-    if not clickhouse_services:
-        raise AssertionError("No ClickHouse services found")
+    if not services:
+        raise AssertionError("No ClickHouse cluster service found")
 
-    # Check the main cluster service (not individual pod services)
-    cluster_services = [
-        svc
-        for svc in clickhouse_services
-        if not any(f"-{i}-" in svc for i in range(10))
-    ]
+    service_name = services[0]["metadata"]["name"]
 
-    if cluster_services:
-        service_name = cluster_services[0]
+    def check_endpoints():
+        """Check if service has expected number of ready endpoints."""
+        endpoints_info = kubernetes.get_endpoints_info(
+            namespace=namespace, endpoints_name=service_name
+        )
 
-        def check_endpoints():
-            """Check if service has expected number of ready endpoints."""
-            endpoints_info = kubernetes.get_endpoints_info(
-                namespace=namespace, endpoints_name=service_name
-            )
+        # Count endpoints
+        subsets = endpoints_info.get("subsets", [])
+        total_endpoints = sum(len(subset.get("addresses", [])) for subset in subsets)
 
-            # Count endpoints
-            subsets = endpoints_info.get("subsets", [])
-            total_endpoints = sum(
-                len(subset.get("addresses", [])) for subset in subsets
+        if total_endpoints == expected_endpoint_count:
+            return (
+                True,
+                total_endpoints,
+                f"Service {service_name} has {total_endpoints} endpoint(s)",
+            )
+        else:
+            return (
+                False,
+                None,
+                f"Service {service_name}: {total_endpoints}/{expected_endpoint_count} endpoints ready",
             )
 
-            if total_endpoints == expected_endpoint_count:
-                return (
-                    True,
-                    total_endpoints,
-                    f"Service {service_name} has {total_endpoints} endpoint(s)",
-                )
-            else:
-                return (
-                    False,
-                    None,
-                    f"Service {service_name}: {total_endpoints}/{expected_endpoint_count} endpoints ready",
-                )
-
-        total_endpoints = wait_until(
-            check_fn=check_endpoints,
-            timeout=timeout,
-            interval=5,
-            timeout_msg=f"Service endpoints not ready within {timeout}s. Expected {expected_endpoint_count}",
-        )
+    total_endpoints = wait_until(
+        check_fn=check_endpoints,
+        timeout=timeout,
+        interval=5,
+        name="service endpoints ready",
+        timeout_msg=f"Service endpoints not ready within {timeout}s. Expected {expected_endpoint_count}",
+    )
 
-        note(f"✓ Service {service_name} has {total_endpoints} endpoint(s)")
+    note(f"✓ Service {service_name} has {total_endpoints} endpoint(s)")
 
 
 @TestStep(Then)
@@ -1575,32 +2651,35 @@ def verify_data_survival(
 
 
 @TestStep(When)
-def test_keeper_high_availability(self, namespace, admin_password):
-    """Test Keeper HA by deleting a keeper pod and verifying ClickHouse remains writable."""
+def test_keeper_high_availability(
+    self, namespace, admin_password, cycles=DEFAULT_KEEPER_KILL_CYCLES, timeout=300
+):
+    """Test Keeper HA by deleting the Keeper leader while ClickHouse is written to.
+
+    A ContinuousWriter inserts into a replicated table on one ClickHouse
+    pod and a KeeperMonitor follows the ensemble. Each of `cycles` deletes
+    the current leader and waits until another pod leads, every Keeper pod
+    is back and inserts succeed again, then notes the leader change time,
+    write stall, recovery time and the per-second insert timeline.
+
+    Returns:
+        List of per-cycle result dicts, times in seconds since the deletion
+    """
     # Get keeper pods
     keeper_pods = get_keeper_pods(namespace=namespace)
     if len(keeper_pods) < 3:
         note(
             f"⚠ Skipping Keeper HA test - need at least 3 Keeper pods, found {len(keeper_pods)}"
         )
-        return
-
-    # Select first keeper pod to delete
-    keeper_to_delete = keeper_pods[0]
-    note(f"Testing Keeper HA by deleting pod: {keeper_to_delete}")
+        return []
 
-    # Delete the keeper pod
-    kubernetes.delete_pod(namespace=namespace, pod_name=keeper_to_delete)
-    note(f"Deleted Keeper pod: {keeper_to_delete}")
-
-    # Immediately try to write to ClickHouse
     clickhouse_pods = get_clickhouse_pods(namespace=namespace)
     if not clickhouse_pods:
         raise AssertionError("No ClickHouse pods found")
 
     pod_name = clickhouse_pods[0]
 
-    # Create test database and table
+    # Create test database and a table whose inserts go through Keeper
     query = "CREATE DATABASE IF NOT EXISTS test_keeper_ha"
     execute_clickhouse_query(
         namespace=namespace,
@@ -1612,9 +2691,9 @@ def test_keeper_high_availability(self, namespace, admin_password):
     )
 
     query = """
-    CREATE TABLE IF NOT EXISTS test_keeper_ha.ha_test 
-    (id UInt32, value String) 
-    ENGINE = MergeTree() 
+    CREATE TABLE IF NOT EXISTS test_keeper_ha.ha_test
+    (id UInt64, ts DateTime64(3))
+    ENGINE = ReplicatedMergeTree('/clickhouse/test_keeper_ha/ha_test', '{replica}')
     ORDER BY id
     """
     execute_clickhouse_query(
@@ -1626,47 +2705,135 @@ def test_keeper_high_availability(self, namespace, admin_password):
         check=True,
     )
 
-    # Attempt INSERT with one Keeper down
-    query = "INSERT INTO test_keeper_ha.ha_test VALUES (1, 'keeper_ha_test')"
-    result = execute_clickhouse_query(
-        namespace=namespace,
-        pod_name=pod_name,
-        query=query,
-        user="default",
-        password=admin_password,
-        check=True,
+    forward = kubernetes.PortForward(
+        namespace, f"pod/{pod_name}", ClickHouseSessionPool.HTTP_PORT
     )
+    results = []
 
-    assert result.returncode == 0, "INSERT failed with one Keeper pod down"
+    try:
+        with KeeperMonitor(namespace, keeper_pods) as monitor, ContinuousWriter(
+            url=f"http://127.0.0.1:{forward.local_port}/",
+            table="test_keeper_ha.ha_test",
+            password=admin_password,
+        ) as writer:
+            wait_until(
+                check_fn=lambda: (
+                    monitor.first_healthy(since=0) is not None,
+                    None,
+                    "Waiting for a Keeper leader",
+                ),
+                timeout=60,
+                interval=1,
+                name="keeper ensemble healthy",
+            )
 
-    # Verify the data
-    query = "SELECT count() FROM test_keeper_ha.ha_test FORMAT TabSeparated"
-    result = execute_clickhouse_query(
-        namespace=namespace,
-        pod_name=pod_name,
-        query=query,
-        user="default",
-        password=admin_password,
-        check=True,
-    )
+            for cycle in range(1, cycles + 1):
+                with By(f"deleting the Keeper leader, cycle {cycle} of {cycles}"):
+                    leader = monitor.leader()
+                    victim = leader or keeper_pods[0]
+                    killed_at = time.time()
+                    kubernetes.delete_pod(namespace=namespace, pod_name=victim)
+                    deleted_at = time.time()
+
+                    elected_at = None
+                    if leader:
+                        elected_at = wait_until(
+                            check_fn=lambda: (
+                                monitor.leader_elected(killed_at, leader) is not None,
+                                monitor.leader_elected(killed_at, leader),
+                                "Waiting for a new Keeper leader",
+                            ),
+                            timeout=timeout,
+                            interval=1,
+                            name="keeper leader elected",
+                        )
+
+                    restored_at = wait_until(
+                        check_fn=lambda: (
+                            monitor.first_healthy(since=deleted_at) is not None,
+                            monitor.first_healthy(since=deleted_at),
+                            f"Waiting for {victim} to rejoin the Keeper ensemble",
+                        ),
+                        timeout=timeout,
+                        interval=1,
+                        name="keeper ensemble restored",
+                    )
+
+                    wait_until(
+                        check_fn=lambda: (
+                            any(ok and t > restored_at for t, _, ok in writer.samples),
+                            None,
+                            "Waiting for inserts to succeed",
+                        ),
+                        timeout=timeout,
+                        interval=1,
+                        name="keeper writes recovered",
+                    )
+
+                result = {
+                    "cycle": cycle,
+                    "deleted": victim,
+                    "was_leader": leader is not None,
+                    "leader_change": elected_at - killed_at if elected_at else None,
+                    "ensemble_restored": restored_at - killed_at,
+                }
+                result.update(writer.report(start=killed_at, end=time.time()))
+                results.append(result)
+
+                leader_change = (
+                    f"new leader after {result['leader_change']:.2f}s"
+                    if elected_at
+                    else "leader unknown"
+                )
+                note(
+                    f"Cycle {cycle}: deleted {victim}, {leader_change}, "
+                    f"ensemble restored after {result['ensemble_restored']:.2f}s, "
+                    f"writes stalled {result['write_stall']:.2f}s, "
+                    f"recovered after {result['recovery']:.2f}s, "
+                    f"{result['failures']}/{result['inserts']} inserts failed, "
+                    f"max insert latency {result['max_latency']:.2f}s"
+                )
+                note(
+                    "Inserts per second since deletion (inserts/failed/max latency): "
+                    + " ".join(
+                        f"{n}s:{i}/{f}/{l:.2f}s" for n, i, f, l in result["per_second"]
+                    )
+                )
+
+        # Every acknowledged insert must have been written
+        succeeded = sum(1 for _, _, ok in writer.samples if ok)
+        query = "SELECT count() FROM test_keeper_ha.ha_test"
+        result = execute_clickhouse_query(
+            namespace=namespace,
+            pod_name=pod_name,
+            query=query,
+            user="default",
+            password=admin_password,
+            check=True,
+        )
 
-    count = int(result.stdout.strip())
-    assert count == 1, f"Expected 1 row, got {count}"
+        count = int(result.stdout.strip())
+        assert count >= succeeded, f"Expected at least {succeeded} rows, got {count}"
 
-    # Cleanup
-    query = "DROP DATABASE IF EXISTS test_keeper_ha"
-    execute_clickhouse_query(
-        namespace=namespace,
-        pod_name=pod_name,
-        query=query,
-        user="default",
-        password=admin_password,
-        check=False,
-    )
+    finally:
+        forward.close()
+
+        # Cleanup
+        query = "DROP DATABASE IF EXISTS test_keeper_ha SYNC"
+        execute_clickhouse_query(
+            namespace=namespace,
+            pod_name=pod_name,
+            query=query,
+            user="default",
+            password=admin_password,
+            check=False,
+        )
 
     note(
-        f"✓ Keeper HA verified: ClickHouse remained writable with {len(keeper_pods)-1}/{len(keeper_pods)} Keepers"
+        f"✓ Keeper HA verified: ClickHouse recovered from {cycles} Keeper leader deletion(s) "
+        f"with {len(keeper_pods)} Keepers"
     )
+    return results
 
 
 @TestStep(Then)
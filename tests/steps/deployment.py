@@ -9,8 +9,19 @@ from testflows.core import *
 import tests.steps.kubernetes as kubernetes
 import tests.steps.clickhouse as clickhouse
 import tests.steps.users as users
+import tests.steps.helm as helm
 import yaml
 from pathlib import Path
+from tests.helpers.budget import parse_cpu, parse_memory
+from tests.helpers.xmlindex import config_index
+from tests.helpers.defaults import DEFAULT_VERIFY_WORKERS
+
+
+# Requests assumed for pods whose values don't set any, used to size
+# how many deployments fit on the cluster at once.
+DEFAULT_CLICKHOUSE_REQUESTS = {"cpu": "250m", "memory": "512Mi"}
+DEFAULT_KEEPER_REQUESTS = {"cpu": "100m", "memory": "512Mi"}
+OPERATOR_REQUESTS = {"cpu": "100m", "memory": "128Mi"}
 
 
 @TestStep(Then)
@@ -50,6 +61,9 @@ def wait_for_clickhouse_deployment(
         )
         note(f"ClickHouse pods running: {clickhouse_pods}")
 
+    # Checks after this point read the namespace as it is once ready
+    kubernetes.invalidate_namespace_snapshot(namespace=namespace)
+
 
 class HelmState:
     """Orchestrator for verifying Helm deployment state.
@@ -72,6 +86,20 @@ class HelmState:
         self.clickhouse_config = self.values.get("clickhouse", {})
         self.keeper_config = self.values.get("keeper", {})
 
+    def get_value(self, path, default=None):
+        """Return the value at a dotted path, e.g. "clickhouse.persistence.size"."""
+        value = self.values
+        for key in path.split("."):
+            if not isinstance(value, dict) or key not in value:
+                return default
+            value = value[key]
+        return value
+
+    @property
+    def extra_config_index(self):
+        """extraConfig settings as a path -> value mapping (see config_index)."""
+        return config_index(self.clickhouse_config.get("extraConfig") or "")
+
     def get_expected_pod_count(self):
         """Total pods = ClickHouse pods + Keeper pods."""
         ch_pods = self.get_expected_clickhouse_pod_count()
@@ -90,6 +118,39 @@ class HelmState:
             return 0
         return self.keeper_config.get("replicaCount", 0)
 
+    def get_resource_footprint(self, include_operator=True):
+        """Estimate the CPU (cores) and memory (bytes) this deployment requests.
+
+        Uses the pod counts above and the configured resource requests,
+        falling back to defaults for pods without requests. The operator
+        pod is left out with `include_operator=False`, for releases that
+        use a shared operator.
+        """
+        ch_requests = dict(DEFAULT_CLICKHOUSE_REQUESTS)
+        ch_requests.update(
+            (self.clickhouse_config.get("resources") or {}).get("requests") or {}
+        )
+
+        keeper_requests = dict(DEFAULT_KEEPER_REQUESTS)
+        keeper_resources = self.keeper_config.get("resources") or {}
+        if "cpuRequestsMs" in keeper_resources:
+            keeper_requests["cpu"] = f"{keeper_resources['cpuRequestsMs']}m"
+        if "memoryRequestsMiB" in keeper_resources:
+            keeper_requests["memory"] = keeper_resources["memoryRequestsMiB"]
+
+        pods = [
+            (ch_requests, self.get_expected_clickhouse_pod_count()),
+            (keeper_requests, self.get_expected_keeper_count()),
+        ]
+        if include_operator and self.values.get("operator", {}).get("enabled", True):
+            pods.append((OPERATOR_REQUESTS, 1))
+
+        cpu = sum(parse_cpu(requests["cpu"]) * count for requests, count in pods)
+        memory = sum(
+            parse_memory(requests["memory"]) * count for requests, count in pods
+        )
+        return cpu, memory
+
     def verify_deployment(self, namespace):
         """Wait for and verify deployment is ready."""
         expected_total = self.get_expected_pod_count()
@@ -115,7 +176,7 @@ class HelmState:
                 namespace=namespace, expected_count=expected_keeper
             )
 
-    def verify_cluster_topology(self, namespace):
+    def verify_cluster_topology(self, namespace, chi_info=None):
         """Verify replicas and shards counts match configuration."""
         expected_replicas = self.clickhouse_config.get("replicasCount", 1)
         expected_shards = self.clickhouse_config.get("shardsCount", 1)
@@ -124,25 +185,31 @@ class HelmState:
             namespace=namespace,
             expected_replicas=expected_replicas,
             expected_shards=expected_shards,
+            chi_info=chi_info,
         )
 
-    def verify_name_override(self, namespace):
+    def verify_name_override(self, namespace, chi_info=None):
         """Verify custom name is used in resources."""
         name_override = self.values.get("nameOverride")
         clickhouse.verify_custom_name_in_resources(
-            namespace=namespace, custom_name=name_override
+            namespace=namespace, custom_name=name_override, chi_info=chi_info
         )
         note(f"✓ nameOverride: {name_override}")
 
-    def verify_persistence(self, namespace):
-        """Verify persistence storage configuration."""
+    def verify_persistence(self, namespace, chi_info=None):
+        """Verify persistence storage configuration.
+
+        With `chi_info` only the rendered volume claim templates are checked.
+        """
         persistence_config = self.clickhouse_config.get("persistence", {})
         expected_size = persistence_config.get("size")
         expected_access_mode = persistence_config.get("accessMode", "ReadWriteOnce")
 
         clickhouse.verify_persistence_configuration(
-            namespace=namespace, expected_size=expected_size
+            namespace=namespace, expected_size=expected_size, chi_info=chi_info
         )
+        if chi_info is not None:
+            return
 
         clickhouse.verify_clickhouse_pvc_size(
             namespace=namespace, expected_size=expected_size
@@ -152,7 +219,7 @@ class HelmState:
             namespace=namespace,
             expected_access_mode=expected_access_mode,
             pvc_name_filter="data",
-            resource_matcher=clickhouse.is_clickhouse_resource,
+            labels={clickhouse.CHI_LABEL: None},
         )
 
     def verify_service(self, namespace):
@@ -260,60 +327,62 @@ class HelmState:
                 namespace=namespace,
                 expected_access_mode=expected_access_mode,
                 pvc_name_filter="logs",
-                resource_matcher=clickhouse.is_clickhouse_resource,
+                labels={clickhouse.CHI_LABEL: None},
             )
 
-    def verify_extra_config(self, namespace):
-        """Verify extraConfig custom ClickHouse configuration."""
+    def verify_extra_config(self, namespace, chi_info=None):
+        """Verify extraConfig custom ClickHouse configuration.
+
+        With `chi_info` only the rendered keys are checked, not the values
+        ClickHouse loaded.
+        """
         extra_config = self.clickhouse_config.get("extraConfig", "")
         admin_password = self.clickhouse_config.get("defaultUser", {}).get(
             "password", ""
         )
 
         if extra_config:
-            config_keys = clickhouse.extract_extra_config_keys(
-                extra_config_xml=extra_config
-            )
+            index = self.extra_config_index
 
             clickhouse.verify_extra_config(
-                namespace=namespace, expected_config_keys=config_keys
+                namespace=namespace, expected_config_keys=list(index), chi_info=chi_info
             )
 
-            config_values = clickhouse.parse_extra_config_values(
-                extra_config_xml=extra_config
-            )
-
-            if config_values:
+            if index and chi_info is None:
                 clickhouse.verify_extra_config_values(
                     namespace=namespace,
-                    expected_config_values=config_values,
+                    expected_config_values=dict(index),
                     admin_password=admin_password,
                 )
 
             note(f"✓ ExtraConfig verified")
 
-    def verify_keeper_storage(self, namespace):
+    def verify_keeper_storage(self, namespace, chk_info=None):
         """Verify Keeper storage configuration."""
         local_storage = self.keeper_config.get("localStorage", {})
         storage_size = local_storage.get("size")
 
         if storage_size:
             clickhouse.verify_keeper_storage(
-                namespace=namespace, expected_storage_size=storage_size
+                namespace=namespace,
+                expected_storage_size=storage_size,
+                chk_info=chk_info,
             )
             note(f"✓ Keeper storage: {storage_size}")
 
-    def verify_keeper_annotations(self, namespace):
+    def verify_keeper_annotations(self, namespace, chk_info=None):
         """Verify Keeper pod annotations."""
         keeper_annotations = self.keeper_config.get("podAnnotations", {})
 
         if keeper_annotations:
             clickhouse.verify_keeper_annotations(
-                namespace=namespace, expected_annotations=keeper_annotations
+                namespace=namespace,
+                expected_annotations=keeper_annotations,
+                chk_info=chk_info,
             )
             note(f"✓ Keeper annotations: {len(keeper_annotations)} verified")
 
-    def verify_keeper_resources(self, namespace):
+    def verify_keeper_resources(self, namespace, chk_info=None):
         """Verify Keeper resource requests and limits."""
         resources_config = self.keeper_config.get("resources", {})
 
@@ -324,11 +393,13 @@ class HelmState:
 
             if expected_resources:
                 clickhouse.verify_keeper_resources(
-                    namespace=namespace, expected_resources=expected_resources
+                    namespace=namespace,
+                    expected_resources=expected_resources,
+                    chk_info=chk_info,
                 )
                 note(f"✓ Keeper resources verified")
 
-    def verify_extra_containers(self, namespace):
+    def verify_extra_containers(self, namespace, chi_info=None):
         """Verify extraContainers configuration that affects CHI pod templates."""
         extra_containers = self.clickhouse_config.get("extraContainers", []) or []
         if not extra_containers:
@@ -338,6 +409,7 @@ class HelmState:
             clickhouse.verify_extra_container_spec(
                 namespace=namespace,
                 expected_container=c,
+                chi_info=chi_info,
             )
             mounts = c.get("mounts") or {}
             if mounts.get("data") is True:
@@ -348,9 +420,10 @@ class HelmState:
                     namespace=namespace,
                     container_name=container_name,
                     expected_volume_name=None,
+                    chi_info=chi_info,
                 )
 
-    def verify_clickhouse_resources(self, namespace):
+    def verify_clickhouse_resources(self, namespace, chi_info=None):
         """Verify ClickHouse container resources."""
         resources_config = self.clickhouse_config.get("resources") or {}
         if not resources_config:
@@ -359,9 +432,10 @@ class HelmState:
         clickhouse.verify_clickhouse_resources(
             namespace=namespace,
             expected_resources=resources_config,
+            chi_info=chi_info,
         )
 
-    def verify_profiles_and_user_settings(self, namespace):
+    def verify_profiles_and_user_settings(self, namespace, chi_info=None):
         """Verify users, profiles, and settings render correctly in CHI."""
         users = self.clickhouse_config.get("users") or []
         profiles = self.clickhouse_config.get("profiles") or {}
@@ -375,6 +449,7 @@ class HelmState:
             expected_users=users,
             expected_profiles=profiles,
             expected_settings=settings,
+            chi_info=chi_info,
         )
 
     def verify_replication_health(self, namespace):
@@ -411,7 +486,13 @@ class HelmState:
 
         if expected_replicas > 1:
             clickhouse.verify_replication_working(
-                namespace=namespace, admin_password=admin_password
+                namespace=namespace,
+                admin_password=admin_password,
+                lag_slo=getattr(
+                    current().context,
+                    "replication_lag_slo",
+                    clickhouse.DEFAULT_REPLICATION_LAG_SLO,
+                ),
             )
             note(f"✓ Replication data test passed")
 
@@ -429,88 +510,497 @@ class HelmState:
         clickhouse.verify_secrets_exist(namespace=namespace)
         note(f"✓ Secrets verified")
 
-    def verify_all(self, namespace):
+    def get_changed_verifiers(self, previous):
+        """Return the verifiers to re-run after upgrading from `previous`.
+
+        These are the applicable verifiers whose values paths changed
+        between the two states or that did not apply before, the invariant
+        ones, and everything they require. A change to one of GLOBAL_VALUES selects all verifiers.
+        """
+        changed = diff_values(previous.values, self.values)
+        applicable = [v for v in VERIFIERS if v.applies(self)]
+        note(f"Changed values: {', '.join(changed) or 'none'}")
+
+        if any(path in GLOBAL_VALUES for path in changed):
+            return applicable
+
+        selected = {
+            v.name
+            for v in applicable
+            if v.invariant or v.affected_by(changed) or not v.applies(previous)
+        }
+        by_name = {v.name: v for v in applicable}
+        stack = list(selected)
+        while stack:
+            for required in by_name[stack.pop()].requires:
+                if required in by_name and required not in selected:
+                    selected.add(required)
+                    stack.append(required)
+
+        return [v for v in applicable if v.name in selected]
+
+    def verify_changes(self, namespace, previous, workers=None):
+        """Re-run only the checks affected by an upgrade from `previous`.
+
+        Args:
+            namespace: Kubernetes namespace
+            previous: HelmState the release was upgraded from
+            workers: Maximum number of checks running at once
+        """
+        verifiers = self.get_changed_verifiers(previous=previous)
+        note(f"Re-verifying: {', '.join(v.name for v in verifiers)}")
+
+        if workers is None:
+            workers = getattr(
+                current().context, "verify_workers", DEFAULT_VERIFY_WORKERS
+            )
+
+        run_verifiers(
+            state=self, namespace=namespace, verifiers=verifiers, workers=workers
+        )
+
+    def verify_all(self, namespace, render=False, workers=None):
         """Run all verification checks based on configuration.
 
         This is the main orchestrator - it decides which checks to run
-        based on the Helm values configuration.
+        based on the Helm values configuration (see VERIFIERS) and runs
+        them with run_verifiers, up to `workers` at a time (default: the
+        `verify_workers` context attribute, else DEFAULT_VERIFY_WORKERS).
+        With `render=True` only the verifiers that can check a rendered CHI
+        or CHK run (see Verifier `render`), against `helm template` output
+        instead of a live deployment.
         """
-        note(f"Verifying deployment state from: {self.values_file.name}")
+        if workers is None:
+            workers = getattr(
+                current().context, "verify_workers", DEFAULT_VERIFY_WORKERS
+            )
 
-        self.verify_deployment(namespace=namespace)
-        self.verify_cluster_topology(namespace=namespace)
+        verifiers = [v for v in VERIFIERS if v.applies(self)]
 
-        expected_replicas = self.clickhouse_config.get("replicasCount", 1)
-        expected_shards = self.clickhouse_config.get("shardsCount", 1)
-        if expected_replicas > 1 or expected_shards > 1:
-            self.verify_replication_health(namespace=namespace)
+        if not render:
+            note(f"Verifying deployment state from: {self.values_file.name}")
+            run_verifiers(
+                state=self, namespace=namespace, verifiers=verifiers, workers=workers
+            )
+            return
 
-            if expected_replicas > 1:
-                self.verify_replication_working(namespace=namespace)
+        note(f"Verifying rendered manifests from: {self.values_file.name}")
 
-        self.verify_service_endpoints(namespace=namespace)
-        self.verify_secrets(namespace=namespace)
+        manifests = helm.render(
+            values_file=str(self.values_file),
+            release_name=namespace,
+            namespace=namespace,
+        )
+        rendered = {
+            "chi": manifests.get("ClickHouseInstallation"),
+            "chk": manifests.get("ClickHouseKeeperInstallation"),
+        }
+        assert rendered["chi"] is not None, "ClickHouseInstallation not rendered"
+        if self.keeper_config.get("enabled"):
+            assert (
+                rendered["chk"] is not None
+            ), "ClickHouseKeeperInstallation not rendered"
+
+        run_verifiers(
+            state=self,
+            namespace=namespace,
+            verifiers=[v for v in verifiers if v.render],
+            workers=workers,
+            rendered=rendered,
+        )
+        note(f"✓ Rendered manifests verified")
 
-        if self.values.get("nameOverride"):
-            self.verify_name_override(namespace=namespace)
 
-        if self.clickhouse_config.get("persistence", {}).get("enabled"):
-            self.verify_persistence(namespace=namespace)
+def diff_values(old, new, prefix=""):
+    """Return the sorted dotted paths at which two values trees differ.
 
-            if (
-                self.clickhouse_config.get("persistence", {})
-                .get("logs", {})
-                .get("enabled")
-            ):
-                self.verify_log_persistence(namespace=namespace)
+    Dicts are compared key by key, any other value (including lists) as
+    a whole, so a changed list is reported at its own path.
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [prefix] if old != new else []
 
-        if self.clickhouse_config.get("lbService", {}).get("enabled"):
-            self.verify_service(namespace=namespace)
+    paths = []
+    for key in sorted(set(old) | set(new), key=str):
+        path = f"{prefix}.{key}" if prefix else str(key)
+        paths += diff_values(old.get(key), new.get(key), prefix=path)
+    return paths
 
-        if self.clickhouse_config.get("defaultUser") or self.clickhouse_config.get(
-            "users"
-        ):
-            self.verify_users(namespace=namespace)
 
-        if self.clickhouse_config.get("podAnnotations"):
-            self.verify_pod_annotations(namespace=namespace)
+class Verifier:
+    """A HelmState check and what it needs to run.
+
+    Args:
+        name: Check name, referenced by `requires` of other verifiers
+        method: Name of the HelmState method running the check
+        requires: Verifiers that must pass before this one runs
+        reads: What the check reads, kubectl resource names (see
+            NamespaceSnapshot.KINDS) or "clickhouse" for SQL queries
+        values: Values paths the check depends on
+        when: Predicate on the HelmState, the check runs only if it is true
+        invariant: Cheap check re-run after every upgrade, whatever changed
+        render: Rendered object the check can inspect instead of the
+            cluster, "chi" or "chk". The method then takes it as
+            `chi_info` or `chk_info`.
+    """
 
-        if self.clickhouse_config.get("podLabels"):
-            self.verify_pod_labels(namespace=namespace)
+    def __init__(
+        self,
+        name,
+        method,
+        requires=(),
+        reads=(),
+        values=(),
+        when=None,
+        invariant=False,
+        render=None,
+    ):
+        self.name = name
+        self.method = method
+        self.requires = tuple(requires)
+        self.reads = frozenset(reads)
+        self.values = tuple(values)
+        self.when = when
+        self.invariant = invariant
+        self.render = render
+
+    def applies(self, state):
+        """Return True if the check runs for this state."""
+        return self.when is None or bool(self.when(state))
+
+    def affected_by(self, paths):
+        """Return True if any of the changed values paths is one this check reads.
+
+        A path matches if it equals, contains or is contained in one of
+        the check's values paths, e.g. "clickhouse.persistence.size"
+        matches "clickhouse.persistence" and the other way round.
+        """
+        return any(
+            changed == path
+            or changed.startswith(path + ".")
+            or path.startswith(changed + ".")
+            for changed in paths
+            for path in self.values
+        )
 
-        if self.clickhouse_config.get("service", {}).get("serviceAnnotations"):
-            self.verify_service_annotations(namespace=namespace)
 
-        if self.clickhouse_config.get("service", {}).get("serviceLabels"):
-            self.verify_service_labels(namespace=namespace)
+def replicated(state):
+    """Return True if the deployment has more than one ClickHouse pod."""
+    return (
+        state.get_value("clickhouse.replicasCount", 1) > 1
+        or state.get_value("clickhouse.shardsCount", 1) > 1
+    )
+
+
+# Values that change every resource name, any change to them re-runs all checks
+GLOBAL_VALUES = ("nameOverride", "fullnameOverride")
+
+# Every check verify_all runs. "deployment" waits for all pods to be
+# running, so every other check requires it, directly or through another
+# check. Checks without a path between them in `requires` run concurrently.
+# Checks with `render` also run in render mode, on `helm template` output.
+VERIFIERS = (
+    Verifier(
+        "deployment",
+        "verify_deployment",
+        reads=("pod",),
+        values=(
+            "clickhouse.replicasCount",
+            "clickhouse.shardsCount",
+            "keeper.enabled",
+            "keeper.replicaCount",
+        ),
+        invariant=True,
+    ),
+    Verifier(
+        "cluster topology",
+        "verify_cluster_topology",
+        requires=("deployment",),
+        reads=("chi",),
+        values=("clickhouse.replicasCount", "clickhouse.shardsCount"),
+        invariant=True,
+        render="chi",
+    ),
+    Verifier(
+        "replication health",
+        "verify_replication_health",
+        requires=("cluster topology",),
+        reads=("clickhouse",),
+        values=(
+            "clickhouse.replicasCount",
+            "clickhouse.shardsCount",
+            "clickhouse.defaultUser.password",
+        ),
+        when=replicated,
+    ),
+    Verifier(
+        "replication working",
+        "verify_replication_working",
+        requires=("replication health",),
+        reads=("clickhouse",),
+        values=("clickhouse.replicasCount", "clickhouse.defaultUser.password"),
+        when=lambda s: s.get_value("clickhouse.replicasCount", 1) > 1,
+    ),
+    Verifier(
+        "service endpoints",
+        "verify_service_endpoints",
+        requires=("deployment",),
+        reads=("svc", "endpoints"),
+        values=("clickhouse.replicasCount", "clickhouse.shardsCount"),
+        invariant=True,
+    ),
+    Verifier(
+        "secrets",
+        "verify_secrets",
+        requires=("deployment",),
+        reads=("secret",),
+        values=("clickhouse.defaultUser",),
+        invariant=True,
+    ),
+    Verifier(
+        "name override",
+        "verify_name_override",
+        requires=("deployment",),
+        reads=("chi", "pod"),
+        values=("nameOverride",),
+        when=lambda s: s.get_value("nameOverride"),
+        render="chi",
+    ),
+    Verifier(
+        "persistence",
+        "verify_persistence",
+        requires=("deployment",),
+        reads=("chi", "pod", "pvc"),
+        values=("clickhouse.persistence",),
+        when=lambda s: s.get_value("clickhouse.persistence.enabled"),
+        render="chi",
+    ),
+    Verifier(
+        "log persistence",
+        "verify_log_persistence",
+        requires=("deployment",),
+        reads=("pod", "pvc"),
+        values=("clickhouse.persistence",),
+        when=lambda s: s.get_value("clickhouse.persistence.enabled")
+        and s.get_value("clickhouse.persistence.logs.enabled"),
+    ),
+    Verifier(
+        "load balancer service",
+        "verify_service",
+        requires=("deployment",),
+        reads=("svc",),
+        values=("clickhouse.lbService",),
+        when=lambda s: s.get_value("clickhouse.lbService.enabled"),
+    ),
+    Verifier(
+        "users",
+        "verify_users",
+        requires=("deployment",),
+        reads=("clickhouse",),
+        values=("clickhouse.defaultUser", "clickhouse.users"),
+        when=lambda s: s.get_value("clickhouse.defaultUser")
+        or s.get_value("clickhouse.users"),
+    ),
+    Verifier(
+        "pod annotations",
+        "verify_pod_annotations",
+        requires=("deployment",),
+        reads=("pod",),
+        values=("clickhouse.podAnnotations",),
+        when=lambda s: s.get_value("clickhouse.podAnnotations"),
+    ),
+    Verifier(
+        "pod labels",
+        "verify_pod_labels",
+        requires=("deployment",),
+        reads=("pod",),
+        values=("clickhouse.podLabels",),
+        when=lambda s: s.get_value("clickhouse.podLabels"),
+    ),
+    Verifier(
+        "service annotations",
+        "verify_service_annotations",
+        requires=("deployment",),
+        reads=("svc",),
+        values=("clickhouse.service",),
+        when=lambda s: s.get_value("clickhouse.service.serviceAnnotations"),
+    ),
+    Verifier(
+        "service labels",
+        "verify_service_labels",
+        requires=("deployment",),
+        reads=("svc",),
+        values=("clickhouse.service",),
+        when=lambda s: s.get_value("clickhouse.service.serviceLabels"),
+    ),
+    Verifier(
+        "extra config",
+        "verify_extra_config",
+        requires=("deployment",),
+        reads=("chi", "clickhouse"),
+        values=("clickhouse.extraConfig", "clickhouse.defaultUser.password"),
+        when=lambda s: s.get_value("clickhouse.extraConfig"),
+        render="chi",
+    ),
+    Verifier(
+        "extra containers",
+        "verify_extra_containers",
+        requires=("deployment",),
+        reads=("chi", "pod"),
+        values=("clickhouse.extraContainers",),
+        when=lambda s: s.get_value("clickhouse.extraContainers"),
+        render="chi",
+    ),
+    Verifier(
+        "clickhouse resources",
+        "verify_clickhouse_resources",
+        requires=("deployment",),
+        reads=("chi", "pod"),
+        values=("clickhouse.resources",),
+        when=lambda s: s.get_value("clickhouse.resources"),
+        render="chi",
+    ),
+    Verifier(
+        "profiles and user settings",
+        "verify_profiles_and_user_settings",
+        requires=("deployment",),
+        reads=("chi",),
+        values=("clickhouse.users", "clickhouse.profiles", "clickhouse.settings"),
+        when=lambda s: s.get_value("clickhouse.users")
+        or s.get_value("clickhouse.profiles")
+        or s.get_value("clickhouse.settings"),
+        render="chi",
+    ),
+    Verifier(
+        "keeper",
+        "verify_keeper",
+        requires=("deployment",),
+        reads=("pod",),
+        values=("keeper.enabled", "keeper.replicaCount"),
+        when=lambda s: s.get_value("keeper.enabled"),
+    ),
+    Verifier(
+        "keeper storage",
+        "verify_keeper_storage",
+        requires=("keeper",),
+        reads=("pod", "pvc"),
+        values=("keeper.localStorage",),
+        when=lambda s: s.get_value("keeper.enabled")
+        and s.get_value("keeper.localStorage.size"),
+        render="chk",
+    ),
+    Verifier(
+        "keeper annotations",
+        "verify_keeper_annotations",
+        requires=("keeper",),
+        reads=("pod",),
+        values=("keeper.podAnnotations",),
+        when=lambda s: s.get_value("keeper.enabled")
+        and s.get_value("keeper.podAnnotations"),
+        render="chk",
+    ),
+    Verifier(
+        "keeper resources",
+        "verify_keeper_resources",
+        requires=("keeper",),
+        reads=("pod",),
+        values=("keeper.resources",),
+        when=lambda s: s.get_value("keeper.enabled")
+        and s.get_value("keeper.resources"),
+        render="chk",
+    ),
+    Verifier(
+        "image",
+        "verify_image",
+        requires=("deployment",),
+        reads=("pod",),
+        values=("clickhouse.image",),
+        when=lambda s: s.get_value("clickhouse.image.tag"),
+    ),
+)
 
-        if self.clickhouse_config.get("extraConfig"):
-            self.verify_extra_config(namespace=namespace)
 
-        if self.clickhouse_config.get("extraContainers"):
-            self.verify_extra_containers(namespace=namespace)
+@TestStep(Then)
+def run_verifier(self, state, verifier, namespace, passed, rendered=None):
+    """Run one verifier and add its name to `passed` if it succeeds.
 
-        if self.clickhouse_config.get("resources"):
-            self.verify_clickhouse_resources(namespace=namespace)
+    With `rendered`, the verifier checks its rendered object instead of the
+    cluster.
+    """
+    kwargs = {}
+    if rendered is not None:
+        kwargs[f"{verifier.render}_info"] = rendered[verifier.render]
+    getattr(state, verifier.method)(namespace=namespace, **kwargs)
+    passed.add(verifier.name)
 
-        if (
-            self.clickhouse_config.get("users")
-            or self.clickhouse_config.get("profiles")
-            or self.clickhouse_config.get("settings")
-        ):
-            self.verify_profiles_and_user_settings(namespace=namespace)
 
-        if self.keeper_config.get("enabled"):
-            self.verify_keeper(namespace=namespace)
+@TestStep(Then)
+def run_verifiers(
+    self, state, namespace, verifiers, workers=DEFAULT_VERIFY_WORKERS, rendered=None
+):
+    """Run verifiers in dependency order, independent ones concurrently.
 
-            if self.keeper_config.get("localStorage", {}).get("size"):
-                self.verify_keeper_storage(namespace=namespace)
+    Verifiers run in waves: each wave holds every verifier whose
+    requirements have all finished, and runs as parallel checks in a pool
+    of `workers`, so the total time approaches that of the longest chain
+    of `requires`. Requirements outside `verifiers` are taken as met. A
+    failing verifier is reported as its own check, the others still run,
+    and verifiers requiring it are skipped. The namespace snapshot is
+    loaded after the verifiers without requirements, which wait for the
+    deployment to be ready, have finished.
 
-            if self.keeper_config.get("podAnnotations"):
-                self.verify_keeper_annotations(namespace=namespace)
+    Args:
+        state: HelmState to verify
+        namespace: Kubernetes namespace
+        verifiers: Verifiers to run
+        workers: Maximum number of verifiers running at once
+        rendered: Optional {"chi": ..., "chk": ...} rendered objects the
+            verifiers check instead of the cluster (see Verifier `render`)
+    """
+    names = {v.name for v in verifiers}
+    readiness = {v.name for v in verifiers if not v.requires}
+    pending = list(verifiers)
+    finished = set()
+    passed = set()
+
+    while pending:
+        wave = [
+            v
+            for v in pending
+            if all(r in finished or r not in names for r in v.requires)
+        ]
+        assert wave, f"Circular requirements between: {[v.name for v in pending]}"
+        pending = [v for v in pending if v not in wave]
 
-            if self.keeper_config.get("resources"):
-                self.verify_keeper_resources(namespace=namespace)
+        if (
+            rendered is None
+            and readiness <= finished
+            and any(v.reads & set(kubernetes.NamespaceSnapshot.KINDS) for v in wave)
+        ):
+            # Load the snapshot here so that all checks of the wave share it,
+            # but only once the readiness checks have waited for the pods
+            kubernetes.get_namespace_snapshot(namespace=namespace)
+
+        with Pool(workers) as pool:
+            for v in wave:
+                failed = [r for r in v.requires if r in names and r not in passed]
+                if failed:
+                    note(f"⊘ Skipping {v.name}: {', '.join(failed)} failed")
+                    continue
+
+                Check(
+                    name=v.name,
+                    test=run_verifier,
+                    parallel=True,
+                    executor=pool,
+                    flags=TE,
+                )(
+                    state=state,
+                    verifier=v,
+                    namespace=namespace,
+                    passed=passed,
+                    rendered=rendered,
+                )
+            join()
 
-        if self.clickhouse_config.get("image", {}).get("tag"):
-            self.verify_image(namespace=namespace)
+        finished.update(v.name for v in wave)
@@ -1,26 +1,245 @@
 from tests.steps.system import *
 import os
+import shutil
+import hashlib
+import threading
+import yaml
+import tests.steps.kubernetes as kubernetes
+from tests.helpers.render import RenderService
+from tests.helpers.schema import validate_values
+
+# Helm repo config and the chart's charts/ directory are shared by all
+# releases, so parallel installs build dependencies one at a time.
+dependencies_lock = threading.Lock()
+
+# Written to <chart>/charts/ with the digest the vendored charts were built for
+DEPENDENCIES_STAMP = ".dependencies-digest"
+
+DEFAULT_CHART_ARCHIVE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "altinity-helm-charts", "archives"
+)
+
+# `helm template` renders shared by all tests, cached on disk by chart and values
+render_service = RenderService()
+
+
+def dependencies_digest(chart_path):
+    """Return the sha256 of the chart's Chart.yaml and Chart.lock."""
+    digest = hashlib.sha256()
+    for name in ("Chart.yaml", "Chart.lock"):
+        path = os.path.join(chart_path, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def dependency_archives(chart_path):
+    """Return the archive file names of the dependencies pinned in Chart.lock."""
+    lock_path = os.path.join(chart_path, "Chart.lock")
+    if not os.path.exists(lock_path):
+        return []
+
+    with open(lock_path, "r") as f:
+        lock = yaml.safe_load(f) or {}
+
+    return [f"{d['name']}-{d['version']}.tgz" for d in lock.get("dependencies") or []]
+
+
+def chart_archive_dir(context):
+    """Return the local directory holding downloaded dependency archives.
+
+    Taken from context.chart_archive_dir, then the HELM_CHART_ARCHIVE_DIR
+    environment variable, then a directory under ~/.cache.
+    """
+    return (
+        getattr(context, "chart_archive_dir", None)
+        or os.environ.get("HELM_CHART_ARCHIVE_DIR")
+        or DEFAULT_CHART_ARCHIVE_DIR
+    )
 
 
 @TestStep(Given)
 def ensure_dependencies(self, chart_path=None):
     """Ensure Helm chart dependencies are built.
 
+    Nothing is done if the vendored charts were built for the current
+    Chart.yaml and Chart.lock. Otherwise the archives pinned in Chart.lock
+    are copied from the local archive directory when all of them are
+    there, and only then fetched from the Helm repo, which needs network.
+
+    Args:
+        chart_path: Path to the chart directory (defaults to context.local_chart_path)
+    """
+    if chart_path is None:
+        chart_path = self.context.local_chart_path
+
+    charts_dir = os.path.join(chart_path, "charts")
+    stamp_path = os.path.join(charts_dir, DEPENDENCIES_STAMP)
+    archive_dir = chart_archive_dir(self.context)
+
+    with Given("Altinity Helm repo and build dependencies"), dependencies_lock:
+        digest = dependencies_digest(chart_path)
+        archives = dependency_archives(chart_path)
+
+        stamp = None
+        if os.path.exists(stamp_path):
+            with open(stamp_path, "r") as f:
+                stamp = f.read().strip()
+
+        if (
+            archives
+            and stamp == digest
+            and all(os.path.exists(os.path.join(charts_dir, a)) for a in archives)
+        ):
+            note(f"✓ Chart dependencies up to date ({digest[:12]})")
+            return
+
+        if archives and all(
+            os.path.exists(os.path.join(archive_dir, a)) for a in archives
+        ):
+            with By(f"restoring chart dependencies from {archive_dir}"):
+                os.makedirs(charts_dir, exist_ok=True)
+                for archive in archives:
+                    shutil.copy2(os.path.join(archive_dir, archive), charts_dir)
+        else:
+            # Add repo with force update to handle already existing repos
+            run(
+                cmd=f"helm repo add altinity {self.context.altinity_repo} --force-update",
+                check=False,
+            )
+            run(cmd="helm repo update")
+            # Build dependencies in the same context so repo is available
+            run(cmd=f"helm dependency build {chart_path}", check=True)
+
+            with By(f"saving chart dependencies to {archive_dir}"):
+                os.makedirs(archive_dir, exist_ok=True)
+                for archive in archives:
+                    path = os.path.join(charts_dir, archive)
+                    if os.path.exists(path):
+                        shutil.copy2(path, archive_dir)
+
+        with open(stamp_path, "w") as f:
+            f.write(digest)
+
+
+@TestStep(When)
+def validate_values_schema(self, values=None, values_file=None, chart_path=None):
+    """Validate values against the chart's values.schema.json without Helm.
+
+    The values are merged over the chart's values.yaml first, as Helm
+    does. Fails listing the JSON path of every violation, so a bad values
+    file is reported before anything is installed.
+
     Args:
+        values: Dictionary of values to validate
+        values_file: Path to values file (relative to tests/ directory)
         chart_path: Path to the chart directory (defaults to context.local_chart_path)
     """
     if chart_path is None:
         chart_path = self.context.local_chart_path
 
-    with Given("Altinity Helm repo and build dependencies"):
-        # Add repo with force update to handle already existing repos
+    schema_path = os.path.join(chart_path, "values.schema.json")
+    if not os.path.exists(schema_path):
+        return
+
+    if values_file:
+        tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(tests_dir, values_file), "r") as f:
+            values = yaml.safe_load(f)
+
+    errors = validate_values(schema_path, values)
+    assert (
+        not errors
+    ), f"Values {values_file or ''} do not match {schema_path}:\n" + "\n".join(errors)
+    note(f"✓ Values {values_file or ''} match values.schema.json")
+
+
+@TestStep(When)
+def render(
+    self, values=None, values_file=None, release_name="release", namespace="default"
+):
+    """Render the local chart and return its objects as a ManifestIndex.
+
+    Each chart and values combination is rendered with `helm template`
+    once and then served from the render cache.
+
+    Args:
+        values: Dictionary of values to render with
+        values_file: Path to values file (relative to tests/ directory)
+        release_name: Helm release name
+        namespace: Kubernetes namespace
+    """
+    chart_path = self.context.local_chart_path
+    ensure_dependencies()
+
+    values_files = []
+    if values_file:
+        tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        values_files.append(os.path.join(tests_dir, values_file))
+
+    manifests = render_service.render(
+        chart_path,
+        values_files=values_files,
+        values=values,
+        release=release_name,
+        namespace=namespace,
+    )
+    note(
+        f"Rendered {chart_path}: "
+        + ", ".join(f"{len(o)} {k}" for k, o in sorted(manifests.by_kind.items()))
+    )
+    return manifests
+
+
+@TestStep(When)
+def shared_operator_argument(self):
+    """Get the Helm argument disabling the bundled operator when a shared one runs."""
+    if getattr(self.context, "shared_operator_namespace", None):
+        return " --set operator.enabled=false"
+    return ""
+
+
+@TestStep(Given)
+def install_shared_operator(
+    self, namespace="clickhouse-operator", release_name="clickhouse-operator"
+):
+    """Install one cluster-wide ClickHouse Operator from the vendored subchart.
+
+    While it is installed, `install` and `upgrade` deploy releases with the
+    operator subchart disabled so that all of them are reconciled by it.
+    """
+    chart_path = self.context.local_chart_path
+    ensure_dependencies()
+
+    archives = [
+        a
+        for a in dependency_archives(chart_path)
+        if a.startswith("altinity-clickhouse-operator-")
+    ]
+    assert archives, f"No operator chart archive pinned in {chart_path}/Chart.lock"
+    operator_chart = os.path.join(chart_path, "charts", archives[0])
+
+    with When("install shared ClickHouse Operator"):
         run(
-            cmd=f"helm repo add altinity {self.context.altinity_repo} --force-update",
-            check=False,
+            cmd=f"helm install {release_name} {operator_chart} --namespace {namespace} --create-namespace",
+            check=True,
         )
-        run(cmd="helm repo update")
-        # Build dependencies in the same context so repo is available
-        run(cmd=f"helm dependency build {chart_path}", check=True)
+
+    try:
+        with And("wait for shared operator to be ready"):
+            kubernetes.wait_for_pod_count(namespace=namespace, expected_count=1)
+            kubernetes.wait_for_pods_running(namespace=namespace)
+
+        self.context.shared_operator_namespace = namespace
+        note(f"✓ Shared ClickHouse Operator running in {namespace}")
+        yield namespace
+
+    finally:
+        with Finally("uninstall shared ClickHouse Operator"):
+            self.context.shared_operator_namespace = None
+            uninstall(namespace=namespace, release_name=release_name)
+            kubernetes.delete_namespace(namespace=namespace)
 
 
 @TestStep(Given)
@@ -46,6 +265,7 @@ def install(
     chart_path = self.context.local_chart_path if local else "altinity/clickhouse"
 
     if local:
+        validate_values_schema(values=values, values_file=values_file)
         # Ensure dependencies are built for local charts
         ensure_dependencies()
     else:
@@ -55,9 +275,11 @@ def install(
 
     cmd = f"helm install {release_name} {chart_path} --namespace {namespace} --create-namespace"
     cmd += values_argument(values=values, values_file=values_file)
+    cmd += shared_operator_argument()
 
     with When("install ClickHouse Operator"):
         r = run(cmd=cmd, check=True)
+        kubernetes.invalidate_namespace_snapshot(namespace=namespace)
 
     yield r
 
@@ -71,6 +293,7 @@ def uninstall(self, namespace, release_name):
     """Uninstall ClickHouse Operator."""
 
     run(cmd=f"helm uninstall {release_name} -n {namespace}", check=False)
+    kubernetes.invalidate_namespace_snapshot(namespace=namespace)
 
 
 @TestStep(When)
@@ -88,12 +311,15 @@ def upgrade(self, namespace, release_name, values=None, values_file=None, local=
     chart_path = self.context.local_chart_path if local else "altinity/clickhouse"
 
     if local:
+        validate_values_schema(values=values, values_file=values_file)
         # Ensure dependencies are built for local charts
         ensure_dependencies()
 
     cmd = f"helm upgrade {release_name} {chart_path} --namespace {namespace}"
     cmd += values_argument(values=values, values_file=values_file)
+    cmd += shared_operator_argument()
 
     r = run(cmd=cmd)
+    kubernetes.invalidate_namespace_snapshot(namespace=namespace)
 
     return r
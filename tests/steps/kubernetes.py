@@ -1,14 +1,513 @@
 from tests.steps.system import *
 import json
 import time
+import select
+import subprocess
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode
+from tests.helpers.budget import parse_cpu, parse_memory
+
+context_lock = threading.Lock()
+
+# kubectl resource name -> (kind, API group path, plural)
+RESOURCES = {
+    "pod": ("Pod", "/api/v1", "pods"),
+    "pvc": ("PersistentVolumeClaim", "/api/v1", "persistentvolumeclaims"),
+    "svc": ("Service", "/api/v1", "services"),
+    "endpoints": ("Endpoints", "/api/v1", "endpoints"),
+    "secret": ("Secret", "/api/v1", "secrets"),
+    "statefulset": ("StatefulSet", "/apis/apps/v1", "statefulsets"),
+    "chi": (
+        "ClickHouseInstallation",
+        "/apis/clickhouse.altinity.com/v1",
+        "clickhouseinstallations",
+    ),
+    "chk": (
+        "ClickHouseKeeperInstallation",
+        "/apis/clickhouse-keeper.altinity.com/v1",
+        "clickhousekeeperinstallations",
+    ),
+}
+
+
+def resource_path(kind, namespace, name=None):
+    """Return the API server path for a resource kind in a namespace."""
+    _, prefix, plural = RESOURCES[kind]
+    path = f"{prefix}/namespaces/{namespace}/{plural}"
+    if name:
+        path += f"/{name}"
+    return path
+
+
+class KubectlBackend:
+    """Read Kubernetes objects by starting a `kubectl` process per call.
+
+    This is the default backend and the fallback when the API server
+    backend is not available.
+    """
+
+    name = "kubectl"
+
+    def get(self, kind, name, namespace, check=True):
+        """Return a single object as a dict, or None if it can't be read."""
+        result = run(
+            cmd=f"kubectl get {kind} {name} -n {namespace} -o json", check=check
+        )
+        if result.returncode != 0:
+            return None
+        return json.loads(result.stdout)
+
+    def list(self, kind, namespace, label_selector=None, check=True):
+        """Return the list object (with `items`), or None if it can't be read."""
+        cmd = f"kubectl get {kind} -n {namespace} -o json"
+        if label_selector:
+            cmd += f" -l '{label_selector}'"
+
+        result = run(cmd=cmd, check=check)
+        if result.returncode != 0:
+            return None
+        return json.loads(result.stdout)
+
+    def request(self, path, params=None, check=True):
+        """GET a raw API path and return the decoded JSON body."""
+        if params:
+            path += f"?{urlencode(params)}"
+
+        result = run(cmd=f"kubectl get --raw '{path}'", check=check)
+        if result.returncode != 0:
+            return None
+        return json.loads(result.stdout)
+
+    def watch(self, path, params):
+        """Yield watch events from a raw API path until the stream ends."""
+        cmd = f"kubectl get --raw '{path}?{urlencode(params)}'"
+        note(f"> {cmd}")
+        process = subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        try:
+            for line in process.stdout:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            process.kill()
+            process.wait()
+
+    def list_many(self, kinds, namespace):
+        """Return {kind: items} for several kinds in a single kubectl call."""
+        objects = {kind: [] for kind in kinds}
+        result = run(
+            cmd=f"kubectl get {','.join(kinds)} -n {namespace} -o json", check=False
+        )
+
+        if result.returncode != 0:
+            # One unknown kind (e.g. a missing CRD) fails the whole call
+            for kind in kinds:
+                listed = self.list(kind, namespace, check=False)
+                objects[kind] = listed.get("items", []) if listed else []
+            return objects
+
+        kinds_by_name = {RESOURCES[kind][0]: kind for kind in kinds}
+        for item in json.loads(result.stdout).get("items", []):
+            kind = kinds_by_name.get(item.get("kind"))
+            if kind:
+                objects[kind].append(item)
+
+        return objects
+
+    def close(self):
+        pass
+
+
+class ApiServerBackend:
+    """Read Kubernetes objects over pooled keep-alive HTTP connections.
+
+    A single `kubectl proxy` process handles kubeconfig parsing and TLS to the
+    API server once, every read after that is a plain HTTP request on a
+    connection reused from the session pool. Calls fall back to `kubectl` if
+    the proxy goes away.
+    """
+
+    name = "api"
+
+    def __init__(self, pool_size=10, startup_timeout=30):
+        self.fallback = KubectlBackend()
+        self.process = subprocess.Popen(
+            ["kubectl", "proxy", "--port=0"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+        ready, _, _ = select.select([self.process.stdout], [], [], startup_timeout)
+        line = self.process.stdout.readline() if ready else ""
+        if "Starting to serve on" not in line:
+            self.process.kill()
+            raise RuntimeError(f"kubectl proxy failed to start: {line.strip()!r}")
+
+        self.url = f"http://{line.strip().rsplit(' ', 1)[-1]}"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+
+    def request(self, path, params=None, check=True):
+        """GET an API path and return the decoded JSON body."""
+        start_time = time.time()
+        response = self.session.get(f"{self.url}{path}", params=params, timeout=60)
+        record_call(
+            family="kube api",
+            wall_time=time.time() - start_time,
+            stdout_bytes=len(response.content),
+        )
+
+        if response.status_code != 200:
+            if check:
+                raise RuntimeError(
+                    f"GET {path} failed: {response.status_code} {response.text.strip()}"
+                )
+            return None
+
+        return response.json()
+
+    def get(self, kind, name, namespace, check=True):
+        """Return a single object as a dict, or None if it can't be read."""
+        try:
+            obj = self.request(resource_path(kind, namespace, name), check=check)
+        except requests.ConnectionError:
+            return self.fallback.get(kind, name, namespace, check=check)
+
+        if obj is not None:
+            obj.setdefault("kind", RESOURCES[kind][0])
+        return obj
+
+    def list(self, kind, namespace, label_selector=None, check=True):
+        """Return the list object (with `items`), or None if it can't be read."""
+        params = {"labelSelector": label_selector} if label_selector else None
+        try:
+            obj = self.request(
+                resource_path(kind, namespace), params=params, check=check
+            )
+        except requests.ConnectionError:
+            return self.fallback.list(
+                kind, namespace, label_selector=label_selector, check=check
+            )
+
+        if obj is not None:
+            # List responses omit kind on items, kubectl fills it in
+            for item in obj.get("items", []):
+                item.setdefault("kind", RESOURCES[kind][0])
+        return obj
+
+    def watch(self, path, params):
+        """Yield watch events from an API path until the stream ends."""
+        try:
+            response = self.session.get(
+                f"{self.url}{path}",
+                params=params,
+                stream=True,
+                timeout=(10, int(params.get("timeoutSeconds", 60)) + 10),
+            )
+        except requests.ConnectionError:
+            yield from self.fallback.watch(path, params)
+            return
+
+        with response:
+            if response.status_code != 200:
+                status = {"code": response.status_code, "message": response.text}
+                yield {"type": "ERROR", "object": status}
+                return
+
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def list_many(self, kinds, namespace):
+        """Return {kind: items} for several kinds over the pooled connection."""
+        objects = {}
+        for kind in kinds:
+            listed = self.list(kind, namespace, check=False)
+            objects[kind] = listed.get("items", []) if listed else []
+        return objects
+
+    def close(self):
+        self.session.close()
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class NamespaceSnapshot:
+    """Point-in-time copy of the objects in a namespace.
+
+    Objects are indexed by kind and name, and by kind and label so that
+    read-only checks can be answered from memory. A snapshot never refreshes
+    itself, use `invalidate_namespace_snapshot` after changing the namespace.
+    """
+
+    KINDS = ("pod", "pvc", "svc", "endpoints", "secret", "chi", "chk")
+
+    def __init__(self, namespace, objects):
+        self.namespace = namespace
+        self.by_name = {}
+        self.by_label = {}
+
+        for kind, items in objects.items():
+            names = self.by_name.setdefault(kind, {})
+            labels = self.by_label.setdefault(kind, {})
+            for item in items:
+                name = item["metadata"]["name"]
+                names[name] = item
+                for key, value in (item["metadata"].get("labels") or {}).items():
+                    labels.setdefault((key, value), set()).add(name)
+                    labels.setdefault((key, None), set()).add(name)
+
+    def get(self, kind, name):
+        """Return the object with the given name, or None."""
+        return self.by_name.get(kind, {}).get(name)
+
+    def names(self, kind, labels=None):
+        """Return sorted object names, optionally filtered by labels.
+
+        Args:
+            kind: kubectl resource name (see RESOURCES)
+            labels: Dict of label key to value, a None value matches any value
+        """
+        names = set(self.by_name.get(kind, {}))
+        for key, value in (labels or {}).items():
+            names &= self.by_label.get(kind, {}).get((key, value), set())
+        return sorted(names)
+
+    def list(self, kind, labels=None):
+        """Return objects sorted by name, optionally filtered by labels."""
+        return [self.by_name[kind][name] for name in self.names(kind, labels=labels)]
+
+
+class PortForward:
+    """A `kubectl port-forward` from a free local port to a pod or service.
+
+    Args:
+        namespace: Kubernetes namespace
+        target: Forward target, e.g. "pod/chi-demo-0-0-0" or "svc/clickhouse-demo"
+        remote_port: Port on the target
+    """
+
+    def __init__(self, namespace, target, remote_port, startup_timeout=30):
+        self.namespace = namespace
+        self.target = target
+        self.remote_port = remote_port
+        self.process = subprocess.Popen(
+            [
+                "kubectl",
+                "port-forward",
+                "-n",
+                namespace,
+                target,
+                f":{remote_port}",
+                "--address",
+                "127.0.0.1",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+        ready, _, _ = select.select([self.process.stdout], [], [], startup_timeout)
+        line = self.process.stdout.readline() if ready else ""
+        if "Forwarding from" not in line:
+            self.process.kill()
+            raise RuntimeError(
+                f"port-forward to {namespace}/{target}:{remote_port} failed: {line.strip()!r}"
+            )
+
+        # "Forwarding from 127.0.0.1:41234 -> 8123"
+        self.local_port = int(line.split("->")[0].strip().rsplit(":", 1)[-1])
+
+        # kubectl logs every accepted connection, keep the pipe drained
+        threading.Thread(target=self.process.stdout.read, daemon=True).start()
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def get_backend():
+    """Return the Kubernetes backend selected for the current test."""
+    test = current()
+    backend = getattr(test.context, "kube_backend", None) if test else None
+    return backend or KubectlBackend()
+
+
+def watch_objects(kind, namespace, timeout, label_selector=None):
+    """Follow objects of a kind with a list followed by a resumable watch.
+
+    Yields (event_type, object) tuples. Every (re)list is announced with a
+    RESET event, replayed as ADDED events and closed with a SYNCED event, after
+    that each watch event is passed through as it arrives. The watch resumes
+    from the last seen resourceVersion and relists if it has expired (410 Gone).
+    Stops yielding once `timeout` seconds have passed.
+
+    Args:
+        kind: kubectl resource name (see RESOURCES)
+        namespace: Kubernetes namespace
+        timeout: Seconds to follow the objects for
+        label_selector: Optional label selector
+    """
+    backend = get_backend()
+    path = resource_path(kind, namespace)
+    deadline = time.time() + timeout
+    resource_version = None
+
+    while time.time() < deadline:
+        params = {"labelSelector": label_selector} if label_selector else {}
+
+        if resource_version is None:
+            listed = backend.request(path, params=params)
+            resource_version = listed["metadata"]["resourceVersion"]
+
+            yield "RESET", None
+            for item in listed.get("items", []):
+                yield "ADDED", item
+            yield "SYNCED", None
+
+        params.update(
+            watch="1",
+            resourceVersion=resource_version,
+            allowWatchBookmarks="true",
+            timeoutSeconds=str(max(1, min(60, int(deadline - time.time())))),
+        )
+
+        for event in backend.watch(path, params):
+            event_type = event.get("type")
+            obj = event.get("object", {})
+
+            if event_type == "ERROR":
+                if obj.get("code") != 410:
+                    raise RuntimeError(f"Watch on {path} failed: {obj}")
+                resource_version = None
+                break
+
+            resource_version = obj["metadata"]["resourceVersion"]
+            if event_type != "BOOKMARK":
+                yield event_type, obj
+
+            if time.time() >= deadline:
+                return
+
+
+@TestStep(Given)
+def use_api_backend(self, pool_size=10):
+    """Serve Kubernetes reads from a pooled API server connection.
+
+    Keeps using the kubectl backend if the proxy can't be started.
+    """
+    try:
+        backend = ApiServerBackend(pool_size=pool_size)
+    except Exception as e:
+        note(f"⚠ Kubernetes API backend unavailable, using kubectl: {e}")
+        yield None
+        return
+
+    self.context.kube_backend = backend
+    note(f"✓ Kubernetes API backend: {backend.url}")
+
+    try:
+        yield backend
+    finally:
+        with Finally("stop Kubernetes API backend"):
+            self.context.kube_backend = None
+            backend.close()
+
+
+@TestStep(When)
+def get_resource(self, kind, name, namespace, check=True):
+    """Get a single Kubernetes object as a dictionary.
+
+    Args:
+        kind: kubectl resource name (see RESOURCES)
+        name: Object name
+        namespace: Kubernetes namespace
+        check: Fail on errors, otherwise return None
+
+    Returns:
+        Dict with object information
+    """
+    return get_backend().get(kind, name, namespace, check=check)
+
+
+@TestStep(When)
+def list_resources(self, kind, namespace, label_selector=None, check=True):
+    """List Kubernetes objects of a kind.
+
+    Args:
+        kind: kubectl resource name (see RESOURCES)
+        namespace: Kubernetes namespace
+        label_selector: Optional label selector, e.g. "app=clickhouse"
+        check: Fail on errors, otherwise return an empty list
+
+    Returns:
+        List of object dictionaries
+    """
+    objects = get_backend().list(
+        kind, namespace, label_selector=label_selector, check=check
+    )
+    if objects is None:
+        return []
+    return objects.get("items", [])
+
+
+@TestStep(When)
+def get_namespace_snapshot(self, namespace):
+    """Get the cached snapshot of a namespace, loading it on first use.
+
+    Args:
+        namespace: Kubernetes namespace
+
+    Returns:
+        NamespaceSnapshot shared by all checks in the current test
+    """
+    snapshots = getattr(self.context, "namespace_snapshots", None)
+    if snapshots is None:
+        snapshots = self.context.namespace_snapshots = {}
+
+    if namespace not in snapshots:
+        objects = get_backend().list_many(NamespaceSnapshot.KINDS, namespace)
+        snapshots[namespace] = NamespaceSnapshot(namespace, objects)
+
+    return snapshots[namespace]
+
+
+@TestStep(When)
+def invalidate_namespace_snapshot(self, namespace):
+    """Drop the cached snapshot of a namespace after it was changed.
+
+    Args:
+        namespace: Kubernetes namespace
+    """
+    snapshots = getattr(self.context, "namespace_snapshots", None)
+    if snapshots:
+        snapshots.pop(namespace, None)
 
 
 @TestStep(When)
 def get_pods(self, namespace):
     """Get the list of pods in the specified namespace and return in a list."""
 
-    pods = run(cmd=f"minikube kubectl -- get pods -n {namespace} -o json")
-    pods = json.loads(pods.stdout)["items"]
+    pods = list_resources(kind="pod", namespace=namespace)
 
     return [p["metadata"]["name"] for p in pods]
 
@@ -22,7 +521,10 @@ def debug_namespace_state(self, namespace, expected_count=None, current_count=No
         expected_count: Expected number of pods (optional)
         current_count: Current number of pods (optional)
     """
-    pods = get_pods(namespace=namespace)
+    pods = {
+        pod["metadata"]["name"]: pod
+        for pod in list_resources(kind="pod", namespace=namespace, check=False)
+    }
 
     if expected_count and current_count is not None:
         note(f"❌ TIMEOUT: Expected {expected_count} pods, found {current_count}")
@@ -30,9 +532,8 @@ def debug_namespace_state(self, namespace, expected_count=None, current_count=No
     # Show all pods and their states
     if pods:
         note(f"📋 Current pods: {', '.join(pods)}")
-        for pod_name in pods:
+        for pod_name, pod_info in pods.items():
             try:
-                pod_info = get_pod_info(namespace=namespace, pod_name=pod_name)
                 phase = pod_info["status"].get("phase", "Unknown")
                 conditions = pod_info["status"].get("conditions", [])
                 ready = any(
@@ -101,8 +602,15 @@ def get_pod_info(self, namespace, pod_name):
     Returns:
         Dict with pod information
     """
-    pod_info = run(cmd=f"kubectl get pod {pod_name} -n {namespace} -o json")
-    return json.loads(pod_info.stdout)
+    return get_resource(kind="pod", name=pod_name, namespace=namespace)
+
+
+def is_pod_ready(pod_info, status="Running"):
+    """Check if a pod object is in the desired status and ready."""
+    phase = pod_info["status"].get("phase")
+    conditions = pod_info["status"].get("conditions", [])
+    ready = any(c["type"] == "Ready" and c["status"] == "True" for c in conditions)
+    return phase == status and ready
 
 
 @TestStep(Then)
@@ -110,27 +618,72 @@ def check_status(self, pod_name, namespace, status="Running"):
     """Check if the specified pod is in the desired status and ready."""
 
     pod_info = get_pod_info(namespace=namespace, pod_name=pod_name)
-    phase = pod_info["status"]["phase"]
-    conditions = pod_info["status"].get("conditions", [])
-    ready = any(c["type"] == "Ready" and c["status"] == "True" for c in conditions)
-    return phase == status and ready
+    return is_pod_ready(pod_info, status=status)
 
 
 @TestStep(Given)
 def use_context(self, context_name):
     """Set the kubectl context to the specified context name."""
 
-    run(cmd=f"kubectl config use-context {context_name}")
+    # Parallel scenarios would otherwise race on the kubeconfig lock file
+    with context_lock:
+        run(cmd=f"kubectl config use-context {context_name}")
+
+
+@TestStep(When)
+def get_allocatable_resources(self):
+    """Return the CPU (cores) and memory (bytes) allocatable across all nodes."""
+    result = run(cmd="kubectl get nodes -o json")
+    nodes = json.loads(result.stdout)["items"]
+
+    cpu = sum(parse_cpu(node["status"]["allocatable"]["cpu"]) for node in nodes)
+    memory = sum(
+        parse_memory(node["status"]["allocatable"]["memory"]) for node in nodes
+    )
+    return cpu, memory
+
+
+@TestStep(Given)
+def reserve_cluster_resources(self, budget, cpu, memory):
+    """Hold a reservation on a ResourceBudget until the test finishes."""
+    with By(f"waiting for {cpu:.2f} CPU and {memory / 1024**3:.2f}GiB to free up"):
+        budget.acquire(cpu, memory)
+    try:
+        yield
+    finally:
+        with Finally("release reserved cluster resources"):
+            budget.release(cpu, memory)
 
 
 @TestStep(When)
 def wait_for_pod_count(self, namespace, expected_count, timeout=300):
-    """Wait until the number of pods in the specified namespace matches the expected count."""
+    """Wait until the number of pods in the specified namespace matches the expected count.
+
+    Follows a pod watch, so it returns as soon as the count matches.
+    """
 
-    start_time = time.time()
+    pods = set()
+    synced = False
     last_count = -1
-    while True:
-        pods = get_pods(namespace=namespace)
+
+    for event_type, pod in watch_objects(
+        kind="pod", namespace=namespace, timeout=timeout
+    ):
+        if event_type == "RESET":
+            pods.clear()
+            synced = False
+            continue
+
+        if event_type == "SYNCED":
+            synced = True
+        elif event_type == "DELETED":
+            pods.discard(pod["metadata"]["name"])
+        else:
+            pods.add(pod["metadata"]["name"])
+
+        if not synced:
+            continue
+
         current_count = len(pods)
 
         # Log when pod count changes
@@ -139,28 +692,25 @@ def wait_for_pod_count(self, namespace, expected_count, timeout=300):
             last_count = current_count
 
         if current_count == expected_count:
-            return pods
-
-        if time.time() - start_time > timeout:
-            # Show detailed debugging info before failing
-            debug_namespace_state(
-                namespace=namespace,
-                expected_count=expected_count,
-                current_count=current_count,
-            )
+            return sorted(pods)
 
-            raise TimeoutError(
-                f"Timeout waiting for {expected_count} pods in namespace {namespace}. Found {current_count} pods."
-            )
-        time.sleep(5)
+    # Show detailed debugging info before failing
+    debug_namespace_state(
+        namespace=namespace,
+        expected_count=expected_count,
+        current_count=len(pods),
+    )
+
+    raise TimeoutError(
+        f"Timeout waiting for {expected_count} pods in namespace {namespace}. Found {len(pods)} pods."
+    )
 
 
 @TestStep(When)
 def get_pvcs(self, namespace):
     """Get the list of PVCs in the specified namespace."""
 
-    pvcs = run(cmd=f"kubectl get pvc -n {namespace} -o json")
-    pvcs = json.loads(pvcs.stdout)["items"]
+    pvcs = list_resources(kind="pvc", namespace=namespace)
 
     return [p["metadata"]["name"] for p in pvcs]
 
@@ -176,8 +726,7 @@ def get_pvc_info(self, namespace, pvc_name):
     Returns:
         Dict with PVC information
     """
-    pvc_info = run(cmd=f"kubectl get pvc {pvc_name} -n {namespace} -o json")
-    return json.loads(pvc_info.stdout)
+    return get_resource(kind="pvc", name=pvc_name, namespace=namespace)
 
 
 @TestStep(When)
@@ -201,8 +750,7 @@ def get_pvc_storage_size(self, namespace, pvc_name):
 def get_services(self, namespace):
     """Get the list of services in the specified namespace."""
 
-    services = run(cmd=f"kubectl get svc -n {namespace} -o json")
-    services = json.loads(services.stdout)["items"]
+    services = list_resources(kind="svc", namespace=namespace)
 
     return [s["metadata"]["name"] for s in services]
 
@@ -211,10 +759,7 @@ def get_services(self, namespace):
 def get_service_info(self, service_name, namespace):
     """Get the full service information as a dictionary."""
 
-    service_info = run(cmd=f"kubectl get svc {service_name} -n {namespace} -o json")
-    service_info = json.loads(service_info.stdout)
-
-    return service_info
+    return get_resource(kind="svc", name=service_name, namespace=namespace)
 
 
 @TestStep(When)
@@ -230,12 +775,9 @@ def get_service_type(self, service_name, namespace):
 def get_pod_nodes(self, namespace, pod_names):
     """Get the nodes where the specified pods are running."""
 
-    nodes = []
-    for pod_name in pod_names:
-        pod_info = get_pod_info(namespace=namespace, pod_name=pod_name)
-        nodes.append(pod_info["spec"]["nodeName"])
+    snapshot = get_namespace_snapshot(namespace=namespace)
 
-    return nodes
+    return [snapshot.get("pod", pod)["spec"]["nodeName"] for pod in pod_names]
 
 
 @TestStep(When)
@@ -250,57 +792,77 @@ def get_pod_image(self, namespace, pod_name):
 def get_statefulsets(self, namespace):
     """Get the list of StatefulSets in the specified namespace."""
 
-    statefulsets = run(cmd=f"kubectl get statefulsets -n {namespace} -o json")
-    statefulsets = json.loads(statefulsets.stdout)
+    statefulsets = list_resources(kind="statefulset", namespace=namespace)
 
-    return [s["metadata"]["name"] for s in statefulsets["items"]]
+    return [s["metadata"]["name"] for s in statefulsets]
 
 
 @TestStep(When)
 def wait_for_pods_running(self, namespace, timeout=300):
-    """Wait until all pods in the namespace are running and ready."""
-
-    start_time = time.time()
-    while True:
-        pods = get_pods(namespace=namespace)
-        all_running = True
+    """Wait until all pods in the namespace are running and ready.
 
-        for pod in pods:
-            if not check_status(pod_name=pod, namespace=namespace, status="Running"):
-                all_running = False
-                break
-
-        if all_running:
-            return pods
-
-        if time.time() - start_time > timeout:
-            # Get status of all pods for debugging
-            pod_statuses = []
-            for pod in pods:
-                status = (
-                    "Running"
-                    if check_status(pod_name=pod, namespace=namespace, status="Running")
-                    else "Not Running"
-                )
-                pod_statuses.append(f"{pod}: {status}")
-            raise TimeoutError(
-                f"Timeout waiting for pods to be running. Pod statuses: {pod_statuses}"
-            )
+    Follows a pod watch and keeps the set of pods that are not ready yet,
+    so each event is handled in constant time.
+    """
 
-        time.sleep(10)
+    pods = set()
+    not_ready = set()
+    synced = False
+
+    for event_type, pod in watch_objects(
+        kind="pod", namespace=namespace, timeout=timeout
+    ):
+        if event_type == "RESET":
+            pods.clear()
+            not_ready.clear()
+            synced = False
+            continue
+
+        if event_type == "SYNCED":
+            synced = True
+        else:
+            pod_name = pod["metadata"]["name"]
+            if event_type == "DELETED":
+                pods.discard(pod_name)
+                not_ready.discard(pod_name)
+            else:
+                pods.add(pod_name)
+                if is_pod_ready(pod, status="Running"):
+                    not_ready.discard(pod_name)
+                else:
+                    not_ready.add(pod_name)
+
+        if synced and not not_ready:
+            return sorted(pods)
+
+    # Get status of all pods for debugging
+    pod_statuses = [
+        f"{pod}: {'Not Running' if pod in not_ready else 'Running'}"
+        for pod in sorted(pods)
+    ]
+    raise TimeoutError(
+        f"Timeout waiting for pods to be running. Pod statuses: {pod_statuses}"
+    )
 
 
 @TestStep(Then)
 def verify_pvc_storage_size(self, namespace, expected_size):
     """Verify that at least one PVC has the expected storage size."""
 
-    pvcs = get_pvcs(namespace=namespace)
+    snapshot = get_namespace_snapshot(namespace=namespace)
+    pvcs = snapshot.names("pvc")
     assert len(pvcs) > 0, "No PVCs found for persistence"
     note(f"Created PVCs: {pvcs}")
 
     # Verify at least one PVC has the expected size
     for pvc in pvcs:
-        storage_size = get_pvc_storage_size(namespace=namespace, pvc_name=pvc)
+        pvc_data = snapshot.get("pvc", pvc)
+        storage_size = (
+            pvc_data.get("spec", {})
+            .get("resources", {})
+            .get("requests", {})
+            .get("storage")
+        )
         if storage_size == expected_size:
             note(f"PVC {pvc} has correct storage size: {storage_size}")
             return pvc
@@ -405,7 +967,7 @@ def verify_loadbalancer_service(self, namespace, expected_ranges=None):
 
 @TestStep(Then)
 def verify_pvc_access_mode(
-    self, namespace, expected_access_mode, pvc_name_filter, resource_matcher=None
+    self, namespace, expected_access_mode, pvc_name_filter, labels=None
 ):
     """Verify PVC access mode for PVCs matching filter.
 
@@ -413,21 +975,17 @@ def verify_pvc_access_mode(
         namespace: Kubernetes namespace
         expected_access_mode: Expected access mode (e.g., "ReadWriteOnce")
         pvc_name_filter: String to filter PVC names (e.g., "data", "logs")
-        resource_matcher: Optional function to check if PVC belongs to target resource
+        labels: Optional labels of the PVCs to check (see NamespaceSnapshot.names)
 
     Returns:
         Name of verified PVC
     """
-    pvcs = get_pvcs(namespace=namespace)
+    snapshot = get_namespace_snapshot(namespace=namespace)
 
     # Find matching PVCs
-    for pvc in pvcs:
+    for pvc in snapshot.names("pvc", labels=labels):
         if pvc_name_filter in pvc.lower():
-            # Apply resource matcher if provided
-            if resource_matcher and not resource_matcher(resource_name=pvc):
-                continue
-
-            pvc_info = get_pvc_info(namespace=namespace, pvc_name=pvc)
+            pvc_info = snapshot.get("pvc", pvc)
             access_modes = pvc_info.get("spec", {}).get("accessModes", [])
 
             assert (
@@ -451,10 +1009,7 @@ def get_endpoints_info(self, namespace, endpoints_name):
     Returns:
         dict: Endpoints information
     """
-    endpoints_info = run(
-        cmd=f"kubectl get endpoints {endpoints_name} -n {namespace} -o json"
-    )
-    return json.loads(endpoints_info.stdout)
+    return get_resource(kind="endpoints", name=endpoints_name, namespace=namespace)
 
 
 @TestStep(When)
@@ -467,9 +1022,8 @@ def get_secrets(self, namespace):
     Returns:
         list: List of secret names
     """
-    secrets_info = run(cmd=f"kubectl get secrets -n {namespace} -o json")
-    secrets_data = json.loads(secrets_info.stdout)
-    return [item["metadata"]["name"] for item in secrets_data.get("items", [])]
+    secrets = list_resources(kind="secret", namespace=namespace)
+    return [item["metadata"]["name"] for item in secrets]
 
 
 @TestStep(Finally)
@@ -488,6 +1042,13 @@ def delete_namespace(self, namespace):
         check=False,
     )
 
+    invalidate_namespace_snapshot(namespace=namespace)
+
+    # Forwards of the ClickHouse session pool into the namespace are dead now
+    pool = getattr(self.context, "clickhouse_pool", None)
+    if pool is not None:
+        pool.close_namespace(namespace)
+
     note(f"✓ Namespace {namespace} deleted")
 
 
@@ -500,4 +1061,5 @@ def delete_pod(self, namespace, pod_name):
         pod_name: Name of the pod to delete
     """
     run(cmd=f"kubectl delete pod {pod_name} -n {namespace}", check=True)
+    invalidate_namespace_snapshot(namespace=namespace)
     note(f"✓ Pod {pod_name} deleted from namespace {namespace}")
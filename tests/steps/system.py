@@ -1,16 +1,173 @@
 import subprocess
 import sys
+import time
+import random
 import yaml
+import json
 import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 from testflows.core import *
+from tests.helpers.stats import HistogramRegistry
+from tests.helpers.profiler import Profiler, command_family
+
+# Time-to-ready of every condition waited on with wait_until, by name
+wait_times = HistogramRegistry()
+
+# Subprocesses, API requests and profiled steps, by step, scenario and fixture
+profiler = Profiler()
+
+
+def profile_scope():
+    """Return the (step, scenario, fixture) names calls are attributed to.
+
+    The fixture is taken from `context.fixture`, set by the scenario.
+    """
+    test = current()
+    if test is None:
+        return None, None, None
+
+    scenario = test
+    while (
+        scenario is not None and getattr(scenario.subtype, "name", None) != "Scenario"
+    ):
+        scenario = scenario.parent
+
+    return (
+        test.name,
+        scenario.name if scenario is not None else None,
+        getattr(test.context, "fixture", None),
+    )
+
+
+def record_call(family, wall_time, subprocesses=0, stdout_bytes=0):
+    """Record one harness call made from the current test in `profiler`."""
+    step, scenario, fixture = profile_scope()
+    profiler.record(
+        step=step,
+        scenario=scenario,
+        fixture=fixture,
+        family=family,
+        wall_time=wall_time,
+        subprocesses=subprocesses,
+        stdout_bytes=stdout_bytes,
+    )
+
+
+@contextmanager
+def profile_step():
+    """Record the wall time of a block under the current step as family "step".
+
+    Comparing it with the calls made inside the block shows how much of the
+    step was spent in subprocesses and requests and how much elsewhere.
+    """
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        record_call(family="step", wall_time=time.time() - start_time)
+
+
+def wait_until(
+    check_fn,
+    timeout=60,
+    interval=5,
+    timeout_msg="Operation timed out",
+    name=None,
+    initial_interval=0.2,
+    backoff=2,
+    jitter=0.2,
+):
+    """Generic retry helper that waits until a condition is met.
+
+    Retries start after `initial_interval` and back off exponentially with
+    random jitter up to `interval`, so conditions that become true quickly
+    are noticed quickly while slow ones are not polled in a tight loop.
+    Sleeps never overshoot the deadline. The time it took for the condition
+    to become true is recorded in `wait_times` under `name`.
+
+    Args:
+        check_fn: Function that returns (success: bool, result: any, status_msg: str)
+        timeout: Maximum time to wait in seconds
+        interval: Maximum time between retries in seconds
+        timeout_msg: Error message if timeout occurs
+        name: Condition name for time-to-ready stats (defaults to check_fn name)
+        initial_interval: Time before the first retry in seconds
+        backoff: Factor the retry interval grows by after each attempt
+        jitter: Fraction of the retry interval to randomize by
+
+    Returns:
+        The result from check_fn when successful
+
+    Raises:
+        TimeoutError: If condition not met within timeout
+    """
+    name = name or check_fn.__name__
+    start_time = time.time()
+    deadline = start_time + timeout
+    delay = min(initial_interval, interval)
+    last_status = None
+
+    while True:
+        success, result, status_msg = check_fn()
+
+        if success:
+            wait_times.record(name, time.time() - start_time)
+            return result
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            wait_times.record(f"{name} (timed out)", time.time() - start_time)
+            raise TimeoutError(f"{timeout_msg}. Last status: {status_msg}")
+
+        if status_msg and status_msg != last_status:
+            note(status_msg)
+            last_status = status_msg
+
+        time.sleep(min(delay * random.uniform(1 - jitter, 1 + jitter), remaining))
+        delay = min(delay * backoff, interval)
+
+
+@TestStep(Finally)
+def report_wait_times(self):
+    """Note time-to-ready stats of all conditions waited on with wait_until."""
+    for name, summary in wait_times.summary().items():
+        buckets = ", ".join(f"{k}: {v}" for k, v in summary["buckets"].items())
+        note(
+            f"{name}: n={summary['count']} mean={summary['mean']:.2f}s "
+            f"max={summary['max']:.2f}s [{buckets}]"
+        )
+
+
+@TestStep(Finally)
+def write_profile_report(self, path):
+    """Write the profiler and wait time stats as JSON to `path`."""
+    report = profiler.report()
+    report["wait_times"] = wait_times.summary()
+
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    total = report["total"]
+    note(
+        f"Profile written to {path}: {total['subprocesses']} subprocesses, "
+        f"{total['calls']} calls, {total['wall_time']:.1f}s"
+    )
 
 
 @TestStep(When)
-def run(self, cmd, check=True):
-    """Execute a shell command."""
-    note(f"> {cmd}")
+def run(self, cmd, check=True, quiet=False):
+    """Execute a shell command, noting it unless `quiet`."""
+    if not quiet:
+        note(f"> {cmd}")
+    start_time = time.time()
     result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    record_call(
+        family=command_family(cmd),
+        wall_time=time.time() - start_time,
+        subprocesses=1,
+        stdout_bytes=len(result.stdout),
+    )
 
     if check and result.returncode != 0:
         note(result.stderr)
@@ -1,10 +1,21 @@
 from tests.steps.system import *
 import json
+import re
 import hashlib
 import tests.steps.kubernetes as kubernetes
 import tests.steps.clickhouse as clickhouse
 
 
+def quote_string(value):
+    """Return a ClickHouse string literal of a value."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def quote_identifier(name):
+    """Return a backquoted ClickHouse identifier of a name."""
+    return "`" + name.replace("\\", "\\\\").replace("`", "\\`") + "`"
+
+
 @TestStep(When)
 def get_user_grants(
     self,
@@ -39,6 +50,60 @@ def get_user_grants(
     return []
 
 
+@TestStep(When)
+def get_users_state(self, namespace, pod_name, user_names, admin_password=""):
+    """Get auth types and grants of many users with two queries.
+
+    One `system.users` scan covers existence and auth types, one
+    `SHOW GRANTS FOR` covering all found users returns their grants.
+
+    Returns:
+        Dict of user name to {"auth_type": ..., "grants": [...]} for users that exist
+    """
+    if not user_names:
+        return {}
+
+    names = ", ".join(quote_string(name) for name in user_names)
+    rows = clickhouse.select_rows(
+        namespace=namespace,
+        pod_name=pod_name,
+        query=f"SELECT name, auth_type FROM system.users WHERE name IN ({names})",
+        user="default",
+        password=admin_password,
+    )
+    assert rows is not None, "Failed to query system.users"
+
+    state = {row["name"]: {"auth_type": row["auth_type"], "grants": []} for row in rows}
+    if not state:
+        return state
+
+    result = clickhouse.execute_clickhouse_query(
+        namespace=namespace,
+        pod_name=pod_name,
+        query=f"SHOW GRANTS FOR {', '.join(map(quote_identifier, state))} "
+        "FORMAT TabSeparatedRaw",
+        user="default",
+        password=admin_password,
+        check=False,
+    )
+    if result.returncode != 0:
+        note(f"Failed to get grants for users {list(state)}: {result.stderr}")
+        return state
+
+    # "GRANT SELECT ON db.* TO user1, user2 WITH GRANT OPTION"
+    grantees = re.compile(r"\sTO\s+(.+?)(?:\s+WITH\s+\w+\s+OPTION)*$")
+    for grant in result.stdout.splitlines():
+        match = grantees.search(grant)
+        if not match:
+            continue
+        for grantee in match.group(1).split(","):
+            grantee = grantee.strip().strip("`'\"")
+            if grantee in state:
+                state[grantee]["grants"].append(grant)
+
+    return state
+
+
 @TestStep(When)
 def check_user_has_permission(
     self, namespace, pod_name, user, password, permission_query
@@ -59,8 +124,16 @@ def check_user_has_permission(
 
 
 @TestStep(Then)
-def verify_user_exists(self, namespace, user_name, admin_password=""):
-    """Verify that a user exists in ClickHouse."""
+def verify_user_exists(self, namespace, user_name, admin_password="", users_state=None):
+    """Verify that a user exists in ClickHouse.
+
+    Uses `users_state` from get_users_state when given instead of querying.
+    """
+    if users_state is not None:
+        assert user_name in users_state, f"User '{user_name}' not found in system.users"
+        note(f"✓ User exists: {user_name}")
+        return
+
     clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
     assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
@@ -82,12 +155,13 @@ def verify_user_exists(self, namespace, user_name, admin_password=""):
 
 
 @TestStep(Then)
-def verify_user_connectivity(self, namespace, user, password):
+def verify_user_connectivity(self, namespace, user, password, pod_name=None):
     """Verify that a user can connect to ClickHouse."""
-    clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
-    assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
+    if pod_name is None:
+        clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
+        assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
-    pod_name = clickhouse_pods[0]
+        pod_name = clickhouse_pods[0]
 
     result = clickhouse.test_clickhouse_connection(
         namespace=namespace, pod_name=pod_name, user=user, password=password
@@ -99,33 +173,43 @@ def verify_user_connectivity(self, namespace, user, password):
 
 @TestStep(Then)
 def verify_user_password_hash(
-    self, namespace, user, expected_hash, plaintext_password, admin_password=""
+    self,
+    namespace,
+    user,
+    expected_hash,
+    plaintext_password,
+    admin_password="",
+    users_state=None,
 ):
-    """Verify that the user's password hash configuration is correct."""
-    clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
-    assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
+    """Verify that the user's password hash configuration is correct.
 
-    pod_name = clickhouse_pods[0]
+    Uses `users_state` from get_users_state when given instead of querying.
+    """
+    if users_state is None:
+        clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
+        assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
-    query = (
-        f"SELECT name, auth_type FROM system.users WHERE name = '{user}' FORMAT JSON"
-    )
-    result = clickhouse.execute_clickhouse_query(
-        namespace=namespace,
-        pod_name=pod_name,
-        query=query,
-        user="default",
-        password=admin_password,
-        check=False,
-    )
+        pod_name = clickhouse_pods[0]
 
-    assert result.returncode == 0, f"Failed to query auth type for user '{user}'"
+        query = f"SELECT name, auth_type FROM system.users WHERE name = '{user}' FORMAT JSON"
+        result = clickhouse.execute_clickhouse_query(
+            namespace=namespace,
+            pod_name=pod_name,
+            query=query,
+            user="default",
+            password=admin_password,
+            check=False,
+        )
+
+        assert result.returncode == 0, f"Failed to query auth type for user '{user}'"
 
-    data = json.loads(result.stdout)
-    if not data.get("data") or len(data["data"]) == 0:
+        data = json.loads(result.stdout)
+        users_state = {row["name"]: row for row in data.get("data", [])}
+
+    if user not in users_state:
         raise AssertionError(f"User '{user}' not found in system.users")
 
-    user_data = data["data"][0]
+    user_data = users_state[user]
     auth_types = user_data.get("auth_type", [])
 
     assert (
@@ -143,20 +227,28 @@ def verify_user_password_hash(
 
 
 @TestStep(Then)
-def verify_user_grants(self, namespace, user, expected_grants, admin_password=""):
-    """Verify that a user has expected grants."""
-    clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
-    assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
+def verify_user_grants(
+    self, namespace, user, expected_grants, admin_password="", users_state=None
+):
+    """Verify that a user has expected grants.
 
-    pod_name = clickhouse_pods[0]
+    Uses `users_state` from get_users_state when given instead of querying.
+    """
+    if users_state is not None:
+        actual_grants = users_state.get(user, {}).get("grants", [])
+    else:
+        clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
+        assert len(clickhouse_pods) > 0, "No ClickHouse pods found"
 
-    actual_grants = get_user_grants(
-        namespace=namespace,
-        pod_name=pod_name,
-        user=user,
-        admin_user="default",
-        admin_password=admin_password,
-    )
+        pod_name = clickhouse_pods[0]
+
+        actual_grants = get_user_grants(
+            namespace=namespace,
+            pod_name=pod_name,
+            user=user,
+            admin_user="default",
+            admin_password=admin_password,
+        )
 
     assert (
         actual_grants
@@ -286,7 +378,13 @@ def verify_readonly_user(self, namespace, user, password=""):
 
 @TestStep(Then)
 def verify_all_users(self, namespace, default_user_config=None, users_config=None):
-    """Comprehensive verification of all user configurations."""
+    """Comprehensive verification of all user configurations.
+
+    Existence, password hashes and grants of all users are fetched up front
+    with get_users_state, so they cost the same number of queries for any
+    number of users. Checks that must log in as the user itself still run
+    once per user.
+    """
     clickhouse_pods = clickhouse.get_clickhouse_pods(namespace=namespace)
     if not clickhouse_pods:
         note("No ClickHouse pods found, skipping user verification")
@@ -299,12 +397,22 @@ def verify_all_users(self, namespace, default_user_config=None, users_config=Non
         if "password" in default_user_config:
             admin_password = default_user_config["password"]
             verify_user_connectivity(
-                namespace=namespace, user="default", password=admin_password
+                namespace=namespace,
+                user="default",
+                password=admin_password,
+                pod_name=pod_name,
             )
 
         note(f"✓ Default user verified")
 
     if users_config:
+        users_state = get_users_state(
+            namespace=namespace,
+            pod_name=pod_name,
+            user_names=[u["name"] for u in users_config if u.get("name")],
+            admin_password=admin_password,
+        )
+
         for user_config in users_config:
             user_name = user_config.get("name")
             if not user_name:
@@ -313,7 +421,10 @@ def verify_all_users(self, namespace, default_user_config=None, users_config=Non
             note(f"Verifying user: {user_name}")
 
             verify_user_exists(
-                namespace=namespace, user_name=user_name, admin_password=admin_password
+                namespace=namespace,
+                user_name=user_name,
+                admin_password=admin_password,
+                users_state=users_state,
             )
 
             if "password" in user_config:
@@ -321,6 +432,7 @@ def verify_all_users(self, namespace, default_user_config=None, users_config=Non
                     namespace=namespace,
                     user=user_name,
                     password=user_config["password"],
+                    pod_name=pod_name,
                 )
 
                 if "password_sha256_hex" in user_config:
@@ -330,6 +442,7 @@ def verify_all_users(self, namespace, default_user_config=None, users_config=Non
                         expected_hash=user_config["password_sha256_hex"],
                         plaintext_password=user_config["password"],
                         admin_password=admin_password,
+                        users_state=users_state,
                     )
             elif "password_sha256_hex" in user_config:
                 note(
@@ -357,6 +470,7 @@ def verify_all_users(self, namespace, default_user_config=None, users_config=Non
                     user=user_name,
                     expected_grants=user_config["grants"],
                     admin_password=admin_password,
+                    users_state=users_state,
                 )
 
             if "readonly" in user_name.lower() and "password" in user_config: